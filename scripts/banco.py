@@ -1,21 +1,52 @@
 import sys
-import cx_Oracle
+import sqlite3
+import threading
+import time
 import numpy as np
 import traceback
-import pandas as pd
+import weakref
+from datetime import datetime
+from metricas import etapa, medir_etapa
+
+# Estado mantido durante todo o processo: parâmetros de conexão, pool de sessões e tabelas já verificadas
+# em cada banco (por usuário e DSN nas conexões Oracle, por conexão nas demais, como as de conectar_banco_local)
+_parametros_conexao = None
+_pool_sessoes = None
+_tabelas_verificadas = {}
+_tabelas_verificadas_locais = weakref.WeakKeyDictionary()
+
+class _ConexaoLocal(sqlite3.Connection):
+    """
+    Conexão SQLite que aceita referências fracas, para que as tabelas verificadas sejam lembradas por conexão.
+    """
+
+def _erros_banco():
+    """
+    Exceções de banco de dados tratadas por este módulo: as do SQLite (banco local) e, se o cx_Oracle já
+    tiver sido importado por conectar_banco ou criar_pool_sessoes, as do Oracle.
+    O cx_Oracle é importado apenas ao conectar ao Oracle, para que o banco local funcione sem ele.
+    """
+    cx_oracle = sys.modules.get('cx_Oracle')
+    return (sqlite3.DatabaseError, cx_oracle.DatabaseError) if cx_oracle else (sqlite3.DatabaseError,)
 
 def ler_arquivo_conexao():
     """
     Lê os parâmetros de conexão a partir do arquivo 'conexao.txt'.
+    O arquivo é lido apenas uma vez por processo; as chamadas seguintes usam os parâmetros já lidos.
     :return: Um dicionário com os parâmetros de conexão
     """
+    global _parametros_conexao
+    if _parametros_conexao is not None:
+        return dict(_parametros_conexao)
+
     parametros = {}
     try:
         with open('conexao.txt', 'r') as arquivo:
             for linha in arquivo:
                 chave, valor = linha.strip().split('=')
                 parametros[chave.strip()] = valor.strip()
-        return parametros
+        _parametros_conexao = parametros
+        return dict(parametros)
     except FileNotFoundError:
         print("Erro: O arquivo 'conexao.txt' não foi encontrado.")
         sys.exit(1)
@@ -29,6 +60,7 @@ def conectar_banco():
     Conecta ao banco de dados Oracle utilizando parâmetros do arquivo 'conexao.txt'.
     :return: Conexão ativa ao banco de dados
     """
+    import cx_Oracle
     try:
         parametros = ler_arquivo_conexao()
         dsn_tns = cx_Oracle.makedsn(parametros['host'], parametros['porta'], service_name=parametros['sid'])
@@ -39,6 +71,86 @@ def conectar_banco():
         traceback.print_exc()
         sys.exit(1)
 
+def criar_pool_sessoes(minimo=1, maximo=4, incremento=1):
+    """
+    Cria (uma única vez por processo) um pool de sessões Oracle, reaproveitado por obter_conexao_pool.
+    :param minimo: Número mínimo de sessões abertas
+    :param maximo: Número máximo de sessões abertas
+    :param incremento: Quantidade de sessões abertas de cada vez quando o pool cresce
+    :return: Pool de sessões
+    """
+    global _pool_sessoes
+    if _pool_sessoes is None:
+        import cx_Oracle
+        parametros = ler_arquivo_conexao()
+        dsn_tns = cx_Oracle.makedsn(parametros['host'], parametros['porta'], service_name=parametros['sid'])
+        _pool_sessoes = cx_Oracle.SessionPool(user=parametros['usuario'], password=parametros['senha'], dsn=dsn_tns,
+                                              min=minimo, max=maximo, increment=incremento, threaded=True)
+    return _pool_sessoes
+
+def obter_conexao_pool():
+    """
+    Obtém uma conexão do pool de sessões, criando o pool na primeira chamada.
+    A conexão deve ser devolvida com liberar_conexao_pool.
+    :return: Conexão ativa ao banco de dados
+    """
+    return criar_pool_sessoes().acquire()
+
+def liberar_conexao_pool(conexao):
+    """
+    Devolve ao pool de sessões uma conexão obtida com obter_conexao_pool.
+    """
+    criar_pool_sessoes().release(conexao)
+
+def fechar_pool_sessoes():
+    """
+    Fecha o pool de sessões, se existir.
+    """
+    global _pool_sessoes
+    if _pool_sessoes is not None:
+        _pool_sessoes.close()
+        _pool_sessoes = None
+
+def conectar_banco_local(caminho=':memory:'):
+    """
+    Conecta a um banco SQLite local que substitui o Oracle em testes e benchmarks.
+    Uma visão 'user_tables' imita o dicionário de dados do Oracle, de modo que as mesmas
+    instruções SQL deste módulo funcionam sem alteração.
+    :param caminho: Caminho do arquivo SQLite (padrão: banco em memória)
+    :return: Conexão DB-API ao banco local
+    """
+    conexao = sqlite3.connect(caminho, check_same_thread=False, factory=_ConexaoLocal)
+    conexao.execute("""
+        CREATE VIEW IF NOT EXISTS user_tables AS
+        SELECT upper(name) AS table_name FROM sqlite_master WHERE type = 'table'
+    """)
+    return conexao
+
+def _garantir(cursor, tabela, verificar):
+    """
+    Executa verificar(cursor) apenas no primeiro uso da tabela em cada banco: por usuário e DSN nas conexões
+    Oracle (inclusive as sessões do pool) e por conexão nas demais. Conexões sem DSN que não aceitam
+    referência fraca são verificadas a cada chamada.
+    """
+    conexao = cursor.connection
+    dsn = getattr(conexao, 'dsn', None)
+    try:
+        if dsn:
+            verificadas = _tabelas_verificadas.setdefault((getattr(conexao, 'username', None), dsn), set())
+        else:
+            verificadas = _tabelas_verificadas_locais.setdefault(conexao, set())
+    except TypeError:
+        verificadas = set()
+    if tabela not in verificadas:
+        verificar(cursor)
+        verificadas.add(tabela)
+
+def garantir_tabela(cursor):
+    """
+    Garante que a tabela 'monitoramento' exista, consultando o banco apenas no primeiro uso em cada banco.
+    """
+    _garantir(cursor, 'monitoramento', verificar_e_criar_tabela)
+
 def verificar_e_criar_tabela(cursor):
     """
     Verifica se a tabela 'monitoramento' existe e, caso contrário, cria a tabela no banco de dados Oracle.
@@ -64,11 +176,126 @@ def verificar_e_criar_tabela(cursor):
             print("Tabela 'monitoramento' criada com sucesso.")
         else:
             print("Tabela 'monitoramento' já existe.")
-    except cx_Oracle.DatabaseError as e:
+    except _erros_banco() as e:
         print(f"Erro ao verificar/criar a tabela 'monitoramento': {e}")
         traceback.print_exc()
         raise
 
+SQL_INSERIR_MONITORAMENTO = """
+    INSERT INTO monitoramento (ndvi_medio, problemas_totais, pragas_totais)
+    VALUES (:1, :2, :3)
+"""
+
+def inserir_dados_monitoramento(cursor, ndvi_medio, problemas_totais, pragas_totais):
+    """
+    Insere uma linha com os totais de monitoramento na tabela 'monitoramento'.
+    """
+    cursor.execute(SQL_INSERIR_MONITORAMENTO, (ndvi_medio, problemas_totais, pragas_totais))
+
+@medir_etapa("salvar_banco")
+def salvar_dados_totais_banco(conexao, ndvi_medio, problemas_totais, pragas_totais):
+    """
+    Salva no banco de dados Oracle totais já calculados (ex: no processamento em lote), sem exibir as estruturas de dados.
+    Erros de banco são repassados a quem chamou.
+
+    :param conexao: Conexão ativa ao banco de dados
+    :param ndvi_medio: NDVI médio da imagem
+    :param problemas_totais: Quantidade de pixels problemáticos
+    :param pragas_totais: Quantidade de pixels com possíveis pragas
+    """
+    cursor = conexao.cursor()
+    try:
+        garantir_tabela(cursor)
+        inserir_dados_monitoramento(cursor, ndvi_medio, problemas_totais, pragas_totais)
+        conexao.commit()
+    finally:
+        cursor.close()
+
+def verificar_e_criar_tabela_zonas(cursor):
+    """
+    Verifica se a tabela 'monitoramento_zonas' existe e, caso contrário, cria a tabela no banco de dados Oracle.
+    """
+    try:
+        cursor.execute("""
+            SELECT table_name
+            FROM user_tables
+            WHERE table_name = 'MONITORAMENTO_ZONAS'
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute("""
+                CREATE TABLE monitoramento_zonas (
+                    imagem VARCHAR2(512),
+                    data_analise VARCHAR2(32),
+                    zona INT,
+                    pixels INT,
+                    ndvi_medio FLOAT,
+                    ndvi_minimo FLOAT,
+                    ndvi_maximo FLOAT,
+                    ndvi_desvio FLOAT,
+                    problemas INT,
+                    pragas INT,
+                    fracao_problemas FLOAT,
+                    fracao_pragas FLOAT
+                )
+            """)
+            print("Tabela 'monitoramento_zonas' criada com sucesso.")
+    except _erros_banco() as e:
+        print(f"Erro ao verificar/criar a tabela 'monitoramento_zonas': {e}")
+        traceback.print_exc()
+        raise
+
+def garantir_tabela_zonas(cursor):
+    """
+    Garante que a tabela 'monitoramento_zonas' exista, consultando o banco apenas no primeiro uso em cada banco.
+    """
+    _garantir(cursor, 'monitoramento_zonas', verificar_e_criar_tabela_zonas)
+
+# Colunas de estatísticas de cada linha de 'monitoramento_zonas', na ordem de zonas.TIPO_ESTATISTICAS_ZONAIS
+COLUNAS_ZONAS = ("zona", "pixels", "ndvi_medio", "ndvi_minimo", "ndvi_maximo", "ndvi_desvio", "problemas", "pragas",
+                 "fracao_problemas", "fracao_pragas")
+
+SQL_INSERIR_ZONAS = """
+    INSERT INTO monitoramento_zonas (imagem, data_analise, zona, pixels, ndvi_medio, ndvi_minimo, ndvi_maximo,
+                                     ndvi_desvio, problemas, pragas, fracao_problemas, fracao_pragas)
+    VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9, :10, :11, :12)
+"""
+
+def linhas_zonas(imagem, data_analise, registros):
+    """
+    Monta as linhas de 'monitoramento_zonas' de uma imagem, identificadas pela imagem e pela data da análise.
+    :param imagem: Caminho (ou identificador) da imagem
+    :param data_analise: Data ISO da análise (ex: '2024-10-15T10:30:00')
+    :param registros: Array estruturado de zonas.estatisticas_zonais ou lista de dicionários de tabela_para_registros
+    :return: Lista de tuplas na ordem das colunas de SQL_INSERIR_ZONAS
+    """
+    return [(imagem, data_analise, *(registro[nome].item() if hasattr(registro[nome], 'item') else registro[nome]
+                                     for nome in COLUNAS_ZONAS))
+            for registro in registros]
+
+@medir_etapa("salvar_zonas_banco")
+def salvar_estatisticas_zonais(conexao, tabela, imagem, data_analise=None):
+    """
+    Salva a tabela de estatísticas zonais (zonas.estatisticas_zonais) de uma imagem na tabela
+    'monitoramento_zonas', com uma única instrução executemany e um único commit.
+    Erros de banco são repassados a quem chamou.
+
+    :param conexao: Conexão ativa ao banco de dados
+    :param tabela: Array estruturado com uma linha por zona (ou lista de dicionários de tabela_para_registros)
+    :param imagem: Caminho (ou identificador) da imagem, que distingue as zonas de imagens diferentes
+    :param data_analise: Data ISO da análise (padrão: o momento atual)
+    :return: Quantidade de linhas gravadas
+    """
+    data_analise = data_analise or datetime.now().isoformat(timespec='seconds')
+    cursor = conexao.cursor()
+    try:
+        garantir_tabela_zonas(cursor)
+        cursor.executemany(SQL_INSERIR_ZONAS, linhas_zonas(imagem, data_analise, tabela))
+        conexao.commit()
+    finally:
+        cursor.close()
+    return len(tabela)
+
+@medir_etapa("salvar_banco")
 def salvar_dados_banco(conexao, ndvi, problemas, pragas):
     """
     Salva os dados de monitoramento da lavoura no banco de dados Oracle.
@@ -83,7 +310,7 @@ def salvar_dados_banco(conexao, ndvi, problemas, pragas):
         cursor = conexao.cursor()
 
         # Verifica se a tabela existe e a cria se necessário
-        verificar_e_criar_tabela(cursor)
+        garantir_tabela(cursor)
         
         # Calcula os valores a serem inseridos
         ndvi_medio = float(np.mean(ndvi))
@@ -91,10 +318,7 @@ def salvar_dados_banco(conexao, ndvi, problemas, pragas):
         pragas_totais = int(np.sum(pragas))
         
         # Inserção de dados na tabela 'monitoramento'
-        cursor.execute("""
-            INSERT INTO monitoramento (ndvi_medio, problemas_totais, pragas_totais)
-            VALUES (:1, :2, :3)
-        """, (ndvi_medio, problemas_totais, pragas_totais))
+        inserir_dados_monitoramento(cursor, ndvi_medio, problemas_totais, pragas_totais)
         
         conexao.commit()
         print("Dados salvos no banco de dados com sucesso.")
@@ -118,16 +342,182 @@ def salvar_dados_banco(conexao, ndvi, problemas, pragas):
         print(f"Dados armazenados em dicionário: {dados_dicionario}")
         
         # 4. Tabela de Memória (DataFrame do pandas)
+        import pandas as pd  # importado apenas aqui: é o único uso do pandas e custa caro na inicialização
         dados_dataframe = pd.DataFrame([dados_dicionario])
         print("Dados armazenados em tabela de memória (DataFrame):")
         print(dados_dataframe)
         
-    except cx_Oracle.DatabaseError as e:
+    except _erros_banco() as e:
         print(f"Erro ao salvar os dados no banco de dados Oracle: {e}")
         traceback.print_exc()
     finally:
         cursor.close()
 
+class GravadorMonitoramento:
+    """
+    Acumula linhas de resultados de monitoramento e as grava em lote com executemany,
+    com um único commit por lote. O lote é gravado ao atingir tamanho_lote linhas ou quando
+    a linha mais antiga pendente tiver mais de intervalo_maximo segundos (verificado a cada adicionar e por um
+    temporizador em segundo plano, para que as linhas não fiquem retidas quando param de chegar).
+    Se a gravação falhar, as linhas continuam pendentes (linhas_pendentes) e são gravadas na próxima tentativa;
+    adicionar não repassa o erro, e fechar o repassa se ainda houver linhas que não puderam ser gravadas.
+    Funciona com qualquer conexão DB-API, como a de conectar_banco_local.
+
+    As estatísticas por zona de cada imagem (adicionar_zonas) entram no mesmo lote e no mesmo commit.
+
+    Uso:
+        with GravadorMonitoramento(tamanho_lote=500) as gravador:
+            gravador.adicionar(ndvi_medio, problemas_totais, pragas_totais)
+    """
+
+    def __init__(self, conexao=None, tamanho_lote=500, intervalo_maximo=5.0):
+        """
+        :param conexao: Conexão ativa ao banco de dados; se None, cada lote usa uma conexão do pool de sessões
+        :param tamanho_lote: Quantidade de linhas que dispara a gravação do lote
+        :param intervalo_maximo: Tempo máximo, em segundos, que uma linha pode aguardar no buffer
+        """
+        self.conexao = conexao
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_maximo = intervalo_maximo
+        self.linhas_gravadas = 0
+        self.linhas_zonas_gravadas = 0
+        self._linhas = []
+        self._linhas_zonas = []
+        self._inicio_lote = None
+        self._temporizador = None
+        self._trava = threading.Lock()
+
+    def adicionar(self, ndvi_medio, problemas_totais, pragas_totais):
+        """
+        Adiciona uma linha ao buffer, gravando o lote se algum limite for atingido.
+        """
+        self._acrescentar(self._linhas, [(float(ndvi_medio), int(problemas_totais), int(pragas_totais))])
+
+    def adicionar_zonas(self, imagem, data_analise, registros):
+        """
+        Adiciona ao buffer as estatísticas por zona de uma imagem (tabela 'monitoramento_zonas').
+        :param imagem: Caminho (ou identificador) da imagem
+        :param data_analise: Data ISO da análise
+        :param registros: Array estruturado de zonas.estatisticas_zonais ou lista de dicionários de tabela_para_registros
+        """
+        self._acrescentar(self._linhas_zonas, linhas_zonas(imagem, data_analise, registros))
+
+    def _acrescentar(self, destino, linhas):
+        with self._trava:
+            if not self._linhas and not self._linhas_zonas:
+                self._inicio_lote = time.monotonic()
+                self._agendar_descarga()
+            destino.extend(linhas)
+            if (len(self._linhas) + len(self._linhas_zonas) >= self.tamanho_lote
+                    or (self.intervalo_maximo is not None
+                        and time.monotonic() - self._inicio_lote >= self.intervalo_maximo)):
+                self._tentar_descarregar()
+
+    @property
+    def linhas_pendentes(self):
+        """
+        Quantidade de linhas (das duas tabelas) ainda não gravadas no banco.
+        """
+        with self._trava:
+            return len(self._linhas) + len(self._linhas_zonas)
+
+    def _tentar_descarregar(self):
+        """
+        Grava o lote; em caso de erro as linhas continuam no buffer e uma nova tentativa é agendada.
+        """
+        try:
+            self._descarregar()
+        except Exception as e:
+            print(f"Erro ao gravar o lote no banco de dados ({len(self._linhas) + len(self._linhas_zonas)} "
+                  f"linhas pendentes): {e}")
+            traceback.print_exc()
+            self._agendar_descarga()
+
+    def _agendar_descarga(self):
+        """
+        Agenda a gravação, por tempo, do lote pendente. Há um único temporizador ativo: o anterior é cancelado.
+        """
+        self._cancelar_temporizador()
+        if self.intervalo_maximo is not None:
+            self._temporizador = threading.Timer(self.intervalo_maximo, self._descarregar_por_tempo)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def _cancelar_temporizador(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+
+    def _descarregar_por_tempo(self):
+        """
+        Grava o lote pendente se a linha mais antiga já esperou intervalo_maximo segundos.
+        """
+        with self._trava:
+            if self._temporizador is not threading.current_thread():
+                # Temporizador cancelado ou substituído enquanto aguardava a trava
+                return
+            self._temporizador = None
+            if not self._linhas and not self._linhas_zonas:
+                return
+            if time.monotonic() - self._inicio_lote < self.intervalo_maximo:
+                self._agendar_descarga()
+                return
+            self._tentar_descarregar()
+
+    def descarregar(self):
+        """
+        Grava imediatamente as linhas pendentes.
+        :return: Quantidade de linhas gravadas
+        """
+        with self._trava:
+            return self._descarregar()
+
+    def _descarregar(self):
+        if not self._linhas and not self._linhas_zonas:
+            return 0
+        with etapa("gravar_lote_banco", linhas=len(self._linhas), linhas_zonas=len(self._linhas_zonas)):
+            conexao = self.conexao if self.conexao is not None else obter_conexao_pool()
+            cursor = conexao.cursor()
+            try:
+                if self._linhas:
+                    garantir_tabela(cursor)
+                    cursor.executemany(SQL_INSERIR_MONITORAMENTO, self._linhas)
+                if self._linhas_zonas:
+                    garantir_tabela_zonas(cursor)
+                    cursor.executemany(SQL_INSERIR_ZONAS, self._linhas_zonas)
+                conexao.commit()
+            except Exception:
+                conexao.rollback()
+                raise
+            finally:
+                cursor.close()
+                if self.conexao is None:
+                    liberar_conexao_pool(conexao)
+        quantidade = len(self._linhas)
+        self.linhas_gravadas += quantidade
+        self.linhas_zonas_gravadas += len(self._linhas_zonas)
+        self._linhas = []
+        self._linhas_zonas = []
+        self._inicio_lote = None
+        self._cancelar_temporizador()
+        return quantidade
+
+    def fechar(self):
+        """
+        Grava as linhas pendentes. A conexão informada no construtor não é fechada.
+        Se a gravação falhar, o erro é repassado e as linhas continuam em linhas_pendentes.
+        """
+        with self._trava:
+            self._cancelar_temporizador()
+            self._descarregar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        self.fechar()
+        return False
+
 def testar_conexao_banco():
     """
     Testa a conexão com o banco de dados Oracle, realizando uma consulta simples.
@@ -140,7 +530,7 @@ def testar_conexao_banco():
         if resultado:
             print("Conexão com o banco de dados Oracle testada com sucesso.")
         cursor.close()
-    except cx_Oracle.DatabaseError as e:
+    except _erros_banco() as e:
         print(f"Erro ao testar a conexão com o banco de dados Oracle: {e}")
         traceback.print_exc()
     finally:
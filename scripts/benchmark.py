@@ -0,0 +1,289 @@
+# benchmark.py - Benchmarks reprodutíveis das etapas de monitoramento, persistência e visualização
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")  # renderização sem janela: plt.show() não bloqueia
+warnings.filterwarnings("ignore", message=".*non-interactive.*")
+
+import cv2
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.ndimage as ndimage
+
+from monitoramento import (BANDA_AZUL, BANDA_NIR, BANDA_VERDE, BANDA_VERMELHA, analisar_imagem, calcular_ndvi,
+                           carregar_imagem_multiespectral, detectar_problemas, detectar_problemas_avancado,
+                           identificar_pragas)
+from hierarquico import detectar_problemas_avancado_hierarquico, identificar_pragas_hierarquico
+from indices import calcular_indices
+from sensibilidade import sensibilidade_pragas, sensibilidade_problemas
+from visualizacao import gerar_histograma_ndvi, gerar_mapa_ndvi, plotar_areas_problemas, plotar_imagem_multiespectral
+
+TAMANHOS_PADRAO = [100, 1000, 3000]
+TAMANHOS_COMPLETOS = [100, 1000, 3000, 6000]
+ARQUIVO_BASELINE_PADRAO = "benchmark_baseline.json"
+ORCAMENTO_INICIALIZACAO_PADRAO = 0.5  # segundos para importar main.py a frio
+TOLERANCIA_TEMPO = 0.001  # aumentos de tempo abaixo de 1 ms (ruído de medição) não contam como regressão
+TOLERANCIA_MEMORIA = 1024 ** 2  # aumentos de pico de memória abaixo de 1 MiB não contam como regressão
+LIMIARES_SENSIBILIDADE = np.linspace(0.0, 0.6, 100)  # curva de sensibilidade medida no benchmark
+
+
+def gerar_imagem_sintetica(altura, largura, semente=0):
+    """
+    Gera uma imagem multiespectral sintética e determinística (4 bandas uint8), com vegetação saudável
+    e manchas de estresse de tamanhos variados.
+    :param altura: Altura da imagem em pixels
+    :param largura: Largura da imagem em pixels
+    :param semente: Semente do gerador de números aleatórios
+    :return: Array NumPy (altura, largura, 4)
+    """
+    gerador = np.random.default_rng(semente)
+    imagem = np.empty((altura, largura, 4), dtype=np.uint8)
+    imagem[:, :, BANDA_AZUL] = gerador.integers(20, 80, (altura, largura))
+    imagem[:, :, BANDA_VERDE] = gerador.integers(30, 90, (altura, largura))
+    imagem[:, :, BANDA_VERMELHA] = gerador.integers(20, 60, (altura, largura))
+
+    # Campo de estresse suave: ruído de baixa resolução ampliado, que gera manchas contíguas de NDVI baixo
+    grosseiro = gerador.random((max(altura // 32, 2), max(largura // 32, 2)))
+    estresse = ndimage.zoom(grosseiro, (altura / grosseiro.shape[0], largura / grosseiro.shape[1]), order=1)
+    estresse = estresse[:altura, :largura]
+    nir = np.where(estresse > 0.8, gerador.integers(20, 60, (altura, largura)), gerador.integers(140, 230, (altura, largura)))
+    imagem[:, :, BANDA_NIR] = nir
+    return imagem
+
+
+def medir(funcao, repeticoes):
+    """
+    Executa a função repetidas vezes e mede o menor tempo e o pico de memória alocada (tracemalloc).
+    :return: Tupla (resultado, menor tempo em segundos, pico de memória em bytes)
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+        plt.close("all")
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    plt.close("all")
+    return resultado, min(tempos), pico
+
+
+def _etapas(imagem, caminho_tiff, conexao):
+    """
+    Define as etapas do fluxo, na ordem em que são executadas, cada uma dependendo das anteriores.
+    """
+    dados = {}
+
+    def ndvi():
+        dados["ndvi"] = calcular_ndvi(imagem[:, :, BANDA_NIR], imagem[:, :, BANDA_VERMELHA])
+        return dados["ndvi"]
+
+    def pragas():
+        dados["pragas"] = identificar_pragas(dados["ndvi"], imagem[:, :, BANDA_VERDE], imagem[:, :, BANDA_AZUL])
+        return dados["pragas"]
+
+    def problemas_avancado():
+        dados["problemas"] = detectar_problemas_avancado(dados["ndvi"])
+        return dados["problemas"]
+
+    etapas = [
+        ("carregar_imagem", lambda: carregar_imagem_multiespectral(caminho_tiff)),
+        ("calcular_ndvi", ndvi),
+        ("analisar_imagem", lambda: analisar_imagem(imagem)),
+        ("analisar_imagem_threads", lambda: analisar_imagem(imagem, num_threads=None)),
+        ("calcular_indices", lambda: calcular_indices(imagem, ("NDVI", "GNDVI", "SAVI", "EVI"))),
+        ("detectar_problemas", lambda: detectar_problemas(dados["ndvi"])),
+        ("detectar_problemas_avancado", problemas_avancado),
+        ("identificar_pragas", pragas),
+        ("detectar_problemas_avancado_hierarquico", lambda: detectar_problemas_avancado_hierarquico(dados["ndvi"])),
+        ("sensibilidade_problemas", lambda: sensibilidade_problemas(dados["ndvi"], LIMIARES_SENSIBILIDADE)),
+        ("sensibilidade_pragas", lambda: sensibilidade_pragas(dados["ndvi"], imagem[:, :, BANDA_VERDE], imagem[:, :, BANDA_AZUL],
+                                                              LIMIARES_SENSIBILIDADE, 50)),
+        ("identificar_pragas_hierarquico",
+         lambda: identificar_pragas_hierarquico(dados["ndvi"], imagem[:, :, BANDA_VERDE], imagem[:, :, BANDA_AZUL])),
+    ]
+    if conexao is not None:
+        from banco import salvar_dados_banco
+        etapas.append(("salvar_dados_banco",
+                       lambda: salvar_dados_banco(conexao, dados["ndvi"], dados["problemas"], dados["pragas"])))
+    etapas += [
+        ("gerar_mapa_ndvi", lambda: gerar_mapa_ndvi(dados["ndvi"])),
+        ("gerar_histograma_ndvi", lambda: gerar_histograma_ndvi(dados["ndvi"])),
+        ("plotar_imagem_multiespectral", lambda: plotar_imagem_multiespectral(imagem)),
+        ("plotar_areas_problemas", lambda: plotar_areas_problemas(dados["ndvi"], dados["problemas"])),
+    ]
+    return etapas
+
+
+def executar_benchmarks(tamanhos, repeticoes=3, incluir_banco=True, incluir_visualizacao=True):
+    """
+    Executa todas as etapas para cada tamanho de imagem sintética.
+    :param tamanhos: Lista de lados (em pixels) das imagens quadradas
+    :param repeticoes: Repetições de cada medição de tempo (vale o menor tempo)
+    :param incluir_banco: Inclui a gravação no banco (SQLite local no lugar do Oracle)
+    :param incluir_visualizacao: Inclui as funções de visualização
+    :return: Dicionário {"etapa@LxA": {"tempo": segundos, "memoria_pico": bytes, "megapixels": MPix}}
+    """
+    conexao = None
+    if incluir_banco:
+        from banco import conectar_banco_local
+        conexao = conectar_banco_local()
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for tamanho in tamanhos:
+            imagem = gerar_imagem_sintetica(tamanho, tamanho)
+            caminho_tiff = os.path.join(diretorio, f"sintetica_{tamanho}.tif")
+            cv2.imwrite(caminho_tiff, imagem)
+            for nome, funcao in _etapas(imagem, caminho_tiff, conexao):
+                if not incluir_visualizacao and nome.startswith(("gerar_", "plotar_")):
+                    continue
+                _, tempo, pico = medir(funcao, repeticoes)
+                chave = f"{nome}@{tamanho}x{tamanho}"
+                resultados[chave] = {"tempo": tempo, "memoria_pico": pico, "megapixels": tamanho * tamanho / 1e6}
+                print(f"{chave:<45} {tempo * 1000:>10.2f} ms {pico / 1024 ** 2:>10.1f} MiB")
+    if conexao is not None:
+        conexao.close()
+    return resultados
+
+
+def medir_inicializacao(modulo="main", repeticoes=3):
+    """
+    Mede o tempo de importação de um módulo em um interpretador novo (python -X importtime), como em uma
+    execução a frio disparada pelo cron.
+    :param modulo: Módulo medido (padrão: main)
+    :param repeticoes: Execuções do interpretador (vale a mais rápida)
+    :return: Tupla (tempo total em segundos, lista de (importação direta, segundos) da mais lenta à mais rápida)
+    """
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    melhor = None
+    for _ in range(repeticoes):
+        processo = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"], cwd=diretorio,
+                                  capture_output=True, text=True, check=True)
+        total = 0.0
+        diretas = []
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith("import time:") or "cumulative" in linha:
+                continue
+            _, acumulado, nome = linha[len("import time:"):].split("|")
+            nivel = (len(nome) - len(nome.lstrip())) // 2
+            # As importações aparecem antes do módulo que as fez: as de nível 1 pertencem ao próximo nível 0
+            if nivel == 0 and nome.strip() == modulo:
+                total = int(acumulado) / 1e6
+                break
+            if nivel == 0:
+                diretas = []
+            elif nivel == 1:
+                diretas.append((nome.strip(), int(acumulado) / 1e6))
+        if melhor is None or total < melhor[0]:
+            melhor = (total, sorted(diretas, key=lambda item: -item[1]))
+    return melhor
+
+
+def comparar_com_baseline(resultados, baseline, limite_regressao, limite_regressao_memoria=None):
+    """
+    Compara os tempos e os picos de memória medidos com a baseline gravada.
+    :param resultados: Resultados de executar_benchmarks
+    :param baseline: Resultados gravados anteriormente
+    :param limite_regressao: Aumento relativo de tempo tolerado (ex: 0.2 = 20%); aumentos menores que
+                             TOLERANCIA_TEMPO são ignorados
+    :param limite_regressao_memoria: Aumento relativo do pico de memória tolerado (padrão: o mesmo do tempo);
+                                     aumentos menores que TOLERANCIA_MEMORIA são ignorados
+    :return: Lista de tuplas (etapa, grandeza ('tempo' ou 'memoria_pico'), valor da baseline, valor atual)
+             das etapas que regrediram
+    """
+    if limite_regressao_memoria is None:
+        limite_regressao_memoria = limite_regressao
+    regressoes = []
+    for chave, medicao in resultados.items():
+        if chave not in baseline:
+            continue
+        anterior = baseline[chave]
+        limite_tempo = max(anterior["tempo"] * (1 + limite_regressao), anterior["tempo"] + TOLERANCIA_TEMPO)
+        if medicao["tempo"] > limite_tempo:
+            regressoes.append((chave, "tempo", anterior["tempo"], medicao["tempo"]))
+        limite_memoria = max(anterior.get("memoria_pico", 0) * (1 + limite_regressao_memoria),
+                             anterior.get("memoria_pico", 0) + TOLERANCIA_MEMORIA)
+        if "memoria_pico" in anterior and medicao["memoria_pico"] > limite_memoria:
+            regressoes.append((chave, "memoria_pico", anterior["memoria_pico"], medicao["memoria_pico"]))
+    return regressoes
+
+
+def main(argumentos=None):
+    """
+    Ponto de entrada da linha de comando dos benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas do sistema de monitoramento da lavoura.")
+    parser.add_argument("--tamanhos", type=lambda texto: [int(t) for t in texto.split(",")], default=None,
+                        help="Lados das imagens sintéticas, separados por vírgula (padrão: 100,1000,3000)")
+    parser.add_argument("--completo", action="store_true", help="Inclui imagens de dezenas de megapixels")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições por medição de tempo")
+    parser.add_argument("--sem-banco", action="store_true", help="Não mede a gravação no banco de dados")
+    parser.add_argument("--sem-visualizacao", action="store_true", help="Não mede as funções de visualização")
+    parser.add_argument("--baseline", default=ARQUIVO_BASELINE_PADRAO, help="Arquivo JSON da baseline")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como nova baseline")
+    parser.add_argument("--inicializacao", action="store_true",
+                        help="Mede apenas o tempo de inicialização (importação) do main.py e verifica o orçamento")
+    parser.add_argument("--orcamento-inicializacao", type=float, default=ORCAMENTO_INICIALIZACAO_PADRAO,
+                        help="Tempo máximo, em segundos, de inicialização do main.py (padrão: 0.5)")
+    parser.add_argument("--limite-regressao", type=float, default=0.2,
+                        help="Aumento relativo de tempo considerado regressão (padrão: 0.2)")
+    parser.add_argument("--limite-regressao-memoria", type=float, default=None,
+                        help="Aumento relativo do pico de memória considerado regressão (padrão: o mesmo do tempo)")
+    args = parser.parse_args(argumentos)
+
+    if args.inicializacao:
+        total, diretas = medir_inicializacao("main", args.repeticoes)
+        for nome, tempo in diretas[:10]:
+            print(f"{nome:<45} {tempo * 1000:>10.2f} ms")
+        print(f"{'main (total)':<45} {total * 1000:>10.2f} ms")
+        if total > args.orcamento_inicializacao:
+            print(f"ACIMA DO ORÇAMENTO: {total * 1000:.2f} ms > {args.orcamento_inicializacao * 1000:.2f} ms")
+            return 1
+        print("Inicialização dentro do orçamento.")
+        return 0
+
+    tamanhos = args.tamanhos or (TAMANHOS_COMPLETOS if args.completo else TAMANHOS_PADRAO)
+    resultados = executar_benchmarks(tamanhos, args.repeticoes, not args.sem_banco, not args.sem_visualizacao)
+
+    if args.salvar_baseline:
+        with open(args.baseline, "w") as arquivo:
+            json.dump(resultados, arquivo, indent=4)
+        print(f"Baseline salva em {args.baseline}.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} não encontrada; use --salvar-baseline para criá-la.")
+        return 0
+
+    with open(args.baseline, "r") as arquivo:
+        baseline = json.load(arquivo)
+    regressoes = comparar_com_baseline(resultados, baseline, args.limite_regressao, args.limite_regressao_memoria)
+    for chave, grandeza, valor_baseline, valor_atual in regressoes:
+        if grandeza == "tempo":
+            print(f"REGRESSÃO {chave}: {valor_baseline * 1000:.2f} ms -> {valor_atual * 1000:.2f} ms")
+        else:
+            print(f"REGRESSÃO DE MEMÓRIA {chave}: {valor_baseline / 1024 ** 2:.1f} MiB -> "
+                  f"{valor_atual / 1024 ** 2:.1f} MiB")
+    if not regressoes:
+        print("Nenhuma regressão em relação à baseline.")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
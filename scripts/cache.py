@@ -0,0 +1,216 @@
+# cache.py - Cache de resultados (NDVI, máscaras de detecção) endereçado pelo conteúdo das imagens
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+LIMITE_MEMORIA_PADRAO = 512 * 1024 ** 2
+LIMITE_DISCO_PADRAO = 4 * 1024 ** 3
+
+
+def _tamanho_valor(valor):
+    """
+    Calcula quantos bytes de arrays um valor armazenado ocupa.
+    """
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    return sum(v.nbytes for v in valor.values() if isinstance(v, np.ndarray))
+
+
+def _proteger_valor(valor):
+    """
+    Marca os arrays armazenados como somente leitura, para que não sejam alterados depois de entrar no cache.
+    """
+    arrays = [valor] if isinstance(valor, np.ndarray) else [v for v in valor.values() if isinstance(v, np.ndarray)]
+    for array in arrays:
+        array.setflags(write=False)
+
+
+class CacheResultados:
+    """
+    Cache de resultados em duas camadas, endereçado por um hash do conteúdo das bandas e dos parâmetros:
+    - memória: LRU limitada por um orçamento em bytes;
+    - disco (opcional): um arquivo .npy por array ou, para dicionários, um diretório com um .npy por item,
+      lidos mapeados em memória e removidos por ordem de último acesso quando o diretório ultrapassa o
+      limite de tamanho; valores maiores que o limite não são gravados em disco.
+    Os valores armazenados são arrays NumPy ou dicionários de arrays e escalares.
+    Os contadores de acertos, falhas e remoções ficam em self.estatisticas.
+    """
+
+    def __init__(self, limite_memoria=LIMITE_MEMORIA_PADRAO, diretorio=None, limite_disco=LIMITE_DISCO_PADRAO):
+        """
+        :param limite_memoria: Orçamento, em bytes, da camada em memória
+        :param diretorio: Diretório da camada em disco (None desativa a camada)
+        :param limite_disco: Tamanho máximo, em bytes, do diretório da camada em disco
+        """
+        self.limite_memoria = limite_memoria
+        self.diretorio = diretorio
+        self.limite_disco = limite_disco
+        self.estatisticas = {
+            "acertos_memoria": 0,
+            "acertos_disco": 0,
+            "falhas": 0,
+            "remocoes_memoria": 0,
+            "remocoes_disco": 0,
+        }
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            # O diretório pode ficar em qualquer lugar (AGROTECH_CACHE): ele próprio se exclui do controle de versão
+            ignorar = os.path.join(diretorio, '.gitignore')
+            if not os.path.exists(ignorar):
+                with open(ignorar, 'w') as arquivo:
+                    arquivo.write('*\n')
+
+    @staticmethod
+    def gerar_chave(*partes, **parametros):
+        """
+        Gera a chave de cache a partir de arrays (pelo conteúdo, formato e tipo), chaves já geradas,
+        nomes de funções e parâmetros (ex: limiar, tamanho_minimo, limiar_cor).
+        :return: Chave hexadecimal
+        """
+        resumo = hashlib.blake2b(digest_size=20)
+        for parte in list(partes) + sorted(parametros.items()):
+            if isinstance(parte, np.ndarray):
+                resumo.update(f"{parte.dtype.str}{parte.shape}".encode())
+                resumo.update(memoryview(np.ascontiguousarray(parte)).cast('B'))
+            else:
+                resumo.update(repr(parte).encode())
+            resumo.update(b'|')
+        return resumo.hexdigest()
+
+    def obter(self, chave):
+        """
+        Busca um resultado no cache (primeiro em memória, depois em disco). Acertos em disco também passam
+        para a camada em memória, para que os seguintes não precisem reabrir os arquivos.
+        :param chave: Chave gerada por gerar_chave
+        :return: O valor armazenado, ou None se não estiver no cache
+        """
+        if chave in self._memoria:
+            self._memoria.move_to_end(chave)
+            self.estatisticas["acertos_memoria"] += 1
+            return self._memoria[chave]
+
+        caminho = self._caminho_disco(chave)
+        if caminho is not None:
+            try:
+                os.utime(caminho)
+                if caminho.endswith('.npy'):
+                    valor = np.load(caminho, mmap_mode='r')
+                else:
+                    valor = {}
+                    for nome in os.listdir(caminho):
+                        item = np.load(os.path.join(caminho, nome), mmap_mode='r')
+                        # Escalares (ex: NDVI_Medio) são gravados como arrays de dimensão 0
+                        valor[nome[:-len('.npy')]] = item.item() if item.ndim == 0 else item
+            except FileNotFoundError:
+                # Removido por outro processo ao liberar espaço em disco
+                valor = None
+            if valor is not None:
+                self.estatisticas["acertos_disco"] += 1
+                self._guardar_memoria(chave, valor)
+                return valor
+
+        self.estatisticas["falhas"] += 1
+        return None
+
+    def guardar(self, chave, valor):
+        """
+        Armazena um resultado nas duas camadas do cache. Os arrays passam a ser somente leitura.
+        :param chave: Chave gerada por gerar_chave
+        :param valor: Array NumPy ou dicionário de arrays e escalares
+        """
+        _proteger_valor(valor)
+        self._guardar_memoria(chave, valor)
+        if self.diretorio:
+            self._guardar_disco(chave, valor)
+
+    def obter_ou_calcular(self, chave, funcao, *args, **kwargs):
+        """
+        Devolve o resultado em cache ou, se ausente, calcula-o com funcao(*args, **kwargs) e o armazena.
+        """
+        valor = self.obter(chave)
+        if valor is None:
+            valor = funcao(*args, **kwargs)
+            self.guardar(chave, valor)
+        return valor
+
+    def limpar_memoria(self):
+        """
+        Esvazia a camada em memória (a camada em disco é mantida).
+        """
+        self._memoria.clear()
+        self._bytes_memoria = 0
+
+    def _guardar_memoria(self, chave, valor):
+        tamanho = _tamanho_valor(valor)
+        if tamanho > self.limite_memoria:
+            return
+        if chave in self._memoria:
+            self._bytes_memoria -= _tamanho_valor(self._memoria.pop(chave))
+        self._memoria[chave] = valor
+        self._bytes_memoria += tamanho
+        while self._bytes_memoria > self.limite_memoria:
+            _, removido = self._memoria.popitem(last=False)
+            self._bytes_memoria -= _tamanho_valor(removido)
+            self.estatisticas["remocoes_memoria"] += 1
+
+    def _caminho_disco(self, chave):
+        if not self.diretorio:
+            return None
+        for caminho in (os.path.join(self.diretorio, chave + '.npy'), os.path.join(self.diretorio, chave)):
+            if os.path.exists(caminho):
+                return caminho
+        return None
+
+    def _guardar_disco(self, chave, valor):
+        if _tamanho_valor(valor) > self.limite_disco:
+            return
+        if isinstance(valor, np.ndarray):
+            caminho = os.path.join(self.diretorio, chave + '.npy')
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, 'wb') as arquivo:
+                np.save(arquivo, valor)
+            os.replace(temporario, caminho)
+        else:
+            # Um .npy por item, no mesmo diretório, para que cada array possa ser mapeado em memória na leitura
+            caminho = os.path.join(self.diretorio, chave)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            os.makedirs(temporario, exist_ok=True)
+            for nome, item in valor.items():
+                np.save(os.path.join(temporario, f"{nome}.npy"), np.asarray(item))
+            try:
+                os.replace(temporario, caminho)
+            except OSError:
+                # Outro processo já gravou o mesmo resultado
+                shutil.rmtree(temporario, ignore_errors=True)
+        self._remover_excesso_disco()
+
+    def _remover_excesso_disco(self):
+        entradas = []
+        for entrada in os.scandir(self.diretorio):
+            if entrada.name.endswith('.tmp'):
+                continue
+            if entrada.is_file() and entrada.name.endswith('.npy'):
+                tamanho = entrada.stat().st_size
+            elif entrada.is_dir():
+                tamanho = sum(item.stat().st_size for item in os.scandir(entrada.path) if item.is_file())
+            else:
+                continue
+            entradas.append((entrada.stat().st_mtime, tamanho, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.limite_disco:
+                break
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho, ignore_errors=True)
+            else:
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+            total -= tamanho
+            self.estatisticas["remocoes_disco"] += 1
@@ -0,0 +1,120 @@
+# hierarquico.py - Detecção hierárquica (do grosseiro ao detalhado) de áreas problemáticas e pragas
+import numpy as np
+import scipy.ndimage as ndimage
+from metricas import medir_etapa
+from monitoramento import detectar_problemas_avancado
+from rotulagem import detectar_componentes_em_blocos
+
+# Lado, em pixels, dos blocos da visão geral usada para descartar regiões saudáveis
+TAMANHO_BLOCO_HIERARQUICO = 64
+
+
+def _reduzir_blocos(reducao, array, tamanho_bloco):
+    """
+    Reduz cada bloco do array a um valor com uma ufunc (ex: np.fmin), sem criar máscaras por pixel.
+    """
+    altura, largura = array.shape
+    # Redução das linhas de cada faixa de blocos com leitura contígua (reduceat no eixo 0 é bem mais lento)
+    por_faixa = np.empty((-(-altura // tamanho_bloco), largura), dtype=array.dtype)
+    for indice, inicio in enumerate(range(0, altura, tamanho_bloco)):
+        reducao.reduce(array[inicio:inicio + tamanho_bloco], axis=0, out=por_faixa[indice])
+    return reducao.reduceat(por_faixa, np.arange(0, largura, tamanho_bloco), axis=1)
+
+
+def minimo_por_bloco(array, tamanho_bloco=TAMANHO_BLOCO_HIERARQUICO):
+    """
+    Calcula o mínimo de cada bloco do array (visão geral conservadora para testes "abaixo do limiar").
+    Valores NaN são ignorados, como na comparação pixel a pixel, em que NaN nunca fica abaixo do limiar.
+    :param array: Array 2D (ex: NDVI)
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :return: Array com uma posição por bloco
+    """
+    return _reduzir_blocos(np.fmin, array, tamanho_bloco)
+
+
+def maximo_por_bloco(array, tamanho_bloco=TAMANHO_BLOCO_HIERARQUICO):
+    """
+    Calcula o máximo de cada bloco do array (visão geral conservadora para testes "acima do limiar").
+    :param array: Array 2D (ex: banda verde ou azul)
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :return: Array com uma posição por bloco
+    """
+    return _reduzir_blocos(np.fmax, array, tamanho_bloco)
+
+
+def _regioes_candidatas(blocos, tamanho_bloco, formato):
+    """
+    Percorre os retângulos (em pixels) que envolvem cada grupo conexo de blocos candidatos.
+    """
+    grupos, _ = ndimage.label(blocos)
+    for fatias in ndimage.find_objects(grupos):
+        yield (slice(fatias[0].start * tamanho_bloco, min(fatias[0].stop * tamanho_bloco, formato[0])),
+               slice(fatias[1].start * tamanho_bloco, min(fatias[1].stop * tamanho_bloco, formato[1])))
+
+
+@medir_etapa("detectar_problemas_hierarquico")
+def detectar_problemas_hierarquico(ndvi, limiar=0.3, tamanho_bloco=TAMANHO_BLOCO_HIERARQUICO):
+    """
+    Detecta áreas problemáticas (NDVI abaixo do limiar) comparando pixel a pixel apenas os grupos de blocos
+    cujo NDVI mínimo está abaixo do limiar. O resultado é idêntico ao de detectar_problemas.
+    :param ndvi: Array contendo os valores de NDVI
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param tamanho_bloco: Lado, em pixels, dos blocos da visão geral
+    :return: Máscara binária indicando áreas problemáticas
+    """
+    problemas = np.zeros(ndvi.shape, dtype=bool)
+    for linhas, colunas in _regioes_candidatas(minimo_por_bloco(ndvi, tamanho_bloco) < limiar, tamanho_bloco,
+                                               ndvi.shape):
+        np.less(ndvi[linhas, colunas], limiar, out=problemas[linhas, colunas])
+    return problemas
+
+
+@medir_etapa("detectar_problemas_avancado_hierarquico")
+def detectar_problemas_avancado_hierarquico(ndvi, limiar=0.3, tamanho_minimo=5, tamanho_bloco=TAMANHO_BLOCO_HIERARQUICO):
+    """
+    Análise avançada de problemas (limiar + tamanho mínimo da área) que rotula os componentes apenas nos
+    grupos de blocos cujo NDVI mínimo está abaixo do limiar. Como nenhum pixel problemático existe fora
+    desses blocos, nenhuma área atravessa a fronteira de um grupo e o resultado é idêntico ao de
+    detectar_problemas_avancado; o tempo passa a depender da área com problemas, e não da área da lavoura.
+    :param ndvi: Array contendo os valores de NDVI
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
+    :param tamanho_bloco: Lado, em pixels, dos blocos da visão geral
+    :return: Máscara binária indicando áreas problemáticas
+    """
+    if tamanho_minimo <= 0:
+        # Com tamanho mínimo nulo o fundo (rótulo 0, tamanho 0) também é marcado: a análise completa é necessária
+        return detectar_problemas_avancado(ndvi, limiar, tamanho_minimo)
+    problemas = np.zeros(ndvi.shape, dtype=bool)
+    detectar_componentes_em_blocos(ndvi, limiar, tamanho_minimo, minimo_por_bloco(ndvi, tamanho_bloco) < limiar,
+                                   tamanho_bloco, problemas)
+    return problemas
+
+
+@medir_etapa("identificar_pragas_hierarquico")
+def identificar_pragas_hierarquico(ndvi, banda_verde, banda_azul, limiar_ndvi=0.3, limiar_cor=50,
+                                   tamanho_bloco=TAMANHO_BLOCO_HIERARQUICO):
+    """
+    Identifica possíveis pragas examinando pixel a pixel apenas os blocos que podem conter pragas:
+    NDVI mínimo abaixo do limiar e valores máximos das bandas verde e azul acima do limiar de cor.
+    O resultado é idêntico ao de identificar_pragas.
+    :param ndvi: Array contendo os valores de NDVI
+    :param banda_verde: Array contendo os valores da banda verde
+    :param banda_azul: Array contendo os valores da banda azul
+    :param limiar_ndvi: Limiar de NDVI para indicar vegetação problemática
+    :param limiar_cor: Limiar de cor para identificar possíveis pragas
+    :param tamanho_bloco: Lado, em pixels, dos blocos da visão geral
+    :return: Máscara binária indicando áreas com possível presença de pragas
+    """
+    candidatos = minimo_por_bloco(ndvi, tamanho_bloco) < limiar_ndvi
+    # As bandas só são reduzidas se o NDVI indicar algum bloco com possível problema
+    if candidatos.any():
+        candidatos &= maximo_por_bloco(banda_verde, tamanho_bloco) > limiar_cor
+    if candidatos.any():
+        candidatos &= maximo_por_bloco(banda_azul, tamanho_bloco) > limiar_cor
+
+    pragas = np.zeros(ndvi.shape, dtype=bool)
+    for linhas, colunas in _regioes_candidatas(candidatos, tamanho_bloco, ndvi.shape):
+        pragas[linhas, colunas] = ((ndvi[linhas, colunas] < limiar_ndvi) & (banda_verde[linhas, colunas] > limiar_cor)
+                                   & (banda_azul[linhas, colunas] > limiar_cor))
+    return pragas
@@ -0,0 +1,112 @@
+# histograma.py - Histograma incremental do NDVI, com contagens exatas e percentis aproximados
+import numpy as np
+
+NUM_CLASSES_PADRAO = 2000
+ELEMENTOS_POR_PASSADA = 1 << 20
+
+
+class HistogramaNDVI:
+    """
+    Histograma de classes fixas sobre o domínio do NDVI ([-1, 1]), atualizado bloco a bloco e combinável
+    entre processos e imagens, sem nunca materializar o array achatado.
+    As contagens por classe são exatas; os percentis são interpolados dentro da classe, com erro máximo
+    de uma largura de classe (0,001 com as 2000 classes padrão).
+    Valores fora do domínio são contados nas classes das extremidades; valores NaN são contados à parte.
+    """
+
+    def __init__(self, num_classes=NUM_CLASSES_PADRAO, minimo=-1.0, maximo=1.0):
+        """
+        :param num_classes: Número de classes de mesma largura
+        :param minimo: Limite inferior do domínio
+        :param maximo: Limite superior do domínio
+        """
+        self.num_classes = num_classes
+        self.minimo = minimo
+        self.maximo = maximo
+        self.contagens = np.zeros(num_classes, dtype=np.int64)
+        self.nao_finitos = 0
+
+    @property
+    def total(self):
+        """
+        Número de valores válidos (não NaN) acumulados.
+        """
+        return int(self.contagens.sum())
+
+    @property
+    def bordas(self):
+        """
+        Bordas das classes (num_classes + 1 valores).
+        """
+        return np.linspace(self.minimo, self.maximo, self.num_classes + 1)
+
+    def atualizar(self, valores):
+        """
+        Acumula os valores de um bloco ou de uma imagem inteira, em passadas de tamanho limitado.
+        :param valores: Array NumPy de NDVI (qualquer formato)
+        :return: O próprio histograma
+        """
+        valores = np.atleast_1d(valores)
+        escala = self.num_classes / (self.maximo - self.minimo)
+        tamanho_linha = max(valores[0].size, 1) if valores.ndim > 1 else 1
+        linhas_por_passada = max(1, ELEMENTOS_POR_PASSADA // tamanho_linha)
+        for inicio in range(0, valores.shape[0], linhas_por_passada):
+            posicoes = np.subtract(valores[inicio:inicio + linhas_por_passada], self.minimo, dtype=np.float64).ravel()
+            posicoes *= escala
+            np.clip(posicoes, 0, self.num_classes - 1, out=posicoes)
+            invalidos = np.isnan(posicoes)
+            if invalidos.any():
+                self.nao_finitos += int(np.count_nonzero(invalidos))
+                posicoes = posicoes[~invalidos]
+            self.contagens += np.bincount(posicoes.astype(np.intp), minlength=self.num_classes)
+        return self
+
+    def mesclar(self, outro):
+        """
+        Soma ao histograma as contagens de outro histograma de mesmas classes (ex: de outro processo ou imagem).
+        :param outro: HistogramaNDVI com o mesmo domínio e número de classes
+        :return: O próprio histograma
+        """
+        if (outro.num_classes, outro.minimo, outro.maximo) != (self.num_classes, self.minimo, self.maximo):
+            raise ValueError("Os histogramas possuem classes diferentes e não podem ser mesclados.")
+        self.contagens += outro.contagens
+        self.nao_finitos += outro.nao_finitos
+        return self
+
+    def quantil(self, q):
+        """
+        Calcula quantis aproximados por interpolação linear dentro da classe.
+        :param q: Quantil ou array de quantis entre 0 e 1
+        :return: Valor(es) de NDVI correspondente(s), ou NaN se o histograma estiver vazio
+        """
+        q = np.asarray(q, dtype=np.float64)
+        total = self.total
+        if total == 0:
+            return np.full(q.shape, np.nan)[()]
+        acumulado = np.cumsum(self.contagens)
+        posicao = np.clip(q, 0.0, 1.0) * total
+        classe = np.minimum(np.searchsorted(acumulado, posicao, side='left'), self.num_classes - 1)
+        anteriores = acumulado[classe] - self.contagens[classe]
+        fracao = (posicao - anteriores) / np.maximum(self.contagens[classe], 1)
+        largura = (self.maximo - self.minimo) / self.num_classes
+        return (self.minimo + (classe + np.clip(fracao, 0.0, 1.0)) * largura)[()]
+
+    def percentis(self, percentis=(5, 50, 95)):
+        """
+        Calcula percentis aproximados do NDVI.
+        :param percentis: Percentis desejados (0 a 100)
+        :return: Dicionário {'P5': valor, 'P50': valor, 'P95': valor}
+        """
+        valores = np.atleast_1d(self.quantil(np.asarray(percentis, dtype=np.float64) / 100))
+        return {f"P{p:g}": float(v) for p, v in zip(percentis, valores)}
+
+    def reagrupar(self, num_classes):
+        """
+        Agrupa as classes em um histograma mais grosseiro (ex: para exibição).
+        :param num_classes: Número de classes desejado (divisor do número de classes do histograma)
+        :return: Tupla (contagens, bordas)
+        """
+        if self.num_classes % num_classes:
+            raise ValueError(f"{num_classes} não divide o número de classes do histograma ({self.num_classes}).")
+        contagens = self.contagens.reshape(num_classes, -1).sum(axis=1)
+        return contagens, np.linspace(self.minimo, self.maximo, num_classes + 1)
@@ -0,0 +1,343 @@
+# incremental.py - Análise incremental de voos repetidos sobre a mesma área, recalculando apenas os blocos alterados
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy.ndimage as ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from monitoramento import BANDA_NIR, BANDA_VERMELHA, calcular_ndvi, carregar_imagem_multiespectral, iterar_blocos
+from rotulagem import detectar_componentes_em_blocos
+
+ARQUIVO_ESTADO = "estado.json"
+ARQUIVO_IMPRESSOES = "impressoes.npy"
+ARQUIVO_SOMAS = "somas_ndvi.npy"
+ARQUIVO_CONTAGENS = "problemas_blocos.npy"
+ARQUIVO_TRAVESSIAS_HORIZONTAIS = "travessias_horizontais.npy"
+ARQUIVO_TRAVESSIAS_VERTICAIS = "travessias_verticais.npy"
+ARQUIVO_NDVI = "ndvi.npy"
+ARQUIVO_PROBLEMAS = "problemas.npy"
+
+
+def calcular_impressoes_blocos(imagem, tamanho_bloco):
+    """
+    Calcula a impressão digital (hash blake2b de 16 bytes) do conteúdo de cada bloco da imagem.
+    :param imagem: Array NumPy contendo as diferentes bandas espectrais
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :return: Array (linhas de blocos, colunas de blocos, 16) de bytes
+    """
+    linhas = -(-imagem.shape[0] // tamanho_bloco)
+    colunas = -(-imagem.shape[1] // tamanho_bloco)
+    impressoes = np.empty((linhas, colunas, 16), dtype=np.uint8)
+    for (fatia_linhas, fatia_colunas), bloco in iterar_blocos(imagem, tamanho_bloco):
+        resumo = hashlib.blake2b(np.ascontiguousarray(bloco).data, digest_size=16).digest()
+        impressoes[fatia_linhas.start // tamanho_bloco, fatia_colunas.start // tamanho_bloco] = np.frombuffer(resumo, np.uint8)
+    return impressoes
+
+
+def _carregar_estado(diretorio_estado, parametros):
+    """
+    Carrega o estado da execução anterior, se existir e tiver sido gerado com os mesmos parâmetros.
+    NDVI e máscara de problemas são mapeados em memória para leitura e escrita, para que apenas os blocos
+    recalculados sejam lidos e regravados.
+    """
+    caminho = os.path.join(diretorio_estado, ARQUIVO_ESTADO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r') as arquivo:
+        if json.load(arquivo) != parametros:
+            return None
+    try:
+        return {
+            "impressoes": np.load(os.path.join(diretorio_estado, ARQUIVO_IMPRESSOES)),
+            "somas": np.load(os.path.join(diretorio_estado, ARQUIVO_SOMAS)),
+            "contagens": np.load(os.path.join(diretorio_estado, ARQUIVO_CONTAGENS)),
+            "travessias": (np.load(os.path.join(diretorio_estado, ARQUIVO_TRAVESSIAS_HORIZONTAIS)),
+                           np.load(os.path.join(diretorio_estado, ARQUIVO_TRAVESSIAS_VERTICAIS))),
+            "ndvi": np.load(os.path.join(diretorio_estado, ARQUIVO_NDVI), mmap_mode='r+'),
+            "problemas": np.load(os.path.join(diretorio_estado, ARQUIVO_PROBLEMAS), mmap_mode='r+'),
+        }
+    except FileNotFoundError:
+        return None
+
+
+def _abrir_estado(diretorio_estado, parametros, formato):
+    """
+    Abre o estado da execução anterior ou, se não houver um compatível, cria os arquivos do NDVI e da máscara
+    de problemas, mapeados em memória. O arquivo de parâmetros é removido enquanto o estado é atualizado no
+    lugar: se a execução for interrompida, a seguinte recalcula todos os blocos.
+    :return: Tupla (estado anterior ou None, NDVI mapeado, máscara de problemas mapeada)
+    """
+    estado = _carregar_estado(diretorio_estado, parametros)
+    os.makedirs(diretorio_estado, exist_ok=True)
+    caminho = os.path.join(diretorio_estado, ARQUIVO_ESTADO)
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    if estado is not None:
+        return estado, estado["ndvi"], estado["problemas"]
+    ndvi = np.lib.format.open_memmap(os.path.join(diretorio_estado, ARQUIVO_NDVI), mode='w+', dtype=np.float64,
+                                     shape=formato)
+    problemas = np.lib.format.open_memmap(os.path.join(diretorio_estado, ARQUIVO_PROBLEMAS), mode='w+', dtype=bool,
+                                          shape=formato)
+    return None, ndvi, problemas
+
+
+def _salvar_estado(diretorio_estado, parametros, impressoes, somas, contagens, travessias, ndvi, problemas):
+    """
+    Conclui a gravação do estado desta execução: NDVI e máscara, atualizados no lugar, são descarregados
+    no disco; impressões digitais, somas, contagens e travessias de fronteira por bloco (pequenas) são
+    substituídas de forma atômica.
+    """
+    ndvi.flush()
+    problemas.flush()
+    for nome, array in ((ARQUIVO_IMPRESSOES, impressoes), (ARQUIVO_SOMAS, somas), (ARQUIVO_CONTAGENS, contagens),
+                        (ARQUIVO_TRAVESSIAS_HORIZONTAIS, travessias[0]), (ARQUIVO_TRAVESSIAS_VERTICAIS, travessias[1])):
+        temporario = os.path.join(diretorio_estado, nome + ".tmp")
+        with open(temporario, 'wb') as arquivo:
+            np.save(arquivo, array)
+        os.replace(temporario, os.path.join(diretorio_estado, nome))
+    temporario = os.path.join(diretorio_estado, ARQUIVO_ESTADO + ".tmp")
+    with open(temporario, 'w') as arquivo:
+        json.dump(parametros, arquivo)
+    os.replace(temporario, os.path.join(diretorio_estado, ARQUIVO_ESTADO))
+
+
+def _travessias_fronteiras(ndvi, limiar, tamanho_bloco, formato_blocos):
+    """
+    Indica, para cada par de blocos vizinhos, se algum par de pixels problemáticos atravessa a fronteira entre eles.
+    Todas as linhas e colunas de fronteira são lidas (usada quando não há travessias anteriores a atualizar).
+    :return: Tupla (travessias horizontais (linhas, colunas - 1), travessias verticais (linhas - 1, colunas))
+    """
+    linhas_blocos, colunas_blocos = formato_blocos
+    inicios_linhas = np.arange(linhas_blocos) * tamanho_bloco
+    inicios_colunas = np.arange(colunas_blocos) * tamanho_bloco
+
+    fronteiras = inicios_colunas[1:]
+    horizontais = (np.asarray(ndvi[:, fronteiras - 1]) < limiar) & (np.asarray(ndvi[:, fronteiras]) < limiar)
+    horizontais = np.logical_or.reduceat(horizontais, inicios_linhas, axis=0) if fronteiras.size else \
+        np.zeros((linhas_blocos, 0), dtype=bool)
+
+    fronteiras = inicios_linhas[1:]
+    verticais = (np.asarray(ndvi[fronteiras - 1]) < limiar) & (np.asarray(ndvi[fronteiras]) < limiar)
+    verticais = np.logical_or.reduceat(verticais, inicios_colunas, axis=1) if fronteiras.size else \
+        np.zeros((0, colunas_blocos), dtype=bool)
+    return horizontais, verticais
+
+
+def _atualizar_travessias(ndvi, limiar, tamanho_bloco, alterados, anteriores):
+    """
+    Travessias de fronteiras do voo atual a partir das do voo anterior: apenas os segmentos de fronteira
+    vizinhos a blocos alterados são relidos, pois nos demais o NDVI não mudou.
+    :param anteriores: Travessias do voo anterior (ver _travessias_fronteiras) ou None para calcular todas
+    :return: Tupla (travessias horizontais, travessias verticais)
+    """
+    if anteriores is None or alterados.all():
+        return _travessias_fronteiras(ndvi, limiar, tamanho_bloco, alterados.shape)
+    altura, largura = ndvi.shape
+    horizontais, verticais = anteriores[0].copy(), anteriores[1].copy()
+    for linha_bloco, coluna_bloco in zip(*np.nonzero(alterados[:, :-1] | alterados[:, 1:])):
+        linhas = slice(linha_bloco * tamanho_bloco, min((linha_bloco + 1) * tamanho_bloco, altura))
+        coluna = (coluna_bloco + 1) * tamanho_bloco
+        horizontais[linha_bloco, coluna_bloco] = np.any((np.asarray(ndvi[linhas, coluna - 1]) < limiar)
+                                                        & (np.asarray(ndvi[linhas, coluna]) < limiar))
+    for linha_bloco, coluna_bloco in zip(*np.nonzero(alterados[:-1, :] | alterados[1:, :])):
+        linha = (linha_bloco + 1) * tamanho_bloco
+        colunas = slice(coluna_bloco * tamanho_bloco, min((coluna_bloco + 1) * tamanho_bloco, largura))
+        verticais[linha_bloco, coluna_bloco] = np.any((np.asarray(ndvi[linha - 1, colunas]) < limiar)
+                                                      & (np.asarray(ndvi[linha, colunas]) < limiar))
+    return horizontais, verticais
+
+
+def _blocos_afetados(alterados, travessias):
+    """
+    Expande os blocos alterados para todos os blocos ligados a eles por áreas problemáticas que
+    atravessam fronteiras (no voo anterior ou no atual), cujo resultado também pode mudar.
+    """
+    indices = np.arange(alterados.size).reshape(alterados.shape)
+    origem, destino = [], []
+    for horizontais, verticais in travessias:
+        origem += [indices[:, :-1][horizontais], indices[:-1, :][verticais]]
+        destino += [indices[:, 1:][horizontais], indices[1:, :][verticais]]
+    origem = np.concatenate(origem)
+    destino = np.concatenate(destino)
+    grafo = coo_matrix((np.ones(origem.size, dtype=np.int8), (origem, destino)), shape=(alterados.size,) * 2)
+    _, grupos = connected_components(grafo, directed=False)
+    grupos_alterados = np.unique(grupos[alterados.ravel()])
+    return np.isin(grupos, grupos_alterados).reshape(alterados.shape)
+
+
+def analisar_incremental(imagem, diretorio_estado, tamanho_bloco=256, limiar=0.3, tamanho_minimo=5,
+                         limiar_degradacao=0.1):
+    """
+    Analisa um novo voo da mesma área reaproveitando a execução anterior gravada em diretorio_estado:
+    NDVI e análise avançada de problemas são recalculados apenas nos blocos cujo conteúdo mudou (e nos blocos
+    ligados a eles por áreas problemáticas). O resultado é idêntico ao da análise completa da imagem.
+    O estado é atualizado no lugar (arquivos mapeados em memória): a leitura e a gravação também se
+    limitam aos blocos recalculados e aos segmentos de fronteira vizinhos a eles, pois as travessias de
+    fronteira do voo anterior ficam guardadas no estado.
+    :param imagem: Array NumPy contendo as diferentes bandas espectrais
+    :param diretorio_estado: Diretório onde o estado entre execuções é mantido
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
+    :param limiar_degradacao: Queda mínima do NDVI médio de um bloco para considerá-lo degradado
+    :return: Dicionário com 'ndvi' e 'problemas' (mapeados do estado, somente leitura), 'delta_ndvi'
+             (None na primeira execução), estatísticas,
+             contagem de blocos recalculados e a lista 'areas_degradadas'
+    """
+    parametros = {"formato": list(imagem.shape), "dtype": imagem.dtype.str, "tamanho_bloco": tamanho_bloco,
+                  "limiar": limiar, "tamanho_minimo": tamanho_minimo}
+    altura, largura = imagem.shape[:2]
+    impressoes = calcular_impressoes_blocos(imagem, tamanho_bloco)
+    formato_blocos = impressoes.shape[:2]
+    estado, ndvi, problemas = _abrir_estado(diretorio_estado, parametros, (altura, largura))
+
+    if estado is None:
+        alterados = np.ones(formato_blocos, dtype=bool)
+        somas = np.zeros(formato_blocos)
+        contagens = np.zeros(formato_blocos, dtype=np.int64)
+    else:
+        alterados = np.any(impressoes != estado["impressoes"], axis=2)
+        somas = estado["somas"].copy()
+        contagens = estado["contagens"].copy()
+
+    delta_ndvi = None if estado is None else np.zeros((altura, largura), dtype=np.float32)
+    areas_degradadas = []
+    travessias = None if estado is None else estado["travessias"]
+    if alterados.any():
+        blocos_anteriores = []
+        for (linhas, colunas), bloco in iterar_blocos(imagem, tamanho_bloco):
+            posicao = (linhas.start // tamanho_bloco, colunas.start // tamanho_bloco)
+            if not alterados[posicao]:
+                continue
+            ndvi_bloco = calcular_ndvi(bloco[:, :, BANDA_NIR], bloco[:, :, BANDA_VERMELHA])
+            if estado is not None:
+                anterior = np.array(ndvi[linhas, colunas])
+                blocos_anteriores.append((linhas, colunas, anterior))
+                delta_ndvi[linhas, colunas] = ndvi_bloco - anterior
+            ndvi[linhas, colunas] = ndvi_bloco
+            somas[posicao] = np.sum(ndvi_bloco)
+
+        travessias_anteriores = travessias
+        travessias = _atualizar_travessias(ndvi, limiar, tamanho_bloco, alterados, travessias_anteriores)
+        afetados = _blocos_afetados(alterados, [t for t in (travessias_anteriores, travessias) if t is not None])
+        linhas, colunas = _retangulo_blocos(afetados, tamanho_bloco, (altura, largura))
+        # A máscara anterior só é copiada no retângulo dos blocos afetados, o único trecho que pode mudar
+        problemas_anteriores = None if estado is None else np.array(problemas[linhas, colunas])
+        detectar_componentes_em_blocos(ndvi, limiar, tamanho_minimo, afetados, tamanho_bloco, problemas)
+        contagens[linhas.start // tamanho_bloco:-(-linhas.stop // tamanho_bloco),
+                  colunas.start // tamanho_bloco:-(-colunas.stop // tamanho_bloco)] = \
+            _contar_por_bloco(np.asarray(problemas[linhas, colunas]), tamanho_bloco)
+        if estado is not None:
+            areas_degradadas = _areas_degradadas(ndvi, problemas, (linhas, colunas), blocos_anteriores,
+                                                 problemas_anteriores, estado["somas"], somas, alterados,
+                                                 tamanho_bloco, limiar_degradacao)
+
+    if travessias is None:
+        travessias = _travessias_fronteiras(ndvi, limiar, tamanho_bloco, formato_blocos)
+    _salvar_estado(diretorio_estado, parametros, impressoes, somas, contagens, travessias, ndvi, problemas)
+    del ndvi, problemas, estado
+    return {
+        "ndvi": np.load(os.path.join(diretorio_estado, ARQUIVO_NDVI), mmap_mode='r'),
+        "problemas": np.load(os.path.join(diretorio_estado, ARQUIVO_PROBLEMAS), mmap_mode='r'),
+        "delta_ndvi": delta_ndvi,
+        "NDVI_Medio": float(np.sum(somas)) / (altura * largura),
+        "Problemas_Totais": int(np.sum(contagens)),
+        "Blocos_Recalculados": int(np.count_nonzero(alterados)),
+        "Blocos_Totais": int(alterados.size),
+        "areas_degradadas": areas_degradadas,
+    }
+
+
+def _retangulo_blocos(blocos, tamanho_bloco, formato):
+    """
+    Retângulo, em pixels, que envolve os blocos marcados.
+    :return: Tupla (slice de linhas, slice de colunas)
+    """
+    altura, largura = formato
+    linhas_marcadas = np.flatnonzero(blocos.any(axis=1))
+    colunas_marcadas = np.flatnonzero(blocos.any(axis=0))
+    return (slice(linhas_marcadas[0] * tamanho_bloco, min((linhas_marcadas[-1] + 1) * tamanho_bloco, altura)),
+            slice(colunas_marcadas[0] * tamanho_bloco, min((colunas_marcadas[-1] + 1) * tamanho_bloco, largura)))
+
+
+def _contar_por_bloco(mascara, tamanho_bloco):
+    """
+    Conta os pixels marcados em cada bloco de uma máscara alinhada à grade de blocos.
+    """
+    por_linha = np.add.reduceat(mascara, np.arange(0, mascara.shape[0], tamanho_bloco), axis=0, dtype=np.int64)
+    return np.add.reduceat(por_linha, np.arange(0, mascara.shape[1], tamanho_bloco), axis=1)
+
+
+def _areas_degradadas(ndvi, problemas, retangulo, blocos_anteriores, problemas_anteriores, somas_anteriores, somas,
+                      alterados, tamanho_bloco, limiar_degradacao):
+    """
+    Lista as áreas que passaram a ser problemáticas desde o voo anterior e os blocos cujo NDVI médio
+    caiu pelo menos limiar_degradacao.
+    :param retangulo: Retângulo dos blocos afetados, único trecho em que a máscara de problemas pode ter mudado
+    :param blocos_anteriores: Lista (linhas, colunas, NDVI anterior) dos blocos alterados
+    :param problemas_anteriores: Máscara de problemas anterior, recortada no retângulo
+    """
+    altura, largura = ndvi.shape
+    linhas, colunas = retangulo
+
+    areas = []
+    novos = problemas[linhas, colunas] & ~problemas_anteriores
+    rotulos, num_areas = ndimage.label(novos)
+    if num_areas:
+        # Fora dos blocos alterados o NDVI não mudou: o anterior é o atual com os blocos alterados restaurados
+        atual = np.asarray(ndvi[linhas, colunas])
+        anterior = atual.copy()
+        for linhas_bloco, colunas_bloco, ndvi_anterior in blocos_anteriores:
+            anterior[linhas_bloco.start - linhas.start:linhas_bloco.stop - linhas.start,
+                     colunas_bloco.start - colunas.start:colunas_bloco.stop - colunas.start] = ndvi_anterior
+        delta = atual - anterior
+        pixels = np.bincount(rotulos.ravel(), minlength=num_areas + 1)[1:]
+        deltas = np.bincount(rotulos.ravel(), weights=delta.ravel(), minlength=num_areas + 1)[1:] / pixels
+        for fatias, quantidade, delta_medio in zip(ndimage.find_objects(rotulos), pixels, deltas):
+            areas.append({
+                "tipo": "nova_area_problematica",
+                "linhas": [int(fatias[0].start + linhas.start), int(fatias[0].stop + linhas.start)],
+                "colunas": [int(fatias[1].start + colunas.start), int(fatias[1].stop + colunas.start)],
+                "pixels": int(quantidade),
+                "delta_ndvi_medio": float(delta_medio),
+            })
+
+    alturas_blocos = np.diff(np.minimum(np.arange(alterados.shape[0] + 1) * tamanho_bloco, altura))
+    larguras_blocos = np.diff(np.minimum(np.arange(alterados.shape[1] + 1) * tamanho_bloco, largura))
+    queda = (somas_anteriores - somas) / np.outer(alturas_blocos, larguras_blocos)
+    for linha_bloco, coluna_bloco in zip(*np.nonzero(alterados & (queda >= limiar_degradacao))):
+        areas.append({
+            "tipo": "bloco_degradado",
+            "linhas": [int(linha_bloco * tamanho_bloco), int(min((linha_bloco + 1) * tamanho_bloco, altura))],
+            "colunas": [int(coluna_bloco * tamanho_bloco), int(min((coluna_bloco + 1) * tamanho_bloco, largura))],
+            "delta_ndvi_medio": float(-queda[linha_bloco, coluna_bloco]),
+        })
+    return areas
+
+
+def main(argumentos=None):
+    """
+    Ponto de entrada da linha de comando: analisa um novo voo e exibe o resumo e as áreas degradadas em JSON.
+    """
+    parser = argparse.ArgumentParser(description="Análise incremental de voos repetidos sobre a mesma área.")
+    parser.add_argument("imagem", help="Caminho da imagem multiespectral do novo voo")
+    parser.add_argument("--estado", required=True, help="Diretório com o estado da execução anterior desta área")
+    parser.add_argument("--tamanho-bloco", type=int, default=256, help="Lado, em pixels, de cada bloco")
+    parser.add_argument("--limiar", type=float, default=0.3, help="Limiar de NDVI para áreas problemáticas")
+    parser.add_argument("--tamanho-minimo", type=int, default=5, help="Tamanho mínimo das áreas problemáticas")
+    parser.add_argument("--limiar-degradacao", type=float, default=0.1, help="Queda mínima do NDVI médio por bloco")
+    args = parser.parse_args(argumentos)
+
+    imagem = carregar_imagem_multiespectral(args.imagem)
+    resultado = analisar_incremental(imagem, args.estado, args.tamanho_bloco, args.limiar, args.tamanho_minimo,
+                                     args.limiar_degradacao)
+    resumo = {chave: valor for chave, valor in resultado.items() if chave not in ("ndvi", "problemas", "delta_ndvi")}
+    print(json.dumps(resumo, indent=4, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
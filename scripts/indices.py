@@ -0,0 +1,196 @@
+# indices.py - Cálculo de vários índices de vegetação (NDVI, GNDVI, SAVI, EVI, NDRE) em uma única passada
+import ast
+import json
+
+import numpy as np
+from metricas import medir_etapa
+from monitoramento import BANDA_AZUL, BANDA_NIR, BANDA_VERDE, BANDA_VERMELHA
+
+# Posição de cada banda na imagem, pelo nome usado nas expressões. Sensores com banda red edge
+# (ex: imagens de 5 bandas) devem acrescentar "red_edge" ao mapeamento para calcular o NDRE.
+MAPEAMENTO_BANDAS_PADRAO = {
+    "azul": BANDA_AZUL,
+    "verde": BANDA_VERDE,
+    "vermelho": BANDA_VERMELHA,
+    "nir": BANDA_NIR,
+}
+
+# Expressões dos índices, sobre a reflectância de cada banda (valores entre 0 e 1)
+EXPRESSOES_INDICES = {
+    "NDVI": "(nir - vermelho) / (nir + vermelho + 1e-10)",
+    "GNDVI": "(nir - verde) / (nir + verde + 1e-10)",
+    "SAVI": "1.5 * (nir - vermelho) / (nir + vermelho + 0.5)",
+    "EVI": "2.5 * (nir - vermelho) / (nir + 6 * vermelho - 7.5 * azul + 1)",
+    "NDRE": "(nir - red_edge) / (nir + red_edge + 1e-10)",
+}
+
+# Quantidade de elementos de cada faixa avaliada (bandas e temporários da faixa cabem no cache)
+ELEMENTOS_POR_FAIXA = 1 << 16
+
+_OPERACOES = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+}
+
+
+def carregar_configuracao_indices(caminho):
+    """
+    Lê um arquivo JSON de configuração com o mapeamento de bandas e expressões de índices adicionais, ex:
+    {"bandas": {"azul": 0, "verde": 1, "vermelho": 2, "nir": 3, "red_edge": 4},
+     "indices": {"NDWI": "(verde - nir) / (verde + nir + 1e-10)"}}
+    :param caminho: Caminho do arquivo JSON
+    :return: Tupla (mapeamento de bandas, expressões de índices)
+    """
+    with open(caminho, 'r') as arquivo:
+        configuracao = json.load(arquivo)
+    mapeamento = {**MAPEAMENTO_BANDAS_PADRAO, **configuracao.get("bandas", {})}
+    expressoes = {**EXPRESSOES_INDICES, **configuracao.get("indices", {})}
+    return mapeamento, expressoes
+
+
+class _Programa:
+    """
+    Expressão compilada em uma sequência de operações NumPy com saída em buffers da faixa (out=),
+    reaproveitando os temporários: cada operação escreve sobre um operando que não será mais usado,
+    de modo que nenhuma faixa aloca memória e a última operação escreve direto no array de saída.
+    """
+
+    def __init__(self, expressao):
+        self.expressao = expressao
+        self.instrucoes = []
+        self.bandas = set()
+        self.num_temporarios = 0
+        self._livres = []
+        arvore = ast.parse(expressao, mode='eval').body
+        self.resultado = self._compilar(arvore)
+
+    def _novo_temporario(self):
+        if self._livres:
+            return self._livres.pop()
+        self.num_temporarios += 1
+        return ("temporario", self.num_temporarios - 1)
+
+    def _liberar(self, operando):
+        if operando[0] == "temporario":
+            self._livres.append(operando)
+
+    def _compilar(self, no):
+        if isinstance(no, ast.Constant) and isinstance(no.value, (int, float)):
+            return ("constante", float(no.value))
+        if isinstance(no, ast.Name):
+            self.bandas.add(no.id)
+            return ("banda", no.id)
+        if isinstance(no, ast.UnaryOp) and isinstance(no.op, (ast.USub, ast.UAdd)):
+            operando = self._compilar(no.operand)
+            if isinstance(no.op, ast.UAdd):
+                return operando
+            if operando[0] == "constante":
+                return ("constante", -operando[1])
+            destino = operando if operando[0] == "temporario" else self._novo_temporario()
+            self.instrucoes.append((np.negative, destino, operando))
+            return destino
+        if isinstance(no, ast.BinOp) and type(no.op) in _OPERACOES:
+            operacao = _OPERACOES[type(no.op)]
+            esquerda = self._compilar(no.left)
+            direita = self._compilar(no.right)
+            if esquerda[0] == direita[0] == "constante":
+                return ("constante", float(operacao(esquerda[1], direita[1])))
+            if esquerda[0] == "temporario":
+                destino = esquerda
+                self._liberar(direita)
+            elif direita[0] == "temporario":
+                destino = direita
+            else:
+                destino = self._novo_temporario()
+            self.instrucoes.append((operacao, destino, esquerda, direita))
+            return destino
+        raise ValueError(f"Expressão de índice não suportada: {self.expressao!r} ({ast.dump(no)})")
+
+    def executar(self, bandas, temporarios, saida):
+        """
+        Avalia a expressão sobre as bandas de uma faixa, escrevendo o resultado em saida.
+        """
+        def valor(operando):
+            if operando[0] == "constante":
+                return operando[1]
+            if operando[0] == "banda":
+                return bandas[operando[1]]
+            if operando == self.resultado:
+                return saida
+            return temporarios[operando[1]]
+
+        if not self.instrucoes:
+            saida[...] = valor(self.resultado)
+            return
+        for instrucao in self.instrucoes:
+            operacao, destino, *operandos = instrucao
+            operacao(*(valor(o) for o in operandos), out=valor(destino))
+
+
+def _escala_reflectancia(dtype):
+    """
+    Fator que converte os valores digitais da imagem em reflectância (0 a 1).
+    """
+    if np.issubdtype(dtype, np.integer):
+        return 1.0 / np.iinfo(dtype).max
+    return 1.0 / 255
+
+
+@medir_etapa("calcular_indices")
+def calcular_indices(imagem, indices=("NDVI",), mapeamento=None, expressoes=None, dtype=np.float32, saidas=None):
+    """
+    Calcula vários índices de vegetação em uma única passada sobre as bandas: a imagem é percorrida em
+    faixas de linhas, cada banda usada é convertida para reflectância uma vez por faixa (compartilhada entre
+    todos os índices) e cada expressão é avaliada sobre a faixa com buffers reaproveitados, sem criar arrays
+    temporários do tamanho da imagem. Assim, calcular cinco índices custa pouco mais que uma leitura das bandas.
+    :param imagem: Array NumPy (altura, largura, bandas) com a imagem multiespectral
+    :param indices: Nomes dos índices a calcular (chaves de EXPRESSOES_INDICES ou de expressoes)
+    :param mapeamento: Dicionário nome da banda -> posição na imagem (padrão: MAPEAMENTO_BANDAS_PADRAO)
+    :param expressoes: Expressões adicionais ou substitutas, ex: {"NDWI": "(verde - nir) / (verde + nir)"}
+    :param dtype: Tipo de dado dos índices (padrão: float32)
+    :param saidas: Dicionário nome -> array pré-alocado (ex: criar_saida_mapeada) que recebe o índice, opcional
+    :return: Dicionário nome do índice -> array (altura, largura)
+    """
+    mapeamento = mapeamento or MAPEAMENTO_BANDAS_PADRAO
+    expressoes = {**EXPRESSOES_INDICES, **(expressoes or {})}
+    programas = {}
+    for nome in indices:
+        if nome not in expressoes:
+            raise ValueError(f"Índice desconhecido: {nome}")
+        programas[nome] = _Programa(expressoes[nome])
+        ausentes = programas[nome].bandas - mapeamento.keys()
+        if ausentes:
+            raise ValueError(f"O índice {nome} usa bandas sem posição no mapeamento: {', '.join(sorted(ausentes))}")
+
+    altura, largura = imagem.shape[:2]
+    saidas = dict(saidas or {})
+    for nome in programas:
+        if nome not in saidas:
+            saidas[nome] = np.empty((altura, largura), dtype=dtype)
+
+    bandas_usadas = sorted(set().union(*(programa.bandas for programa in programas.values())))
+    linhas_por_faixa = max(1, min(altura, ELEMENTOS_POR_FAIXA // max(largura, 1)))
+    formato_faixa = (linhas_por_faixa, largura)
+    bandas = {banda: np.empty(formato_faixa, dtype=dtype) for banda in bandas_usadas}
+    num_temporarios = max((programa.num_temporarios for programa in programas.values()), default=0)
+    temporarios = [np.empty(formato_faixa, dtype=dtype) for _ in range(num_temporarios)]
+    escala = _escala_reflectancia(imagem.dtype)
+
+    # Denominadores nulos (ex: EVI em pixels sem vegetação) resultam em inf/NaN, como nas operações do NumPy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for inicio in range(0, altura, linhas_por_faixa):
+            fim = min(inicio + linhas_por_faixa, altura)
+            linhas = fim - inicio
+            faixa = imagem[inicio:fim]
+            bandas_faixa = {}
+            for banda in bandas_usadas:
+                destino = bandas[banda][:linhas]
+                np.multiply(faixa[:, :, mapeamento[banda]], escala, out=destino, casting='unsafe')
+                bandas_faixa[banda] = destino
+            temporarios_faixa = [temporario[:linhas] for temporario in temporarios]
+            for nome, programa in programas.items():
+                programa.executar(bandas_faixa, temporarios_faixa, saidas[nome][inicio:fim])
+    return {nome: saidas[nome] for nome in programas}
@@ -0,0 +1,373 @@
+# lote.py - Processamento em lote (sem interação) de um diretório de imagens multiespectrais
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+from hierarquico import detectar_problemas_avancado_hierarquico
+from histograma import HistogramaNDVI
+from indices import calcular_indices, carregar_configuracao_indices
+from mascaras import compactar_mascara
+from metricas import ativar_metricas
+from monitoramento import carregar_imagem_multiespectral, analisar_imagem, detectar_problemas_avancado
+from pipeline import executar_pipeline
+from regioes import maiores_regioes, regioes_da_mascara
+from util import anexar_resultado, compactar_resultados
+from zonas import criar_zonas_grade, estatisticas_zonais, tabela_para_registros
+
+EXTENSOES_IMAGEM = ('.tif', '.tiff')
+ARQUIVO_RESULTADOS = 'resultados.jsonl'
+
+
+def listar_imagens(entradas):
+    """
+    Expande diretórios e padrões glob em uma lista ordenada de caminhos de imagens.
+    :param entradas: Lista de diretórios, arquivos ou padrões glob (ex: 'voos/*.tif')
+    :return: Lista de caminhos de imagens, sem repetições
+    """
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, nome) for nome in os.listdir(entrada)]
+            caminhos.extend(c for c in candidatos if c.lower().endswith(EXTENSOES_IMAGEM))
+        else:
+            caminhos.extend(glob.glob(entrada))
+    return sorted(set(caminhos))
+
+
+def estimar_bytes_imagem(caminho_imagem):
+    """
+    Estima, sem decodificar a imagem, quantos bytes ela ocupará na memória: pelo cabeçalho do TIFF (formato e
+    tipo da primeira página, com o tifffile, quando instalado) ou, na falta dele, pelo tamanho do arquivo.
+    :param caminho_imagem: Caminho da imagem multiespectral
+    :return: Número estimado de bytes
+    """
+    try:
+        import tifffile
+        with tifffile.TiffFile(caminho_imagem) as tiff:
+            pagina = tiff.pages[0]
+            return int(np.prod(pagina.shape)) * np.dtype(pagina.dtype).itemsize
+    except Exception:
+        # tifffile ausente ou arquivo que não é um TIFF legível: a estimativa usa o tamanho do arquivo
+        pass
+    try:
+        return os.path.getsize(caminho_imagem)
+    except OSError:
+        return 0
+
+
+def processar_imagem(caminho_imagem, limiar=0.3, tamanho_minimo=5, limiar_ndvi=0.3, limiar_cor=50, tamanho_celula=None,
+                     diretorio_miniaturas=None, diretorio_mascaras=None, indices=None, mapeamento_bandas=None,
+                     expressoes_indices=None, hierarquico=False, num_threads=1, num_regioes=None, imagem=None,
+                     buffers=None):
+    """
+    Executa o fluxo completo de análise de uma imagem: carga, NDVI, análise avançada de problemas e pragas.
+    Erros são capturados e devolvidos no resultado, para que uma imagem defeituosa não interrompa o lote.
+    :param caminho_imagem: Caminho da imagem multiespectral
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
+    :param limiar_ndvi: Limiar de NDVI para identificação de pragas
+    :param limiar_cor: Limiar de cor para identificação de pragas
+    :param tamanho_celula: Lado, em pixels, das células da grade de estatísticas zonais (opcional)
+    :param diretorio_miniaturas: Diretório dos PNGs do mapa NDVI e das áreas problemáticas (opcional)
+    :param diretorio_mascaras: Diretório das máscaras compactas (.npz) de problemas e pragas (opcional)
+    :param indices: Nomes de índices de vegetação adicionais cujas médias entram no resultado (ex: ['GNDVI', 'EVI'])
+    :param mapeamento_bandas: Posição de cada banda usada nas expressões dos índices (opcional)
+    :param expressoes_indices: Expressões de índices adicionais (opcional)
+    :param hierarquico: Se True, a análise avançada rotula apenas os blocos com NDVI mínimo abaixo do limiar
+    :param num_threads: Threads que analisam faixas de linhas da imagem em paralelo (None usa todos os núcleos)
+    :param num_regioes: Número de maiores áreas problemáticas (com área, retângulo, centróide, NDVI médio e
+                        pragas) incluídas no resultado, opcional
+    :param imagem: Imagem já carregada (ex: pela thread de leitura do pipeline) ou a exceção da carga, opcional
+    :param buffers: Buffers de criar_buffers_analise reaproveitados entre imagens, ou função que recebe o formato
+                    (altura, largura) da imagem carregada e devolve os buffers (ex: do serviço residente), opcional
+    :return: Dicionário com os dados da plantação (com o HistogramaNDVI da imagem em 'Histograma_NDVI'),
+             ou com a chave 'Erro' em caso de falha
+    """
+    inicio = time.perf_counter()
+    try:
+        if imagem is None:
+            imagem = carregar_imagem_multiespectral(caminho_imagem)
+        elif isinstance(imagem, Exception):
+            raise imagem
+        if callable(buffers):
+            buffers = buffers(imagem.shape[:2])
+        analise = analisar_imagem(imagem, limiar=limiar, limiar_ndvi=limiar_ndvi, limiar_cor=limiar_cor,
+                                  buffers=buffers, num_threads=num_threads)
+        regioes = None
+        if hierarquico:
+            problemas_avancado = detectar_problemas_avancado_hierarquico(analise["ndvi"], limiar=limiar,
+                                                                         tamanho_minimo=tamanho_minimo)
+            if num_regioes:
+                regioes = regioes_da_mascara(problemas_avancado, analise["ndvi"], analise["pragas"])
+        else:
+            deteccao = detectar_problemas_avancado(analise["ndvi"], limiar=limiar, tamanho_minimo=tamanho_minimo,
+                                                   num_threads=num_threads, retornar_regioes=bool(num_regioes),
+                                                   pragas=analise["pragas"])
+            problemas_avancado, regioes = deteccao if num_regioes else (deteccao, None)
+        resultado = {
+            "Imagem": caminho_imagem,
+            "Altura": int(imagem.shape[0]),
+            "Largura": int(imagem.shape[1]),
+            "NDVI_Medio": analise["NDVI_Medio"],
+            "NDVI_Minimo": analise["NDVI_Minimo"],
+            "NDVI_Maximo": analise["NDVI_Maximo"],
+            "Problemas_Totais": int(np.count_nonzero(problemas_avancado)),
+            "Pragas_Totais": analise["Pragas_Totais"],
+        }
+        if indices:
+            for nome, valores in calcular_indices(imagem, indices, mapeamento_bandas, expressoes_indices).items():
+                # O NDVI médio da análise principal (float64) prevalece sobre o recalculado em float32
+                resultado.setdefault(f"{nome}_Medio",
+                                     float(np.mean(valores, dtype=np.float64, where=np.isfinite(valores))))
+        histograma = HistogramaNDVI().atualizar(analise["ndvi"])
+        resultado.update({f"NDVI_{nome}": valor for nome, valor in histograma.percentis().items()})
+        resultado["Histograma_NDVI"] = histograma
+        if regioes is not None:
+            resultado["Regioes_Totais"] = len(regioes)
+            resultado["Maiores_Regioes"] = tabela_para_registros(maiores_regioes(regioes, num_regioes))
+        if tamanho_celula:
+            zonas, num_zonas = criar_zonas_grade(imagem.shape, tamanho_celula)
+            tabela = estatisticas_zonais(analise["ndvi"], zonas, problemas_avancado, analise["pragas"], num_zonas)
+            resultado["Zonas"] = tabela_para_registros(tabela)
+        if diretorio_mascaras:
+            os.makedirs(diretorio_mascaras, exist_ok=True)
+            nome_base = os.path.join(diretorio_mascaras, os.path.splitext(os.path.basename(caminho_imagem))[0])
+            compactar_mascara(problemas_avancado).salvar(f"{nome_base}_problemas")
+            compactar_mascara(analise["pragas"]).salvar(f"{nome_base}_pragas")
+        if diretorio_miniaturas:
+            from visualizacao import ativar_modo_headless, gerar_mapa_ndvi, plotar_areas_problemas
+            ativar_modo_headless(diretorio_miniaturas)
+            nome_base = os.path.splitext(os.path.basename(caminho_imagem))[0]
+            gerar_mapa_ndvi(analise["ndvi"], nome_arquivo=f"{nome_base}_ndvi.png")
+            plotar_areas_problemas(analise["ndvi"], problemas_avancado, nome_arquivo=f"{nome_base}_problemas.png")
+        resultado["Tempo_Segundos"] = time.perf_counter() - inicio
+        return resultado
+    except Exception as e:
+        return {"Imagem": caminho_imagem, "Erro": f"{type(e).__name__}: {e}",
+                "Tempo_Segundos": time.perf_counter() - inicio}
+
+
+def persistir_resultado(resultado, diretorio_saida, gravador=None):
+    """
+    Acrescenta o resultado de uma imagem ao arquivo de resultados JSON Lines e, opcionalmente, salva no banco
+    de dados Oracle (com as estatísticas por zona, se calculadas, identificadas pela imagem e pela data).
+    :param resultado: Dicionário devolvido por processar_imagem
+    :param diretorio_saida: Diretório do arquivo de resultados (resultados.jsonl)
+    :param gravador: GravadorMonitoramento que acumula as linhas para o banco de dados (opcional)
+    """
+    resultado.setdefault("Data", datetime.now().isoformat(timespec='seconds'))
+    anexar_resultado(resultado, os.path.join(diretorio_saida, ARQUIVO_RESULTADOS))
+    if gravador is not None:
+        gravador.adicionar(resultado["NDVI_Medio"], resultado["Problemas_Totais"], resultado["Pragas_Totais"])
+        if "Zonas" in resultado:
+            gravador.adicionar_zonas(resultado["Imagem"], resultado["Data"], resultado["Zonas"])
+
+
+def processar_lote(caminhos, diretorio_saida, processos=None, gravador=None, **parametros):
+    """
+    Processa as imagens em paralelo em um pool de processos, persistindo cada resultado assim que fica pronto.
+    :param caminhos: Lista de caminhos de imagens
+    :param diretorio_saida: Diretório do arquivo de resultados (resultados.jsonl)
+    :param processos: Número de processos do pool (padrão: número de núcleos)
+    :param gravador: GravadorMonitoramento para salvar os resultados no banco de dados (opcional)
+    :param parametros: Limiares repassados para processar_imagem
+    :return: Lista com o resultado de cada imagem, na ordem de conclusão
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    resultados = []
+    histograma_lote = HistogramaNDVI()
+    total = len(caminhos)
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(processar_imagem, caminho, **parametros): caminho for caminho in caminhos}
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                # Falha do próprio processo (ex: encerrado por falta de memória, BrokenProcessPool): a imagem
+                # é registrada com erro, como as falhas capturadas dentro de processar_imagem
+                resultado = {"Imagem": futuros[futuro], "Erro": f"{type(e).__name__}: {e}", "Tempo_Segundos": 0.0}
+            registrar_resultado(resultado, diretorio_saida, gravador, histograma_lote, len(resultados) + 1, total)
+            resultados.append(resultado)
+
+    exibir_resumo(resultados, time.perf_counter() - inicio, histograma_lote)
+    return resultados
+
+
+def processar_lote_pipeline(caminhos, diretorio_saida, gravador=None, profundidade=2, limite_bytes=None,
+                            **parametros):
+    """
+    Processa as imagens em um único processo, em pipeline: a decodificação da próxima imagem e a gravação
+    do resultado anterior (JSON/Oracle) acontecem em threads, enquanto a imagem atual é analisada.
+    Indicado quando a leitura do disco ou o banco de dados são o gargalo, ou quando a memória não comporta
+    uma imagem por processo.
+    :param caminhos: Lista de caminhos de imagens
+    :param diretorio_saida: Diretório do arquivo de resultados (resultados.jsonl)
+    :param gravador: GravadorMonitoramento para salvar os resultados no banco de dados (opcional)
+    :param profundidade: Número máximo de imagens decodificadas à espera de análise
+    :param limite_bytes: Máximo de bytes de imagens decodificadas à espera de análise, incluindo a imagem em
+                         decodificação, estimada pelo cabeçalho do arquivo (opcional)
+    :param parametros: Limiares repassados para processar_imagem
+    :return: Lista com o resultado de cada imagem, na ordem dos caminhos
+    """
+    os.makedirs(diretorio_saida, exist_ok=True)
+    histograma_lote = HistogramaNDVI()
+    total = len(caminhos)
+    concluidos = [0]
+    inicio = time.perf_counter()
+
+    def carregar(caminho):
+        try:
+            return carregar_imagem_multiespectral(caminho)
+        except Exception as e:
+            return e
+
+    def persistir(resultado):
+        concluidos[0] += 1
+        registrar_resultado(resultado, diretorio_saida, gravador, histograma_lote, concluidos[0], total)
+
+    resultados = executar_pipeline(caminhos, carregar,
+                                   lambda caminho, imagem: processar_imagem(caminho, imagem=imagem, **parametros),
+                                   persistir, profundidade=profundidade, limite_bytes=limite_bytes,
+                                   estimar_bytes=estimar_bytes_imagem)
+    exibir_resumo(resultados, time.perf_counter() - inicio, histograma_lote)
+    return resultados
+
+
+def registrar_resultado(resultado, diretorio_saida, gravador, histograma_lote, concluidos, total):
+    """
+    Persiste o resultado de uma imagem, acumula seu histograma no do lote e exibe o progresso.
+    Falhas ao salvar são registradas no próprio resultado, na chave 'Erro'.
+    """
+    histograma = resultado.pop("Histograma_NDVI", None)
+    if histograma is not None:
+        histograma_lote.mesclar(histograma)
+    if "Erro" in resultado:
+        print(f"[{concluidos}/{total}] ERRO {resultado['Imagem']}: {resultado['Erro']}")
+        return
+    try:
+        persistir_resultado(resultado, diretorio_saida, gravador)
+        print(f"[{concluidos}/{total}] {resultado['Imagem']} ({resultado['Tempo_Segundos']:.2f}s)")
+    except Exception as e:
+        resultado["Erro"] = f"{type(e).__name__}: {e}"
+        print(f"[{concluidos}/{total}] ERRO ao salvar {resultado['Imagem']}: {resultado['Erro']}")
+
+
+def exibir_resumo(resultados, tempo_total, histograma=None):
+    """
+    Exibe o resumo de vazão do lote (imagens/s e MPix/s) e a distribuição do NDVI de todas as imagens.
+    :param resultados: Lista de resultados devolvida por processar_lote
+    :param tempo_total: Tempo total de processamento em segundos
+    :param histograma: HistogramaNDVI com os pixels de todas as imagens processadas (opcional)
+    """
+    sucesso = [r for r in resultados if "Erro" not in r]
+    megapixels = sum(r["Altura"] * r["Largura"] for r in sucesso) / 1e6
+    tempo_total = max(tempo_total, 1e-9)
+    print("\nResumo do processamento em lote:")
+    print(f"Imagens processadas: {len(sucesso)}, com erro: {len(resultados) - len(sucesso)}")
+    print(f"Tempo total: {tempo_total:.2f}s")
+    print(f"Vazão: {len(sucesso) / tempo_total:.2f} imagens/s, {megapixels / tempo_total:.2f} MPix/s")
+    if histograma is not None and histograma.total:
+        percentis = histograma.percentis()
+        print(f"NDVI do lote: P5 {percentis['P5']:.3f}, P50 {percentis['P50']:.3f}, P95 {percentis['P95']:.3f}")
+
+
+def main(argumentos=None):
+    """
+    Ponto de entrada da linha de comando do processamento em lote.
+    """
+    parser = argparse.ArgumentParser(description="Processa em lote imagens multiespectrais, sem interação.")
+    parser.add_argument("entradas", nargs="+", help="Diretórios, arquivos ou padrões glob de imagens TIFF")
+    parser.add_argument("--saida", default="resultados",
+                        help="Diretório do arquivo de resultados JSON Lines (resultados.jsonl)")
+    parser.add_argument("--processos", type=int, default=None, help="Número de processos (padrão: todos os núcleos)")
+    parser.add_argument("--limiar", type=float, default=0.3, help="Limiar de NDVI para áreas problemáticas")
+    parser.add_argument("--tamanho-minimo", type=int, default=5, help="Tamanho mínimo das áreas problemáticas")
+    parser.add_argument("--limiar-ndvi", type=float, default=0.3, help="Limiar de NDVI para pragas")
+    parser.add_argument("--limiar-cor", type=float, default=50, help="Limiar de cor para pragas")
+    parser.add_argument("--grade", type=int, default=None,
+                        help="Lado, em pixels, das células para estatísticas por zona (opcional)")
+    parser.add_argument("--metricas", default=None,
+                        help="Grava métricas por etapa neste arquivo (.jsonl ou .prom, formato Prometheus)")
+    parser.add_argument("--metricas-memoria", action="store_true", help="Inclui o pico de memória nas métricas")
+    parser.add_argument("--miniaturas", default=None,
+                        help="Diretório onde gravar miniaturas PNG do mapa NDVI e das áreas problemáticas")
+    parser.add_argument("--mascaras", default=None,
+                        help="Diretório onde gravar as máscaras de problemas e pragas compactadas (.npz)")
+    parser.add_argument("--indices", type=lambda texto: texto.split(","), default=None,
+                        help="Índices de vegetação cujas médias entram no resultado, separados por vírgula "
+                             "(ex: GNDVI,SAVI,EVI,NDRE)")
+    parser.add_argument("--configuracao-indices", default=None,
+                        help="Arquivo JSON com o mapeamento de bandas e expressões de índices adicionais")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Threads por imagem, em faixas de linhas (0 usa todos os núcleos; padrão: 1)")
+    parser.add_argument("--regioes", type=int, default=None,
+                        help="Inclui no resultado as N maiores áreas problemáticas, com retângulo, centróide e NDVI")
+    parser.add_argument("--hierarquico", action="store_true",
+                        help="Rotula as áreas problemáticas apenas nos blocos com NDVI mínimo abaixo do limiar")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Processa em um único processo, sobrepondo leitura, análise e gravação")
+    parser.add_argument("--profundidade", type=int, default=2,
+                        help="Imagens decodificadas à frente da análise no modo pipeline (padrão: 2)")
+    parser.add_argument("--limite-memoria", type=float, default=None,
+                        help="MiB de imagens decodificadas à espera de análise no modo pipeline (opcional)")
+    parser.add_argument("--banco", action="store_true", help="Também salva os resultados no banco de dados Oracle")
+    parser.add_argument("--tamanho-lote-banco", type=int, default=500, help="Linhas gravadas por commit no banco")
+    args = parser.parse_args(argumentos)
+
+    caminhos = listar_imagens(args.entradas)
+    if not caminhos:
+        print("Nenhuma imagem encontrada.")
+        return 1
+
+    if args.metricas:
+        ativar_metricas(args.metricas, medir_memoria=args.metricas_memoria)
+
+    gravador = None
+    if args.banco:
+        from banco import GravadorMonitoramento
+        gravador = GravadorMonitoramento(tamanho_lote=args.tamanho_lote_banco)
+
+    mapeamento_bandas, expressoes_indices = None, None
+    if args.configuracao_indices:
+        mapeamento_bandas, expressoes_indices = carregar_configuracao_indices(args.configuracao_indices)
+
+    parametros = dict(limiar=args.limiar, tamanho_minimo=args.tamanho_minimo, limiar_ndvi=args.limiar_ndvi,
+                      limiar_cor=args.limiar_cor, tamanho_celula=args.grade, diretorio_miniaturas=args.miniaturas,
+                      diretorio_mascaras=args.mascaras, indices=args.indices, mapeamento_bandas=mapeamento_bandas,
+                      expressoes_indices=expressoes_indices, hierarquico=args.hierarquico,
+                      num_threads=args.threads or None, num_regioes=args.regioes)
+    falha_banco = False
+    try:
+        if args.pipeline:
+            limite_bytes = int(args.limite_memoria * 1024 ** 2) if args.limite_memoria else None
+            resultados = processar_lote_pipeline(caminhos, args.saida, gravador=gravador,
+                                                 profundidade=args.profundidade, limite_bytes=limite_bytes,
+                                                 **parametros)
+        else:
+            resultados = processar_lote(caminhos, args.saida, processos=args.processos, gravador=gravador,
+                                        **parametros)
+    finally:
+        if gravador is not None:
+            from banco import fechar_pool_sessoes
+            try:
+                gravador.fechar()
+            except Exception as e:
+                # Os resultados já estão no arquivo JSON Lines; apenas as linhas pendentes do banco se perderam
+                print(f"ERRO ao gravar no banco de dados: {gravador.linhas_pendentes} linhas pendentes não foram "
+                      f"salvas ({type(e).__name__}: {e})")
+                falha_banco = True
+            fechar_pool_sessoes()
+    # Compactação periódica: só reescreve o arquivo quando metade dos registros já foi substituída
+    compactar_resultados(os.path.join(args.saida, ARQUIVO_RESULTADOS), redundancia_minima=0.5)
+    return 1 if falha_banco or any("Erro" in r for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,31 @@
 
 # main.py - Programa principal que gerencia o fluxo do sistema de monitoramento da lavoura
+# As dependências pesadas (cv2, scipy, matplotlib, cx_Oracle, pandas) são importadas apenas na primeira
+# opção do menu que as utiliza, para que o menu apareça rapidamente.
+import argparse
+import os
 import numpy as np
-import cv2
-import cx_Oracle
-from monitoramento import carregar_imagem_multiespectral, calcular_ndvi, detectar_problemas, detectar_problemas_avancado, identificar_pragas
-from banco import conectar_banco, salvar_dados_banco, testar_conexao_banco
-from visualizacao import gerar_mapa_ndvi, gerar_histograma_ndvi, plotar_imagem_multiespectral, plotar_areas_problemas
-from util import salvar_dados_json, atualizar_dados_json, ler_dados_json, salvar_relatorio_texto, manipular_arquivos_txt
+from cache import CacheResultados
+from util import anexar_resultado, salvar_relatorio_texto, manipular_arquivos_txt
+
+# Diretório dos gráficos no modo sem janela (None: os gráficos são exibidos em janelas)
+_diretorio_figuras = None
+_visualizacao_configurada = False
+
+
+def visualizacao():
+    """
+    Importa o módulo de visualização (e o matplotlib) no primeiro gráfico, ativando o modo sem janela se configurado.
+    :return: Módulo visualizacao
+    """
+    global _visualizacao_configurada
+    import visualizacao as modulo
+    if not _visualizacao_configurada:
+        if _diretorio_figuras is not None:
+            modulo.ativar_modo_headless(_diretorio_figuras)
+        _visualizacao_configurada = True
+    return modulo
+
 
 def exibir_menu():
     """
@@ -23,6 +42,7 @@ def exibir_menu():
         "Gerar mapa NDVI",
         "Trabalhar com arquivos TXT",
         "Testar conexão com o banco de dados",
+        "Curva de sensibilidade dos limiares",
         "Sair"
     ]
 
@@ -40,85 +60,106 @@ def exibir_menu():
         except ValueError:
             print("Entrada inválida. Digite um número.")
 
-def main():
+def main(diretorio_figuras=None):
     """
     Função principal que gerencia o fluxo do programa.
+    :param diretorio_figuras: Grava os gráficos como PNG neste diretório em vez de abrir janelas (opcional)
     """
+    global _diretorio_figuras
+    _diretorio_figuras = diretorio_figuras
     imagem_multiespectral = None
+    caminho_imagem = ""
+    chave_imagem = None
+    analise = None
     ndvi = None
     problemas = None
     problemas_avancado = None
     pragas = None
+    # Resultados já calculados para a mesma imagem e os mesmos limiares são reaproveitados na sessão e, se a
+    # variável de ambiente AGROTECH_CACHE indicar um diretório, também entre execuções
+    cache = CacheResultados(diretorio=os.environ.get("AGROTECH_CACHE") or None)
 
     while True:
         escolha = exibir_menu()
 
         if escolha == 1:
             caminho_imagem = input("Digite o caminho da imagem multiespectral (ou deixe vazio para usar imagem simulada): ")
+            from monitoramento import carregar_imagem_multiespectral
             try:
                 if caminho_imagem.strip() == "":
                     imagem_multiespectral = carregar_imagem_multiespectral()
                     salvar_imagem = input("Deseja salvar a imagem simulada? (s/n): ").strip().lower()
                     if salvar_imagem == 's':
+                        import cv2
                         cv2.imwrite('imagem_simulada.tif', imagem_multiespectral)
                 else:
                     imagem_multiespectral = carregar_imagem_multiespectral(caminho_imagem)
                 print("Imagem carregada com sucesso.")
-                plotar_imagem_multiespectral(imagem_multiespectral)
+                chave_imagem = CacheResultados.gerar_chave(imagem_multiespectral)
+                visualizacao().plotar_imagem_multiespectral(imagem_multiespectral)
             except FileNotFoundError as e:
                 print(e)
 
         elif escolha == 2:
             if imagem_multiespectral is not None:
-                banda_nir = imagem_multiespectral[:, :, 3]  # Supondo que a 4ª camada seja NIR
-                banda_vermelha = imagem_multiespectral[:, :, 2]  # Supondo que a 3ª camada seja Vermelha
-                ndvi = calcular_ndvi(banda_nir, banda_vermelha)
+                from monitoramento import analisar_imagem
+                # NDVI, máscaras de problemas/pragas e estatísticas em uma única passada sobre as bandas
+                chave = CacheResultados.gerar_chave("analisar_imagem", chave_imagem, limiar=0.3, limiar_ndvi=0.3, limiar_cor=50)
+                analise = cache.obter_ou_calcular(chave, analisar_imagem, imagem_multiespectral,
+                                                  limiar=0.3, limiar_ndvi=0.3, limiar_cor=50, num_threads=None)
+                ndvi = analise["ndvi"]
                 print("NDVI calculado com sucesso.")
-                print(f"NDVI Médio: {np.mean(ndvi):.2f}")
-                print(f"NDVI Mínimo: {np.min(ndvi):.2f}, NDVI Máximo: {np.max(ndvi):.2f}")
-                gerar_histograma_ndvi(ndvi)
+                print(f"NDVI Médio: {analise['NDVI_Medio']:.2f}")
+                print(f"NDVI Mínimo: {analise['NDVI_Minimo']:.2f}, NDVI Máximo: {analise['NDVI_Maximo']:.2f}")
+                visualizacao().gerar_histograma_ndvi(ndvi)
             else:
                 print("Erro: Nenhuma imagem carregada. Carregue uma imagem primeiro.")
 
         elif escolha == 3:
             if ndvi is not None:
-                problemas = detectar_problemas(ndvi, limiar=0.3)
+                problemas = analise["problemas"]
                 print("Detecção de áreas problemáticas concluída.")
-                plotar_areas_problemas(ndvi, problemas)
+                visualizacao().plotar_areas_problemas(ndvi, problemas)
             else:
                 print("Erro: NDVI não calculado. Calcule o NDVI primeiro.")
 
         elif escolha == 4:
             if ndvi is not None:
-                problemas_avancado = detectar_problemas_avancado(ndvi, limiar=0.3, tamanho_minimo=5)
+                from monitoramento import detectar_problemas_avancado
+                chave = CacheResultados.gerar_chave("detectar_problemas_avancado", chave_imagem, limiar=0.3, tamanho_minimo=5)
+                problemas_avancado = cache.obter_ou_calcular(chave, detectar_problemas_avancado, ndvi,
+                                                             limiar=0.3, tamanho_minimo=5, num_threads=None)
                 print("Análise avançada de problemas da lavoura concluída.")
-                plotar_areas_problemas(ndvi, problemas_avancado)
+                visualizacao().plotar_areas_problemas(ndvi, problemas_avancado, nome_arquivo="areas_problemas_avancado.png")
             else:
                 print("Erro: NDVI não calculado. Calcule o NDVI primeiro.")
 
         elif escolha == 5:
             if ndvi is not None:
-                banda_verde = imagem_multiespectral[:, :, 1]  # Supondo que a 2ª camada seja Verde
-                banda_azul = imagem_multiespectral[:, :, 0]  # Supondo que a 1ª camada seja Azul
-                pragas = identificar_pragas(ndvi, banda_verde, banda_azul, limiar_ndvi=0.3, limiar_cor=50)
+                pragas = analise["pragas"]
                 print("Identificação técnica de possíveis pragas concluída.")
-                plotar_areas_problemas(ndvi, pragas)
+                visualizacao().plotar_areas_problemas(ndvi, pragas, nome_arquivo="areas_pragas.png")
             else:
                 print("Erro: NDVI não calculado. Calcule o NDVI primeiro.")
 
         elif escolha == 6:
             if ndvi is not None and (problemas is not None or problemas_avancado is not None or pragas is not None):
                 dados_plantacao = {
-                    "NDVI_Medio": float(np.mean(ndvi)),
-                    "Problemas_Totais": int(np.sum(problemas if problemas_avancado is None else problemas_avancado)),
-                    "Pragas_Totais": int(np.sum(pragas)) if pragas is not None else 0
+                    "Imagem": caminho_imagem.strip() or "imagem_simulada",
+                    "NDVI_Medio": analise["NDVI_Medio"],
+                    "Problemas_Totais": analise["Problemas_Totais"] if problemas_avancado is None else int(np.sum(problemas_avancado)),
+                    "Pragas_Totais": analise["Pragas_Totais"] if pragas is not None else 0
                 }
-                nome_arquivo = input("Digite o nome do arquivo JSON para salvar os dados: ")
-                salvar_dados_json(dados_plantacao, nome_arquivo)
+                # Os dados são acrescentados ao histórico de resultados (JSON Lines), sem reescrever o arquivo
+                nome_arquivo = input("Digite o nome do arquivo de resultados (JSON Lines) para registrar os dados: ")
+                anexar_resultado(dados_plantacao, nome_arquivo)
+                print(f"Dados registrados em {nome_arquivo} com sucesso.")
             else:
                 print("Erro: NDVI, problemas ou pragas não calculados. Calcule o NDVI primeiro.")
 
         elif escolha == 7:
+            import cx_Oracle
+            from banco import conectar_banco, salvar_dados_banco
             try:
                 conexao = conectar_banco()
                 salvar_dados_banco(conexao, ndvi, problemas, pragas)
@@ -127,7 +168,7 @@ def main():
 
         elif escolha == 8:
             if ndvi is not None:
-                gerar_mapa_ndvi(ndvi)
+                visualizacao().gerar_mapa_ndvi(ndvi)
             else:
                 print("Erro: NDVI não calculado. Calcule o NDVI primeiro.")
 
@@ -135,9 +176,32 @@ def main():
             manipular_arquivos_txt()
 
         elif escolha == 10:
+            from banco import testar_conexao_banco
             testar_conexao_banco()
 
         elif escolha == 11:
+            if ndvi is not None:
+                from monitoramento import BANDA_AZUL, BANDA_VERDE
+                from sensibilidade import sensibilidade_problemas, sensibilidade_problemas_avancado, sensibilidade_pragas
+                # Todas as contagens saem de uma única passada sobre o NDVI, em vez de uma detecção por limiar
+                limiares = np.round(np.linspace(0.0, 0.6, 61), 2)
+                num_areas, problemas_por_limiar = sensibilidade_problemas_avancado(ndvi, limiares, tamanho_minimo=5)
+                curvas = {
+                    "Áreas problemáticas": sensibilidade_problemas(ndvi, limiares),
+                    "Análise avançada (tamanho mínimo 5)": problemas_por_limiar,
+                    "Possíveis pragas (cor > 50)": sensibilidade_pragas(ndvi, imagem_multiespectral[:, :, BANDA_VERDE],
+                                                                        imagem_multiespectral[:, :, BANDA_AZUL],
+                                                                        limiares, 50)[:, 0],
+                }
+                for indice in range(0, limiares.size, 10):
+                    print(f"Limiar {limiares[indice]:.2f}: {curvas['Áreas problemáticas'][indice]} pixels problemáticos, "
+                          f"{num_areas[indice]} áreas com 5 ou mais pixels")
+                visualizacao().plotar_curva_sensibilidade(limiares, curvas)
+            else:
+                print("Erro: NDVI não calculado. Calcule o NDVI primeiro.")
+
+        elif escolha == 12:
+            print(f"Estatísticas do cache: {cache.estatisticas}")
             print("Saindo do programa.")
             break
 
@@ -145,4 +209,7 @@ def main():
             print("Opção inválida. Tente novamente.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Sistema de monitoramento da lavoura.")
+    parser.add_argument("--figuras", default=None,
+                        help="Grava os gráficos como PNG neste diretório, sem abrir janelas")
+    main(parser.parse_args().figuras)
@@ -0,0 +1,178 @@
+# mascaras.py - Armazenamento compacto (bits empacotados ou RLE) das máscaras de problemas e pragas
+import numpy as np
+
+CODIFICACAO_BITS = "bits"
+CODIFICACAO_RLE = "rle"
+
+# Contagem de bits por byte, usada quando o NumPy não possui np.bitwise_count (versões anteriores à 2.0)
+_BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int64)
+
+
+def _contar_bits(dados):
+    """
+    Conta os bits ligados de um array de bytes empacotados.
+    """
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(dados).sum(dtype=np.int64))
+    return int(_BITS_POR_BYTE[dados].sum())
+
+
+class MascaraCompacta:
+    """
+    Máscara binária armazenada de forma compacta:
+    - 'bits': 1 bit por pixel (np.packbits), 8 vezes menor que a máscara booleana;
+    - 'rle': trechos contínuos de pixels marcados (início e comprimento, na ordem das linhas),
+      muito menor que 'bits' quando a máscara é esparsa.
+    As operações de contagem, E (&) e OU (|) trabalham diretamente sobre a forma compacta.
+    """
+
+    def __init__(self, formato, codificacao, dados=None, inicios=None, comprimentos=None):
+        """
+        :param formato: Formato (altura, largura) da máscara original
+        :param codificacao: 'bits' ou 'rle'
+        :param dados: Bytes empacotados (codificação 'bits')
+        :param inicios: Posição linear do início de cada trecho (codificação 'rle')
+        :param comprimentos: Comprimento de cada trecho (codificação 'rle')
+        """
+        self.formato = tuple(int(d) for d in formato)
+        self.codificacao = codificacao
+        self.dados = dados
+        self.inicios = inicios
+        self.comprimentos = comprimentos
+
+    @property
+    def num_pixels(self):
+        return int(np.prod(self.formato))
+
+    @property
+    def nbytes(self):
+        """
+        Memória ocupada pela forma compacta, em bytes.
+        """
+        if self.codificacao == CODIFICACAO_BITS:
+            return self.dados.nbytes
+        return self.inicios.nbytes + self.comprimentos.nbytes
+
+    def contar(self):
+        """
+        Conta os pixels marcados sem descompactar a máscara.
+        """
+        if self.codificacao == CODIFICACAO_BITS:
+            return _contar_bits(self.dados)
+        return int(self.comprimentos.sum())
+
+    def descompactar(self):
+        """
+        Reconstrói a máscara booleana original.
+        """
+        if self.codificacao == CODIFICACAO_BITS:
+            return np.unpackbits(self.dados, count=self.num_pixels).view(bool).reshape(self.formato)
+        variacao = np.zeros(self.num_pixels + 1, dtype=np.int8)
+        variacao[self.inicios] = 1
+        variacao[self.inicios + self.comprimentos] -= 1
+        return np.cumsum(variacao[:-1], dtype=np.int8).view(bool).reshape(self.formato)
+
+    def para_bits(self):
+        """
+        Devolve a máscara na codificação 'bits'.
+        """
+        if self.codificacao == CODIFICACAO_BITS:
+            return self
+        return MascaraCompacta(self.formato, CODIFICACAO_BITS, dados=np.packbits(self.descompactar().ravel()))
+
+    def para_rle(self):
+        """
+        Devolve a máscara na codificação 'rle'.
+        """
+        if self.codificacao == CODIFICACAO_RLE:
+            return self
+        return compactar_mascara(self.descompactar(), CODIFICACAO_RLE)
+
+    def _verificar_formato(self, outra):
+        if self.formato != outra.formato:
+            raise ValueError(f"Máscaras de formatos diferentes: {self.formato} e {outra.formato}.")
+
+    def __and__(self, outra):
+        self._verificar_formato(outra)
+        if self.codificacao == outra.codificacao == CODIFICACAO_RLE:
+            return _combinar_trechos(self, outra, cobertura_minima=2)
+        return MascaraCompacta(self.formato, CODIFICACAO_BITS,
+                               dados=np.bitwise_and(self.para_bits().dados, outra.para_bits().dados))
+
+    def __or__(self, outra):
+        self._verificar_formato(outra)
+        if self.codificacao == outra.codificacao == CODIFICACAO_RLE:
+            return _combinar_trechos(self, outra, cobertura_minima=1)
+        return MascaraCompacta(self.formato, CODIFICACAO_BITS,
+                               dados=np.bitwise_or(self.para_bits().dados, outra.para_bits().dados))
+
+    def salvar(self, caminho):
+        """
+        Salva a máscara compacta em um arquivo .npz.
+        :param caminho: Caminho do arquivo (a extensão .npz é acrescentada se necessário)
+        """
+        if not caminho.endswith('.npz'):
+            caminho += '.npz'
+        if self.codificacao == CODIFICACAO_BITS:
+            np.savez(caminho, formato=self.formato, codificacao=self.codificacao, dados=self.dados)
+        else:
+            np.savez(caminho, formato=self.formato, codificacao=self.codificacao,
+                     inicios=self.inicios, comprimentos=self.comprimentos)
+
+
+def _combinar_trechos(a, b, cobertura_minima):
+    """
+    Combina duas máscaras RLE varrendo os inícios e fins dos trechos em ordem: a união (OU) é onde há
+    ao menos um trecho aberto e a interseção (E) é onde há dois.
+    """
+    posicoes = np.concatenate([a.inicios, b.inicios, a.inicios + a.comprimentos, b.inicios + b.comprimentos])
+    variacao = np.concatenate([np.ones(len(a.inicios) + len(b.inicios), dtype=np.int8),
+                               -np.ones(len(a.inicios) + len(b.inicios), dtype=np.int8)])
+    # Na mesma posição, inícios antes de fins: trechos encostados são unidos sem lacuna
+    ordem = np.lexsort((-variacao, posicoes))
+    posicoes = posicoes[ordem]
+    dentro = np.cumsum(variacao[ordem]) >= cobertura_minima
+    anterior = np.concatenate([[False], dentro[:-1]])
+    inicios = posicoes[dentro & ~anterior]
+    comprimentos = posicoes[~dentro & anterior] - inicios
+    validos = comprimentos > 0
+    return MascaraCompacta(a.formato, CODIFICACAO_RLE, inicios=inicios[validos], comprimentos=comprimentos[validos])
+
+
+def compactar_mascara(mascara, codificacao=None):
+    """
+    Compacta uma máscara booleana.
+    :param mascara: Array booleano (ex: resultado de detectar_problemas ou identificar_pragas)
+    :param codificacao: 'bits', 'rle' ou None para escolher a forma menor
+    :return: MascaraCompacta
+    """
+    plana = np.ascontiguousarray(mascara, dtype=bool).ravel()
+    if codificacao == CODIFICACAO_BITS:
+        return MascaraCompacta(mascara.shape, CODIFICACAO_BITS, dados=np.packbits(plana))
+
+    if codificacao is None and plana.size:
+        # Cada trecho custa dois inteiros de 8 bytes; o número de trechos é estimado pelas transições,
+        # sem gerar os índices, para não pagar a codificação RLE de máscaras densas
+        num_trechos = (np.count_nonzero(plana[1:] != plana[:-1]) + int(plana[0]) + int(plana[-1])) // 2
+        if num_trechos * 16 >= (plana.size + 7) // 8:
+            return MascaraCompacta(mascara.shape, CODIFICACAO_BITS, dados=np.packbits(plana))
+
+    bordas = np.flatnonzero(np.diff(plana.view(np.int8), prepend=np.int8(0), append=np.int8(0)))
+    inicios, fins = bordas[0::2], bordas[1::2]
+    return MascaraCompacta(mascara.shape, CODIFICACAO_RLE, inicios=inicios, comprimentos=fins - inicios)
+
+
+def carregar_mascara(caminho):
+    """
+    Carrega uma máscara compacta salva com MascaraCompacta.salvar.
+    :param caminho: Caminho do arquivo .npz
+    :return: MascaraCompacta
+    """
+    if not caminho.endswith('.npz'):
+        caminho += '.npz'
+    with np.load(caminho) as arquivo:
+        codificacao = str(arquivo["codificacao"])
+        if codificacao == CODIFICACAO_BITS:
+            return MascaraCompacta(arquivo["formato"], codificacao, dados=arquivo["dados"])
+        return MascaraCompacta(arquivo["formato"], codificacao,
+                               inicios=arquivo["inicios"], comprimentos=arquivo["comprimentos"])
@@ -0,0 +1,275 @@
+# metricas.py - Instrumentação das etapas do fluxo (tempo, CPU, memória e tamanho dos arrays)
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+VARIAVEL_AMBIENTE = "AGROTECH_METRICAS"
+VARIAVEL_AMBIENTE_MEMORIA = "AGROTECH_METRICAS_MEMORIA"
+VARIAVEL_AMBIENTE_PID = "AGROTECH_METRICAS_PID"
+INTERVALO_PROMETHEUS = 10.0  # segundos mínimos entre regravações do arquivo do Prometheus
+
+# Estado global: com a instrumentação desativada, cada etapa custa apenas a verificação de _ativo
+_ativo = False
+_caminho = None
+_formato = None
+_medir_memoria = False
+_pid = None
+_descritor = None
+_acumulados = {}
+_prometheus_pendente = False
+_ultima_gravacao_prometheus = None
+_pid_gravacao_final = None
+_trava = threading.Lock()
+_local = threading.local()
+
+
+def ativar_metricas(caminho, formato=None, medir_memoria=False):
+    """
+    Ativa a gravação das métricas de cada etapa. A configuração também é exportada por variáveis de
+    ambiente, para que processos filhos (ex: o pool do processamento em lote) gravem no mesmo destino.
+    :param caminho: Arquivo de saída (.jsonl: uma linha JSON por execução; .prom: formato texto do Prometheus)
+    :param formato: 'jsonl' ou 'prometheus' (padrão: deduzido da extensão do arquivo)
+    :param medir_memoria: Mede o pico de memória alocada com tracemalloc (aumenta o custo das etapas)
+    """
+    global _ativo, _caminho, _formato, _medir_memoria, _pid, _descritor
+    desativar_metricas()
+    _caminho = caminho
+    _formato = formato or ("prometheus" if caminho.endswith(".prom") else "jsonl")
+    _medir_memoria = medir_memoria
+    _pid = os.getpid()
+    if _formato == "jsonl":
+        _descritor = os.open(caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    if medir_memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    os.environ[VARIAVEL_AMBIENTE] = caminho
+    os.environ[VARIAVEL_AMBIENTE_MEMORIA] = "1" if medir_memoria else "0"
+    os.environ[VARIAVEL_AMBIENTE_PID] = str(_pid)
+    _ativo = True
+
+
+def desativar_metricas():
+    """
+    Desativa a instrumentação e fecha o arquivo de saída, gravando antes os totais pendentes do Prometheus.
+    """
+    global _ativo, _descritor, _ultima_gravacao_prometheus
+    _ativo = False
+    _descarregar_prometheus()
+    _ultima_gravacao_prometheus = None
+    if _descritor is not None:
+        os.close(_descritor)
+        _descritor = None
+    _acumulados.clear()
+    os.environ.pop(VARIAVEL_AMBIENTE, None)
+    os.environ.pop(VARIAVEL_AMBIENTE_MEMORIA, None)
+    os.environ.pop(VARIAVEL_AMBIENTE_PID, None)
+
+
+def metricas_ativas():
+    """
+    Indica se a instrumentação está ativa.
+    """
+    return _ativo
+
+
+def _bytes_arrays(*valores):
+    """
+    Soma o tamanho, em bytes, dos arrays NumPy (inclusive dentro de dicionários) entre os valores.
+    """
+    total = 0
+    for valor in valores:
+        if isinstance(valor, np.ndarray):
+            total += valor.nbytes
+        elif isinstance(valor, dict):
+            total += sum(v.nbytes for v in valor.values() if isinstance(v, np.ndarray))
+    return total
+
+
+def etapa(nome, **campos):
+    """
+    Gerenciador de contexto que mede uma etapa do fluxo: tempo de parede, tempo de CPU,
+    pico de memória alocada (se ativado) e bytes de arrays processados.
+
+    Uso:
+        with etapa("salvar_json", bytes_entrada=ndvi.nbytes):
+            ...
+
+    :param nome: Nome da etapa nas métricas
+    :param campos: Campos adicionais gravados no registro
+    """
+    return _Etapa(nome, campos)
+
+
+class _Etapa:
+    __slots__ = ("nome", "campos", "_inicio", "_inicio_cpu")
+
+    def __init__(self, nome, campos):
+        self.nome = nome
+        self.campos = campos
+
+    def __enter__(self):
+        if not _ativo:
+            return self
+        if _medir_memoria and tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            pilha = _pilha_memoria()
+            if pilha:
+                pilha[-1][1] = max(pilha[-1][1], pico)
+            tracemalloc.reset_peak()
+            pilha.append([atual, 0])
+        self._inicio_cpu = time.process_time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        if not _ativo:
+            return False
+        registro = {
+            "etapa": self.nome,
+            "tempo_parede": time.perf_counter() - self._inicio,
+            "tempo_cpu": time.process_time() - self._inicio_cpu,
+        }
+        if _medir_memoria and tracemalloc.is_tracing() and _pilha_memoria():
+            _, pico = tracemalloc.get_traced_memory()
+            inicio_memoria, maximo_filhos = _pilha_memoria().pop()
+            pico = max(pico, maximo_filhos)
+            registro["memoria_pico"] = pico - inicio_memoria
+            if _pilha_memoria():
+                _pilha_memoria()[-1][1] = max(_pilha_memoria()[-1][1], pico)
+        registro.update(self.campos)
+        if tipo_excecao is not None:
+            registro["erro"] = tipo_excecao.__name__
+        registrar(registro)
+        return False
+
+
+def _pilha_memoria():
+    if not hasattr(_local, "pilha"):
+        _local.pilha = []
+    return _local.pilha
+
+
+def medir_etapa(nome):
+    """
+    Decorador que mede cada chamada da função como uma etapa, registrando também o tamanho, em bytes,
+    dos arrays recebidos e devolvidos.
+    :param nome: Nome da etapa nas métricas
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            contexto = etapa(nome, bytes_entrada=_bytes_arrays(*args, *kwargs.values()))
+            with contexto:
+                resultado = funcao(*args, **kwargs)
+                contexto.campos["bytes_saida"] = _bytes_arrays(resultado)
+                if isinstance(resultado, np.ndarray):
+                    contexto.campos["formato"] = list(resultado.shape)
+            return resultado
+        return envoltorio
+    return decorador
+
+
+def registrar(registro):
+    """
+    Grava um registro de métricas no destino configurado.
+    :param registro: Dicionário com ao menos 'etapa' e 'tempo_parede'
+    """
+    if not _ativo:
+        return
+    registro.setdefault("momento", time.time())
+    registro.setdefault("pid", os.getpid())
+    with _trava:
+        if _formato == "jsonl":
+            os.write(_descritor, (json.dumps(registro, ensure_ascii=False) + "\n").encode())
+        else:
+            _acumular_prometheus(registro)
+
+
+def _acumular_prometheus(registro):
+    """
+    Acumula em memória os totais por etapa. O arquivo do Prometheus é regravado no máximo a cada
+    INTERVALO_PROMETHEUS segundos e ao fim do processo (ou em desativar_metricas), e não a cada etapa.
+    """
+    global _prometheus_pendente, _ultima_gravacao_prometheus
+    if _pid_gravacao_final != os.getpid():
+        # Primeira etapa deste processo (ou de um filho criado por fork, que herdou os totais do pai)
+        _acumulados.clear()
+        _ultima_gravacao_prometheus = None
+        _agendar_gravacao_final()
+    acumulado = _acumulados.setdefault(registro["etapa"], {
+        "execucoes": 0, "tempo_parede": 0.0, "tempo_cpu": 0.0, "bytes_entrada": 0, "memoria_pico": 0})
+    acumulado["execucoes"] += 1
+    acumulado["tempo_parede"] += registro["tempo_parede"]
+    acumulado["tempo_cpu"] += registro["tempo_cpu"]
+    acumulado["bytes_entrada"] += registro.get("bytes_entrada", 0)
+    acumulado["memoria_pico"] = max(acumulado["memoria_pico"], registro.get("memoria_pico", 0))
+    _prometheus_pendente = True
+    if (_ultima_gravacao_prometheus is None
+            or time.monotonic() - _ultima_gravacao_prometheus >= INTERVALO_PROMETHEUS):
+        _gravar_prometheus()
+
+
+def _agendar_gravacao_final():
+    """
+    Garante que os totais acumulados sejam gravados ao fim do processo atual. O finalizador do multiprocessing
+    é executado na saída do processo principal e também na dos processos do pool, que terminam sem o atexit.
+    """
+    global _pid_gravacao_final
+    from multiprocessing import util
+    _pid_gravacao_final = os.getpid()
+    util.Finalize(None, _descarregar_prometheus, exitpriority=10)
+
+
+def _descarregar_prometheus():
+    """
+    Grava o arquivo do Prometheus se houver totais acumulados ainda não gravados.
+    """
+    with _trava:
+        if _prometheus_pendente and _formato == "prometheus":
+            _gravar_prometheus()
+
+
+def _gravar_prometheus():
+    """
+    Regrava o arquivo no formato texto do Prometheus com os totais acumulados (substituição atômica,
+    compatível com o textfile collector do node_exporter). Cada processo grava o próprio arquivo.
+    """
+    global _prometheus_pendente, _ultima_gravacao_prometheus
+    metricas = [
+        ("agrotech_etapa_execucoes_total", "counter", "execucoes"),
+        ("agrotech_etapa_segundos_total", "counter", "tempo_parede"),
+        ("agrotech_etapa_cpu_segundos_total", "counter", "tempo_cpu"),
+        ("agrotech_etapa_bytes_entrada_total", "counter", "bytes_entrada"),
+        ("agrotech_etapa_memoria_pico_bytes", "gauge", "memoria_pico"),
+    ]
+    linhas = []
+    for nome_metrica, tipo, campo in metricas:
+        linhas.append(f"# TYPE {nome_metrica} {tipo}")
+        for nome_etapa, valores in sorted(_acumulados.items()):
+            linhas.append(f'{nome_metrica}{{etapa="{nome_etapa}"}} {valores[campo]}')
+
+    caminho = _caminho
+    if os.getpid() != _pid:
+        base, extensao = os.path.splitext(_caminho)
+        caminho = f"{base}.{os.getpid()}{extensao}"
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w") as arquivo:
+        arquivo.write("\n".join(linhas) + "\n")
+    os.replace(temporario, caminho)
+    _prometheus_pendente = False
+    _ultima_gravacao_prometheus = time.monotonic()
+
+
+if os.environ.get(VARIAVEL_AMBIENTE):
+    # Processo iniciado com as métricas ativas (ex: filho do pool de processos): mantém o processo de origem
+    _pid_origem = os.environ.get(VARIAVEL_AMBIENTE_PID)
+    ativar_metricas(os.environ[VARIAVEL_AMBIENTE], medir_memoria=os.environ.get(VARIAVEL_AMBIENTE_MEMORIA) == "1")
+    if _pid_origem:
+        _pid = int(_pid_origem)
+        os.environ[VARIAVEL_AMBIENTE_PID] = _pid_origem
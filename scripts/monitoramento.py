@@ -1,8 +1,21 @@
 # monitoramento.py - Módulo responsável pelas funcionalidades de monitoramento da lavoura
+# cv2 e scipy (via rotulagem) são importados nas funções que os usam, para não atrasar a inicialização
 import numpy as np
-import cv2
-import scipy.ndimage as ndimage
+from metricas import medir_etapa
 
+# Posição de cada banda espectral na imagem multiespectral (ordem em que o OpenCV entrega as camadas)
+BANDA_AZUL = 0
+BANDA_VERDE = 1
+BANDA_VERMELHA = 2
+BANDA_NIR = 3
+
+# Tamanho padrão (em pixels) do lado de cada bloco no processamento em blocos
+TAMANHO_BLOCO_PADRAO = 1024
+
+# Quantidade de elementos de cada faixa processada pela análise combinada (mantém os temporários no cache)
+ELEMENTOS_POR_FAIXA = 1 << 16
+
+@medir_etapa("carregar_imagem")
 def carregar_imagem_multiespectral(caminho_imagem=None):
     """
     Carrega uma imagem multiespectral, onde cada banda espectral é uma camada separada.
@@ -11,6 +24,7 @@ def carregar_imagem_multiespectral(caminho_imagem=None):
     :return: Array NumPy contendo as diferentes bandas espectrais
     """
     if caminho_imagem:
+        import cv2
         imagem = cv2.imread(caminho_imagem, cv2.IMREAD_UNCHANGED)
         if imagem is None:
             raise FileNotFoundError(f"Não foi possível encontrar a imagem no caminho especificado: {caminho_imagem}")
@@ -20,13 +34,279 @@ def carregar_imagem_multiespectral(caminho_imagem=None):
         return np.random.rand(100, 100, 4) * 255
 
 
-def calcular_ndvi(banda_nir, banda_vermelha):
+def abrir_imagem_mapeada(caminho_imagem):
+    """
+    Abre uma imagem multiespectral mapeada em memória, sem carregá-la inteira na RAM.
+    Arquivos .npy são mapeados diretamente; TIFFs sem compressão são mapeados com o tifffile
+    (quando instalado). Nos demais casos a imagem é carregada normalmente com o OpenCV.
+    :param caminho_imagem: Caminho da imagem multiespectral (ex: TIFF ou .npy)
+    :return: Tupla (imagem, ordem_bandas), onde ordem_bandas reordena as camadas de cada bloco
+             para a mesma ordem entregue por carregar_imagem_multiespectral (ou None)
+    """
+    if caminho_imagem.lower().endswith('.npy'):
+        return np.load(caminho_imagem, mmap_mode='r'), None
+
+    try:
+        import tifffile
+        imagem = tifffile.memmap(caminho_imagem, mode='r')
+    except (ImportError, ValueError):
+        # tifffile ausente ou TIFF comprimido/não contíguo: não é possível mapear o arquivo
+        print("Aviso: não foi possível mapear a imagem em memória; carregando a imagem completa.")
+        return carregar_imagem_multiespectral(caminho_imagem), None
+
+    ordem_bandas = None
+    if imagem.ndim == 3 and imagem.shape[2] in (3, 4):
+        # O OpenCV converte RGB(A) para BGR(A) ao ler; a mesma troca é aplicada bloco a bloco
+        ordem_bandas = [2, 1, 0] + list(range(3, imagem.shape[2]))
+    return imagem, ordem_bandas
+
+
+def iterar_blocos(imagem, tamanho_bloco=TAMANHO_BLOCO_PADRAO, ordem_bandas=None):
+    """
+    Percorre a imagem em blocos de tamanho fixo, lendo do disco apenas o bloco atual
+    quando a imagem estiver mapeada em memória.
+    :param imagem: Array (ou memmap) com as bandas espectrais
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :param ordem_bandas: Reordenação opcional das bandas de cada bloco (ver abrir_imagem_mapeada)
+    :return: Gerador de tuplas ((fatia_linhas, fatia_colunas), bloco)
+    """
+    altura, largura = imagem.shape[:2]
+    for inicio_linha in range(0, altura, tamanho_bloco):
+        fatia_linhas = slice(inicio_linha, min(inicio_linha + tamanho_bloco, altura))
+        for inicio_coluna in range(0, largura, tamanho_bloco):
+            fatia_colunas = slice(inicio_coluna, min(inicio_coluna + tamanho_bloco, largura))
+            bloco = np.asarray(imagem[fatia_linhas, fatia_colunas])
+            if ordem_bandas is not None:
+                bloco = bloco[:, :, ordem_bandas]
+            yield (fatia_linhas, fatia_colunas), bloco
+
+
+def criar_saida_mapeada(caminho_arquivo, formato, dtype=np.float64):
+    """
+    Cria um arquivo .npy mapeado em memória para receber resultados do processamento em blocos.
+    :param caminho_arquivo: Caminho do arquivo .npy de saída
+    :param formato: Formato (altura, largura) do resultado
+    :param dtype: Tipo de dado do resultado
+    :return: Array mapeado em memória, gravável
+    """
+    return np.lib.format.open_memmap(caminho_arquivo, mode='w+', dtype=dtype, shape=tuple(formato))
+
+
+@medir_etapa("processar_imagem_em_blocos")
+def processar_imagem_em_blocos(imagem, tamanho_bloco=TAMANHO_BLOCO_PADRAO, limiar=0.3, limiar_ndvi=0.3,
+                               limiar_cor=50, saida_ndvi=None, saida_problemas=None, saida_pragas=None,
+                               histograma=None):
+    """
+    Calcula NDVI, áreas problemáticas e possíveis pragas bloco a bloco, de modo que o consumo de
+    memória dependa do tamanho do bloco e não do tamanho da imagem. Os valores por pixel são
+    idênticos aos obtidos com a imagem inteira em memória.
+    :param imagem: Caminho da imagem (mapeada com abrir_imagem_mapeada) ou array com as bandas
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param limiar_ndvi: Limiar de NDVI para identificação de pragas
+    :param limiar_cor: Limiar de cor para identificação de pragas
+    :param saida_ndvi: Array (ex: criar_saida_mapeada) que recebe o NDVI completo, opcional
+    :param saida_problemas: Array que recebe a máscara de áreas problemáticas, opcional
+    :param saida_pragas: Array que recebe a máscara de pragas, opcional
+    :param histograma: HistogramaNDVI que acumula a distribuição do NDVI bloco a bloco, opcional
+    :return: Dicionário com NDVI médio/mínimo/máximo e totais de pixels problemáticos e com pragas
+    """
+    ordem_bandas = None
+    if isinstance(imagem, str):
+        imagem, ordem_bandas = abrir_imagem_mapeada(imagem)
+
+    buffers = criar_buffers_analise((tamanho_bloco, tamanho_bloco))
+    soma_ndvi = 0.0
+    ndvi_minimo = np.inf
+    ndvi_maximo = -np.inf
+    problemas_totais = 0
+    pragas_totais = 0
+
+    for (linhas, colunas), bloco in iterar_blocos(imagem, tamanho_bloco, ordem_bandas):
+        ndvi, problemas, pragas, soma, minimo, maximo, num_problemas, num_pragas = _analisar(
+            bloco, limiar, limiar_ndvi, limiar_cor, buffers)
+
+        soma_ndvi += soma
+        ndvi_minimo = min(ndvi_minimo, minimo)
+        ndvi_maximo = max(ndvi_maximo, maximo)
+        problemas_totais += num_problemas
+        pragas_totais += num_pragas
+
+        if histograma is not None:
+            histograma.atualizar(ndvi)
+        if saida_ndvi is not None:
+            saida_ndvi[linhas, colunas] = ndvi
+        if saida_problemas is not None:
+            saida_problemas[linhas, colunas] = problemas
+        if saida_pragas is not None:
+            saida_pragas[linhas, colunas] = pragas
+
+    num_pixels = imagem.shape[0] * imagem.shape[1]
+    return {
+        "NDVI_Medio": soma_ndvi / num_pixels,
+        "NDVI_Minimo": ndvi_minimo,
+        "NDVI_Maximo": ndvi_maximo,
+        "Problemas_Totais": problemas_totais,
+        "Pragas_Totais": pragas_totais,
+    }
+
+
+def _linhas_por_faixa(altura, largura):
+    """
+    Número de linhas das faixas processadas de cada vez, para que os temporários caibam no cache.
+    """
+    return max(1, min(altura, ELEMENTOS_POR_FAIXA // max(largura, 1)))
+
+
+def criar_buffers_analise(formato, dtype=np.float64):
+    """
+    Pré-aloca os arrays de saída usados por analisar_imagem, para que execuções repetidas não aloquem memória.
+    Os buffers podem ser maiores que a imagem analisada; nesse caso apenas a parte inicial é usada.
+    :param formato: Formato (altura, largura) máximo das imagens a analisar
+    :param dtype: Tipo de dado do NDVI (np.float64 ou np.float32)
+    :return: Dicionário com os buffers de NDVI, máscaras e temporários
+    """
+    altura, largura = formato[:2]
+    linhas_por_faixa = _linhas_por_faixa(altura, largura)
+    return {
+        "ndvi": np.empty((altura, largura), dtype=dtype),
+        "problemas": np.empty((altura, largura), dtype=bool),
+        "pragas": np.empty((altura, largura), dtype=bool),
+        "diferenca": np.empty((linhas_por_faixa, largura), dtype=dtype),
+        "auxiliar": np.empty((linhas_por_faixa, largura), dtype=bool),
+    }
+
+
+def _buffers_compativeis(buffers, formato, dtype):
+    """
+    Verifica se os buffers pré-alocados comportam uma imagem do formato e tipo informados.
+    """
+    altura, largura = formato
+    return (buffers is not None and buffers["ndvi"].dtype == dtype
+            and buffers["ndvi"].shape[0] >= altura and buffers["ndvi"].shape[1] >= largura
+            and buffers["diferenca"].shape[1] >= largura)
+
+
+def _analisar(imagem, limiar, limiar_ndvi, limiar_cor, buffers):
+    """
+    Núcleo da análise combinada: percorre a imagem em faixas de linhas, lendo cada banda uma única vez,
+    e grava NDVI e máscaras nos buffers enquanto acumula as estatísticas.
+    :return: Tupla (ndvi, problemas, pragas, soma, mínimo, máximo, total de problemas, total de pragas)
+    """
+    altura, largura = imagem.shape[:2]
+    ndvi = buffers["ndvi"][:altura, :largura]
+    problemas = buffers["problemas"][:altura, :largura]
+    pragas = buffers["pragas"][:altura, :largura]
+    dtype = ndvi.dtype
+    linhas_por_faixa = buffers["diferenca"].shape[0]
+
+    soma = 0.0
+    minimo = np.inf
+    maximo = -np.inf
+    for inicio in range(0, altura, linhas_por_faixa):
+        fim = min(inicio + linhas_por_faixa, altura)
+        faixa = imagem[inicio:fim]
+        banda_nir = faixa[:, :, BANDA_NIR]
+        banda_vermelha = faixa[:, :, BANDA_VERMELHA]
+        diferenca = buffers["diferenca"][:fim - inicio, :largura]
+        auxiliar = buffers["auxiliar"][:fim - inicio, :largura]
+        ndvi_faixa = ndvi[inicio:fim]
+        problemas_faixa = problemas[inicio:fim]
+        pragas_faixa = pragas[inicio:fim]
+
+        # Mesma sequência de operações de calcular_ndvi, sem cópias intermediárias das bandas
+        np.subtract(banda_nir, banda_vermelha, out=diferenca, dtype=dtype)
+        np.add(banda_nir, banda_vermelha, out=ndvi_faixa, dtype=dtype)
+        np.add(ndvi_faixa, 1e-10, out=ndvi_faixa)
+        np.divide(diferenca, ndvi_faixa, out=ndvi_faixa)
+
+        np.less(ndvi_faixa, limiar, out=problemas_faixa)
+        if limiar_ndvi == limiar:
+            np.copyto(pragas_faixa, problemas_faixa)
+        else:
+            np.less(ndvi_faixa, limiar_ndvi, out=pragas_faixa)
+        np.greater(faixa[:, :, BANDA_VERDE], limiar_cor, out=auxiliar)
+        np.logical_and(pragas_faixa, auxiliar, out=pragas_faixa)
+        np.greater(faixa[:, :, BANDA_AZUL], limiar_cor, out=auxiliar)
+        np.logical_and(pragas_faixa, auxiliar, out=pragas_faixa)
+
+        soma += float(np.sum(ndvi_faixa, dtype=np.float64))
+        minimo = min(minimo, float(np.min(ndvi_faixa)))
+        maximo = max(maximo, float(np.max(ndvi_faixa)))
+
+    return (ndvi, problemas, pragas, soma, minimo, maximo,
+            int(np.count_nonzero(problemas)), int(np.count_nonzero(pragas)))
+
+
+def _analisar_paralelo(imagem, limiar, limiar_ndvi, limiar_cor, buffers, num_threads):
+    """
+    Executa _analisar em faixas de linhas paralelas: cada thread grava o NDVI e as máscaras das suas linhas
+    nos buffers compartilhados, com temporários próprios, e as estatísticas parciais são combinadas no fim.
+    """
+    from paralelo import executar_em_faixas
+    altura, largura = imagem.shape[:2]
+
+    def analisar_faixa(faixa):
+        buffers_faixa = {chave: buffers[chave][:altura, :largura][faixa] for chave in ("ndvi", "problemas", "pragas")}
+        buffers_faixa["diferenca"] = np.empty_like(buffers["diferenca"][:, :largura])
+        buffers_faixa["auxiliar"] = np.empty_like(buffers["auxiliar"][:, :largura])
+        return _analisar(imagem[faixa], limiar, limiar_ndvi, limiar_cor, buffers_faixa)[3:]
+
+    parciais = executar_em_faixas(analisar_faixa, altura, num_threads)
+    somas, minimos, maximos, num_problemas, num_pragas = zip(*parciais)
+    return (buffers["ndvi"][:altura, :largura], buffers["problemas"][:altura, :largura],
+            buffers["pragas"][:altura, :largura], float(sum(somas)), min(minimos), max(maximos),
+            sum(num_problemas), sum(num_pragas))
+
+
+@medir_etapa("analisar_imagem")
+def analisar_imagem(imagem, limiar=0.3, limiar_ndvi=0.3, limiar_cor=50, dtype=np.float64, buffers=None,
+                    num_threads=1):
+    """
+    Executa em uma única passada o cálculo do NDVI, a detecção de áreas problemáticas, a identificação
+    de pragas e as estatísticas do NDVI. Com dtype=np.float64 os resultados por pixel são idênticos
+    aos de calcular_ndvi, detectar_problemas e identificar_pragas.
+    :param imagem: Array NumPy contendo as diferentes bandas espectrais
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param limiar_ndvi: Limiar de NDVI para identificação de pragas
+    :param limiar_cor: Limiar de cor para identificação de pragas
+    :param dtype: Tipo de dado do NDVI (np.float32 reduz pela metade o tráfego de memória)
+    :param buffers: Buffers de criar_buffers_analise reaproveitados entre execuções (opcional)
+    :param num_threads: Threads que processam faixas de linhas da imagem em paralelo (None usa todos os núcleos)
+    :return: Dicionário com 'ndvi', 'problemas', 'pragas', NDVI médio/mínimo/máximo e totais
+    """
+    dtype = np.dtype(dtype)
+    if not _buffers_compativeis(buffers, imagem.shape[:2], dtype):
+        buffers = criar_buffers_analise(imagem.shape[:2], dtype)
+
+    if num_threads == 1:
+        resultado = _analisar(imagem, limiar, limiar_ndvi, limiar_cor, buffers)
+    else:
+        resultado = _analisar_paralelo(imagem, limiar, limiar_ndvi, limiar_cor, buffers, num_threads)
+    ndvi, problemas, pragas, soma, minimo, maximo, num_problemas, num_pragas = resultado
+    return {
+        "ndvi": ndvi,
+        "problemas": problemas,
+        "pragas": pragas,
+        "NDVI_Medio": soma / ndvi.size,
+        "NDVI_Minimo": minimo,
+        "NDVI_Maximo": maximo,
+        "Problemas_Totais": num_problemas,
+        "Pragas_Totais": num_pragas,
+    }
+
+
+@medir_etapa("calcular_ndvi")
+def calcular_ndvi(banda_nir, banda_vermelha, num_threads=1):
     """
     Calcula o Índice de Vegetação por Diferença Normalizada (NDVI).
     :param banda_nir: Array contendo os valores da banda NIR (infravermelho próximo)
     :param banda_vermelha: Array contendo os valores da banda vermelha
+    :param num_threads: Threads que processam faixas de linhas em paralelo (None usa todos os núcleos)
     :return: Array contendo os valores de NDVI
     """
+    if num_threads != 1:
+        return _calcular_ndvi_paralelo(banda_nir, banda_vermelha, num_threads)
     # Evitar divisão por zero
     banda_nir = banda_nir.astype(float)
     banda_vermelha = banda_vermelha.astype(float)
@@ -34,32 +314,88 @@ def calcular_ndvi(banda_nir, banda_vermelha):
     return ndvi
 
 
-def detectar_problemas(ndvi, limiar=0.3):
+def _calcular_ndvi_paralelo(banda_nir, banda_vermelha, num_threads):
+    """
+    Calcula o NDVI em faixas de linhas paralelas, gravando em um único array pré-alocado.
+    A sequência de operações é a de calcular_ndvi, com resultado idêntico.
+    """
+    from paralelo import executar_em_faixas, subfaixas
+    altura, largura = banda_nir.shape
+    ndvi = np.empty((altura, largura), dtype=float)
+    linhas_por_faixa = _linhas_por_faixa(altura, largura)
+
+    def calcular_faixa(faixa):
+        diferenca = np.empty((linhas_por_faixa, largura), dtype=float)
+        for linhas in subfaixas(faixa, linhas_por_faixa):
+            diferenca_faixa = diferenca[:linhas.stop - linhas.start]
+            ndvi_faixa = ndvi[linhas]
+            np.subtract(banda_nir[linhas], banda_vermelha[linhas], out=diferenca_faixa, dtype=float)
+            np.add(banda_nir[linhas], banda_vermelha[linhas], out=ndvi_faixa, dtype=float)
+            np.add(ndvi_faixa, 1e-10, out=ndvi_faixa)
+            np.divide(diferenca_faixa, ndvi_faixa, out=ndvi_faixa)
+
+    executar_em_faixas(calcular_faixa, altura, num_threads)
+    return ndvi
+
+
+@medir_etapa("detectar_problemas")
+def detectar_problemas(ndvi, limiar=0.3, num_threads=1):
     """
     Detecta áreas problemáticas com base no valor do NDVI.
     :param ndvi: Array contendo os valores de NDVI
     :param limiar: Limiar para detecção de áreas problemáticas
+    :param num_threads: Threads que processam faixas de linhas em paralelo (None usa todos os núcleos)
     :return: Máscara binária indicando áreas problemáticas
     """
+    if num_threads != 1:
+        from paralelo import executar_em_faixas
+        problemas = np.empty(ndvi.shape, dtype=bool)
+        executar_em_faixas(lambda faixa: np.less(ndvi[faixa], limiar, out=problemas[faixa]), ndvi.shape[0],
+                           num_threads)
+        return problemas
     return ndvi < limiar
 
 
-def detectar_problemas_avancado(ndvi, limiar=0.3, tamanho_minimo=5):
+@medir_etapa("detectar_problemas_avancado")
+def detectar_problemas_avancado(ndvi, limiar=0.3, tamanho_minimo=5, num_threads=1, retornar_regioes=False,
+                                pragas=None):
     """
     Detecta áreas problemáticas com uma análise avançada que considera o tamanho mínimo da área.
     :param ndvi: Array contendo os valores de NDVI
     :param limiar: Limiar para detecção de áreas problemáticas
     :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
-    :return: Máscara binária indicando áreas problemáticas
+    :param num_threads: Threads usadas na detecção, na rotulagem e na seleção das áreas (None usa todos os núcleos)
+    :param retornar_regioes: Se True, devolve também a tabela de propriedades das áreas mantidas (regioes.py)
+    :param pragas: Máscara de possíveis pragas, para a contagem de pixels com pragas de cada área (opcional)
+    :return: Máscara binária indicando áreas problemáticas ou, com retornar_regioes, tupla (máscara, tabela de regiões)
     """
-    problemas = detectar_problemas(ndvi, limiar)
-    problemas_rotulados, num_features = ndimage.label(problemas)
-    tamanhos = ndimage.sum(problemas, problemas_rotulados, range(num_features + 1))
-    mascara_areas_grandes = tamanhos >= tamanho_minimo
-    return mascara_areas_grandes[problemas_rotulados]
+    from rotulagem import rotular_componentes, tamanhos_componentes
+    problemas = detectar_problemas(ndvi, limiar, num_threads=num_threads)
+    if num_threads == 1:
+        import scipy.ndimage as ndimage
+        problemas_rotulados, num_features = ndimage.label(problemas)
+        tamanhos = tamanhos_componentes(problemas_rotulados, num_features)
+        mascara_areas_grandes = tamanhos >= tamanho_minimo
+        problemas = mascara_areas_grandes[problemas_rotulados]
+    else:
+        from paralelo import executar_em_faixas
+        problemas_rotulados, num_features = rotular_componentes(problemas, num_threads=num_threads)
+        altura = problemas_rotulados.shape[0]
+        parciais = executar_em_faixas(lambda faixa: tamanhos_componentes(problemas_rotulados[faixa], num_features),
+                                      altura, num_threads)
+        mascara_areas_grandes = np.sum(parciais, axis=0) >= tamanho_minimo
+        executar_em_faixas(lambda faixa: np.take(mascara_areas_grandes, problemas_rotulados[faixa],
+                                                 out=problemas[faixa]), altura, num_threads)
+
+    if retornar_regioes:
+        from regioes import tabela_regioes
+        # Os rótulos já calculados são reaproveitados; o fundo nunca entra na tabela
+        return problemas, tabela_regioes(problemas_rotulados, num_features, ndvi, pragas, mascara_areas_grandes)
+    return problemas
 
 
-def identificar_pragas(ndvi, banda_verde, banda_azul, limiar_ndvi=0.3, limiar_cor=50):
+@medir_etapa("identificar_pragas")
+def identificar_pragas(ndvi, banda_verde, banda_azul, limiar_ndvi=0.3, limiar_cor=50, num_threads=1):
     """
     Identifica possíveis pragas com base no NDVI e nos valores das bandas verde e azul.
     :param ndvi: Array contendo os valores de NDVI
@@ -67,7 +403,34 @@ def identificar_pragas(ndvi, banda_verde, banda_azul, limiar_ndvi=0.3, limiar_co
     :param banda_azul: Array contendo os valores da banda azul
     :param limiar_ndvi: Limiar de NDVI para indicar vegetação problemática
     :param limiar_cor: Limiar de cor para identificar possíveis pragas
+    :param num_threads: Threads que processam faixas de linhas em paralelo (None usa todos os núcleos)
     :return: Máscara binária indicando áreas com possível presença de pragas
     """
+    if num_threads != 1:
+        return _identificar_pragas_paralelo(ndvi, banda_verde, banda_azul, limiar_ndvi, limiar_cor, num_threads)
     pragas = (ndvi < limiar_ndvi) & (banda_verde > limiar_cor) & (banda_azul > limiar_cor)
     return pragas
+
+
+def _identificar_pragas_paralelo(ndvi, banda_verde, banda_azul, limiar_ndvi, limiar_cor, num_threads):
+    """
+    Identifica possíveis pragas em faixas de linhas paralelas, gravando em uma única máscara pré-alocada.
+    """
+    from paralelo import executar_em_faixas, subfaixas
+    altura, largura = ndvi.shape
+    pragas = np.empty((altura, largura), dtype=bool)
+    linhas_por_faixa = _linhas_por_faixa(altura, largura)
+
+    def identificar_faixa(faixa):
+        auxiliar = np.empty((linhas_por_faixa, largura), dtype=bool)
+        for linhas in subfaixas(faixa, linhas_por_faixa):
+            auxiliar_faixa = auxiliar[:linhas.stop - linhas.start]
+            pragas_faixa = pragas[linhas]
+            np.less(ndvi[linhas], limiar_ndvi, out=pragas_faixa)
+            np.greater(banda_verde[linhas], limiar_cor, out=auxiliar_faixa)
+            np.logical_and(pragas_faixa, auxiliar_faixa, out=pragas_faixa)
+            np.greater(banda_azul[linhas], limiar_cor, out=auxiliar_faixa)
+            np.logical_and(pragas_faixa, auxiliar_faixa, out=pragas_faixa)
+
+    executar_em_faixas(identificar_faixa, altura, num_threads)
+    return pragas
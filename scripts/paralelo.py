@@ -0,0 +1,50 @@
+# paralelo.py - Execução multithread de uma mesma imagem em faixas de linhas (as ufuncs do NumPy liberam o GIL)
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def resolver_num_threads(num_threads=None):
+    """
+    Número de threads efetivo: o valor informado ou, se None/0, o número de núcleos do processador.
+    """
+    return max(1, num_threads or os.cpu_count() or 1)
+
+
+def dividir_em_faixas(altura, num_faixas):
+    """
+    Divide as linhas da imagem em faixas contíguas de alturas quase iguais.
+    :param altura: Número de linhas da imagem
+    :param num_faixas: Número desejado de faixas (limitado ao número de linhas)
+    :return: Lista de slices de linhas
+    """
+    num_faixas = max(1, min(num_faixas, altura))
+    limites = np.linspace(0, altura, num_faixas + 1).astype(int)
+    return [slice(inicio, fim) for inicio, fim in zip(limites[:-1], limites[1:])]
+
+
+def subfaixas(faixa, linhas_por_subfaixa):
+    """
+    Percorre uma faixa em blocos menores de linhas, para que os temporários de cada thread caibam no cache.
+    """
+    for inicio in range(faixa.start, faixa.stop, linhas_por_subfaixa):
+        yield slice(inicio, min(inicio + linhas_por_subfaixa, faixa.stop))
+
+
+def executar_em_faixas(funcao, altura, num_threads=None):
+    """
+    Executa funcao(faixa) para cada faixa de linhas da imagem em um pool de threads, uma faixa por thread.
+    A função deve gravar seu resultado em arrays de saída pré-alocados e compartilhados (cada thread
+    escreve apenas nas suas linhas) e pode devolver um valor parcial (ex: soma ou contagem da faixa).
+    :param funcao: Função que recebe um slice de linhas
+    :param altura: Número de linhas da imagem
+    :param num_threads: Número de threads (None usa todos os núcleos)
+    :return: Lista com o valor devolvido por cada faixa, de cima para baixo
+    """
+    num_threads = resolver_num_threads(num_threads)
+    faixas = dividir_em_faixas(altura, num_threads)
+    if len(faixas) == 1:
+        return [funcao(faixas[0])]
+    with ThreadPoolExecutor(max_workers=len(faixas)) as executor:
+        return list(executor.map(funcao, faixas))
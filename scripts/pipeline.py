@@ -0,0 +1,162 @@
+# pipeline.py - Execução em pipeline (carga, processamento e persistência sobrepostos) de várias imagens
+import queue
+import threading
+
+import numpy as np
+
+_FIM = object()
+_ESPERA = 0.1
+
+
+class _OrcamentoMemoria:
+    """
+    Limita os bytes de arrays carregados e ainda não processados. Um item sempre é aceito quando
+    nada está reservado, para que uma imagem maior que o orçamento não trave o pipeline.
+    """
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.reservado = 0
+        self._condicao = threading.Condition()
+
+    def reservar(self, num_bytes, parar):
+        if self.limite_bytes is None:
+            return
+        with self._condicao:
+            while self.reservado and self.reservado + num_bytes > self.limite_bytes and not parar.is_set():
+                self._condicao.wait(_ESPERA)
+            self.reservado += num_bytes
+
+    def liberar(self, num_bytes):
+        if self.limite_bytes is None:
+            return
+        with self._condicao:
+            self.reservado -= num_bytes
+            self._condicao.notify_all()
+
+
+def _bytes_valor(valor):
+    return valor.nbytes if isinstance(valor, np.ndarray) else 0
+
+
+def _colocar(fila, valor, parar):
+    """
+    Coloca um valor na fila limitada, esperando por espaço (contrapressão) enquanto o pipeline não é interrompido.
+    """
+    while not parar.is_set():
+        try:
+            fila.put(valor, timeout=_ESPERA)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _retirar(fila, parar):
+    """
+    Retira o próximo valor da fila, devolvendo _FIM se o pipeline for interrompido.
+    """
+    while True:
+        try:
+            return fila.get(timeout=_ESPERA)
+        except queue.Empty:
+            if parar.is_set():
+                return _FIM
+
+
+def executar_pipeline(itens, carregar, processar, persistir=None, profundidade=2, limite_bytes=None,
+                      estimar_bytes=None):
+    """
+    Executa três etapas sobrepostas: enquanto o item N é processado na thread principal, o item N+1 é
+    carregado em uma thread de leitura e o resultado do item N-1 é persistido em uma thread de gravação.
+    As filas entre as etapas são limitadas (contrapressão): a leitura nunca fica mais de 'profundidade'
+    itens à frente do processamento, e o mesmo vale para a gravação. Assim, a vazão se aproxima da etapa
+    mais lenta, e não da soma das três.
+    Uma exceção em qualquer etapa interrompe o pipeline e é relançada; erros por item que não devem
+    interromper o lote devem ser tratados nas próprias funções.
+    :param itens: Iterável de itens (ex: caminhos de imagens)
+    :param carregar: Função carregar(item) -> valor, executada na thread de leitura (ex: decodificação)
+    :param processar: Função processar(item, valor) -> resultado, executada na thread principal
+    :param persistir: Função persistir(resultado), executada na thread de gravação (opcional)
+    :param profundidade: Número máximo de itens aguardando em cada fila
+    :param limite_bytes: Máximo de bytes de arrays carregados e ainda não processados (opcional). Sem
+                         estimar_bytes, a reserva só é feita depois da carga, e o item em carga fica fora do
+                         orçamento (o pico pode exceder o limite em um item)
+    :param estimar_bytes: Função estimar_bytes(item) -> bytes, que estima o tamanho do valor antes da carga
+                          (ex: pelo cabeçalho do arquivo). A estimativa é reservada antes de carregar e
+                          corrigida para o tamanho real em seguida (opcional)
+    :return: Lista de resultados, na ordem dos itens
+    """
+    carregados = queue.Queue(maxsize=profundidade)
+    a_persistir = queue.Queue(maxsize=profundidade)
+    parar = threading.Event()
+    erros = []
+    orcamento = _OrcamentoMemoria(limite_bytes)
+
+    def leitura():
+        try:
+            for item in itens:
+                if parar.is_set():
+                    break
+                estimativa = estimar_bytes(item) if estimar_bytes is not None else None
+                if estimativa is not None:
+                    # A imagem em decodificação também conta no orçamento
+                    orcamento.reservar(estimativa, parar)
+                valor = carregar(item)
+                num_bytes = _bytes_valor(valor)
+                if estimativa is None:
+                    orcamento.reservar(num_bytes, parar)
+                else:
+                    orcamento.liberar(estimativa - num_bytes)
+                if not _colocar(carregados, (item, valor, num_bytes), parar):
+                    break
+        except BaseException as e:
+            erros.append(e)
+            parar.set()
+        finally:
+            _colocar(carregados, _FIM, parar)
+
+    def gravacao():
+        try:
+            while True:
+                resultado = _retirar(a_persistir, parar)
+                if resultado is _FIM:
+                    break
+                persistir(resultado)
+        except BaseException as e:
+            erros.append(e)
+            parar.set()
+
+    threads = [threading.Thread(target=leitura, name="pipeline-leitura", daemon=True)]
+    if persistir is not None:
+        threads.append(threading.Thread(target=gravacao, name="pipeline-gravacao", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    resultados = []
+    try:
+        while True:
+            entrada = _retirar(carregados, parar)
+            if entrada is _FIM or parar.is_set():
+                break
+            item, valor, num_bytes = entrada
+            try:
+                resultado = processar(item, valor)
+            finally:
+                del entrada, valor
+                orcamento.liberar(num_bytes)
+            resultados.append(resultado)
+            if persistir is not None and not _colocar(a_persistir, resultado, parar):
+                break
+        if persistir is not None:
+            _colocar(a_persistir, _FIM, parar)
+    except BaseException:
+        parar.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if erros:
+        raise erros[0]
+    return resultados
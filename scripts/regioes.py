@@ -0,0 +1,262 @@
+# regioes.py - Tabela de propriedades das áreas problemáticas e índice espacial em grade para consultas por região
+import numpy as np
+
+# Colunas da tabela de regiões; o retângulo envolvente segue a convenção dos slices (fim exclusivo)
+TIPO_REGIOES = np.dtype([
+    ("regiao", np.int64),
+    ("area", np.int64),
+    ("linha_inicio", np.int64),
+    ("coluna_inicio", np.int64),
+    ("linha_fim", np.int64),
+    ("coluna_fim", np.int64),
+    ("centroide_linha", np.float64),
+    ("centroide_coluna", np.float64),
+    ("ndvi_medio", np.float64),
+    ("pragas", np.int64),
+    ("fracao_pragas", np.float64),
+])
+
+
+def tabela_regioes(rotulos, num_rotulos, ndvi=None, pragas=None, selecionados=None):
+    """
+    Calcula área, retângulo envolvente, centróide, NDVI médio e pixels com pragas de cada componente rotulado,
+    com passadas vetorizadas (bincount e reduções com ufunc.at) sobre os pixels rotulados, sem laço por região.
+    :param rotulos: Array 2D de rótulos (0 = fundo), ex: resultado de ndimage.label
+    :param num_rotulos: Número de rótulos
+    :param ndvi: Array contendo os valores de NDVI (opcional)
+    :param pragas: Máscara binária de possíveis pragas (opcional)
+    :param selecionados: Máscara booleana com num_rotulos + 1 posições dos rótulos que entram na tabela
+                         (ex: tamanhos >= tamanho_minimo), opcional
+    :return: Array estruturado (TIPO_REGIOES) com uma linha por região, na ordem dos rótulos
+    """
+    largura = rotulos.shape[1]
+    plano = rotulos.ravel()
+    posicoes = np.flatnonzero(plano)
+    rotulos_pixels = plano[posicoes]
+    if selecionados is not None:
+        manter = selecionados[rotulos_pixels]
+        posicoes, rotulos_pixels = posicoes[manter], rotulos_pixels[manter]
+    linhas, colunas = np.divmod(posicoes, largura)
+
+    area = np.bincount(rotulos_pixels, minlength=num_rotulos + 1)
+    presentes = area > 0
+    presentes[0] = False
+    contagem = np.maximum(area, 1)
+
+    linha_inicio = np.full(num_rotulos + 1, np.iinfo(np.int64).max)
+    coluna_inicio = np.full(num_rotulos + 1, np.iinfo(np.int64).max)
+    linha_fim = np.full(num_rotulos + 1, -1, dtype=np.int64)
+    coluna_fim = np.full(num_rotulos + 1, -1, dtype=np.int64)
+    np.minimum.at(linha_inicio, rotulos_pixels, linhas)
+    np.minimum.at(coluna_inicio, rotulos_pixels, colunas)
+    np.maximum.at(linha_fim, rotulos_pixels, linhas)
+    np.maximum.at(coluna_fim, rotulos_pixels, colunas)
+
+    tabela = np.zeros(int(np.count_nonzero(presentes)), dtype=TIPO_REGIOES)
+    tabela["regiao"] = np.flatnonzero(presentes)
+    tabela["area"] = area[presentes]
+    tabela["linha_inicio"] = linha_inicio[presentes]
+    tabela["coluna_inicio"] = coluna_inicio[presentes]
+    tabela["linha_fim"] = linha_fim[presentes] + 1
+    tabela["coluna_fim"] = coluna_fim[presentes] + 1
+    tabela["centroide_linha"] = (np.bincount(rotulos_pixels, weights=linhas, minlength=num_rotulos + 1)
+                                 / contagem)[presentes]
+    tabela["centroide_coluna"] = (np.bincount(rotulos_pixels, weights=colunas, minlength=num_rotulos + 1)
+                                  / contagem)[presentes]
+    if ndvi is not None:
+        soma_ndvi = np.bincount(rotulos_pixels, weights=ndvi.ravel()[posicoes], minlength=num_rotulos + 1)
+        tabela["ndvi_medio"] = (soma_ndvi / contagem)[presentes]
+    if pragas is not None:
+        tabela["pragas"] = np.bincount(rotulos_pixels, weights=pragas.ravel()[posicoes],
+                                       minlength=num_rotulos + 1)[presentes]
+        tabela["fracao_pragas"] = tabela["pragas"] / tabela["area"]
+    return tabela
+
+
+def regioes_da_mascara(mascara, ndvi=None, pragas=None):
+    """
+    Rotula uma máscara de áreas problemáticas já calculada (ex: detecção hierárquica ou máscara compacta
+    descompactada) e monta a tabela de regiões. Como as áreas mantidas pela análise avançada são componentes
+    inteiros, o resultado é o mesmo de detectar_problemas_avancado(..., retornar_regioes=True), exceto
+    pela numeração das regiões.
+    :param mascara: Máscara binária de áreas problemáticas
+    :param ndvi: Array contendo os valores de NDVI (opcional)
+    :param pragas: Máscara binária de possíveis pragas (opcional)
+    :return: Tabela de regiões (TIPO_REGIOES)
+    """
+    import scipy.ndimage as ndimage
+    rotulos, num_rotulos = ndimage.label(mascara)
+    return tabela_regioes(rotulos, num_rotulos, ndvi, pragas)
+
+
+def maiores_regioes(tabela, quantidade=20, coluna="area"):
+    """
+    Seleciona as regiões com os maiores valores de uma coluna (ex: as 20 maiores áreas problemáticas)
+    sem ordenar a tabela inteira.
+    :param tabela: Tabela de regiões (TIPO_REGIOES)
+    :param quantidade: Número de regiões
+    :param coluna: Coluna usada na comparação
+    :return: Linhas da tabela, da maior para a menor
+    """
+    quantidade = min(quantidade, len(tabela))
+    if quantidade == 0:
+        return tabela[:0]
+    valores = tabela[coluna]
+    indices = np.argpartition(-valores, quantidade - 1)[:quantidade]
+    return tabela[indices[np.argsort(-valores[indices], kind='stable')]]
+
+
+class IndiceRegioes:
+    """
+    Índice espacial em grade uniforme sobre os retângulos envolventes das regiões: cada célula guarda as
+    regiões cujo retângulo a toca (em formato CSR: início de cada célula e lista de regiões), de modo que
+    as consultas examinam apenas as regiões das células próximas, e não a tabela inteira.
+    """
+
+    def __init__(self, tabela, tamanho_celula=None):
+        """
+        :param tabela: Tabela de regiões (TIPO_REGIOES)
+        :param tamanho_celula: Lado, em pixels, das células da grade (padrão: cerca de uma região por célula)
+        """
+        self.tabela = tabela
+        num_regioes = len(tabela)
+        self.altura = int(tabela["linha_fim"].max()) if num_regioes else 1
+        self.largura = int(tabela["coluna_fim"].max()) if num_regioes else 1
+        if tamanho_celula is None:
+            lado_medio = float(np.mean(np.maximum(tabela["linha_fim"] - tabela["linha_inicio"],
+                                                  tabela["coluna_fim"] - tabela["coluna_inicio"]))) if num_regioes else 1
+            tamanho_celula = max(np.sqrt(self.altura * self.largura / max(num_regioes, 1)), lado_medio)
+        self.tamanho_celula = max(1, int(np.ceil(tamanho_celula)))
+        self.linhas_grade = -(-self.altura // self.tamanho_celula)
+        self.colunas_grade = -(-self.largura // self.tamanho_celula)
+
+        # Células tocadas por cada retângulo, expandidas em pares (região, célula) sem laço por região
+        linha_inicial = tabela["linha_inicio"] // self.tamanho_celula
+        coluna_inicial = tabela["coluna_inicio"] // self.tamanho_celula
+        num_linhas = (tabela["linha_fim"] - 1) // self.tamanho_celula - linha_inicial + 1
+        num_colunas = (tabela["coluna_fim"] - 1) // self.tamanho_celula - coluna_inicial + 1
+        num_celulas = num_linhas * num_colunas
+        regioes = np.repeat(np.arange(num_regioes), num_celulas)
+        deslocamento = np.arange(regioes.size) - np.repeat(np.cumsum(num_celulas) - num_celulas, num_celulas)
+        celulas = ((linha_inicial[regioes] + deslocamento // num_colunas[regioes]) * self.colunas_grade
+                   + coluna_inicial[regioes] + deslocamento % num_colunas[regioes])
+
+        ordem = np.argsort(celulas, kind='stable')
+        self.regioes_celulas = regioes[ordem]
+        self.inicio_celulas = np.concatenate(([0], np.cumsum(np.bincount(
+            celulas, minlength=self.linhas_grade * self.colunas_grade))))
+
+    def _regioes_nas_celulas(self, linha_inicial, coluna_inicial, linha_final, coluna_final):
+        """
+        Regiões registradas nas células do retângulo de células informado (fim inclusivo, já limitado à grade).
+        Em cada linha da grade as células consecutivas ocupam um trecho contínuo da lista de regiões.
+        """
+        trechos = []
+        for linha in range(linha_inicial, linha_final + 1):
+            primeira = linha * self.colunas_grade + coluna_inicial
+            ultima = linha * self.colunas_grade + coluna_final
+            trechos.append(self.regioes_celulas[self.inicio_celulas[primeira]:self.inicio_celulas[ultima + 1]])
+        if not trechos:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(trechos))
+
+    def _regioes_no_anel(self, linha_celula, coluna_celula, raio):
+        """
+        Regiões registradas nas células a exatamente raio células (na horizontal ou na vertical) da célula
+        central, limitadas à grade. Uma região que toca várias células do anel pode aparecer repetida.
+        """
+        linha_inicial, linha_final = linha_celula - raio, linha_celula + raio
+        coluna_inicial = max(coluna_celula - raio, 0)
+        coluna_final = min(coluna_celula + raio, self.colunas_grade - 1)
+        trechos = []
+        for linha in sorted({linha_inicial, linha_final}):
+            if 0 <= linha < self.linhas_grade:
+                primeira = linha * self.colunas_grade + coluna_inicial
+                ultima = linha * self.colunas_grade + coluna_final
+                trechos.append(self.regioes_celulas[self.inicio_celulas[primeira]:self.inicio_celulas[ultima + 1]])
+        for coluna in sorted({coluna_celula - raio, coluna_celula + raio}):
+            if 0 <= coluna < self.colunas_grade:
+                for linha in range(max(linha_inicial + 1, 0), min(linha_final, self.linhas_grade)):
+                    celula = linha * self.colunas_grade + coluna
+                    trechos.append(self.regioes_celulas[self.inicio_celulas[celula]:self.inicio_celulas[celula + 1]])
+        if not trechos:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(trechos)
+
+    def _distancia_fora_dos_aneis(self, linha, coluna, linha_celula, coluna_celula, raio):
+        """
+        Distância mínima do ponto a uma região que não toca nenhuma célula até o anel raio (None se os anéis
+        já cobrem a grade inteira). Essa região fica inteiramente além de um dos lados do quadrado de células
+        examinado, então a distância é pelo menos a do ponto até esse lado, mesmo com o ponto fora da grade.
+        """
+        limites = []
+        if linha_celula - raio > 0:
+            limites.append(linha - ((linha_celula - raio) * self.tamanho_celula - 1))
+        if linha_celula + raio < self.linhas_grade - 1:
+            limites.append((linha_celula + raio + 1) * self.tamanho_celula - linha)
+        if coluna_celula - raio > 0:
+            limites.append(coluna - ((coluna_celula - raio) * self.tamanho_celula - 1))
+        if coluna_celula + raio < self.colunas_grade - 1:
+            limites.append((coluna_celula + raio + 1) * self.tamanho_celula - coluna)
+        return min(limites) if limites else None
+
+    def _celula(self, posicao, limite):
+        return min(max(int(posicao) // self.tamanho_celula, 0), limite - 1)
+
+    def consultar_retangulo(self, linha_inicio, coluna_inicio, linha_fim, coluna_fim):
+        """
+        Encontra as regiões cujo retângulo envolvente intersecta o retângulo informado (fim exclusivo).
+        :return: Índices das linhas da tabela, em ordem crescente
+        """
+        if len(self.tabela) == 0 or linha_fim <= linha_inicio or coluna_fim <= coluna_inicio:
+            return np.empty(0, dtype=np.int64)
+        if linha_inicio >= self.altura or coluna_inicio >= self.largura or linha_fim <= 0 or coluna_fim <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidatas = self._regioes_nas_celulas(self._celula(linha_inicio, self.linhas_grade),
+                                               self._celula(coluna_inicio, self.colunas_grade),
+                                               self._celula(linha_fim - 1, self.linhas_grade),
+                                               self._celula(coluna_fim - 1, self.colunas_grade))
+        linhas = self.tabela[candidatas]
+        intersecta = ((linhas["linha_inicio"] < linha_fim) & (linhas["linha_fim"] > linha_inicio)
+                      & (linhas["coluna_inicio"] < coluna_fim) & (linhas["coluna_fim"] > coluna_inicio))
+        return candidatas[intersecta]
+
+    def _distancias(self, indices, linha, coluna):
+        """
+        Distância, em pixels, do ponto ao retângulo envolvente de cada região (0 se o ponto estiver dentro).
+        """
+        linhas = self.tabela[indices]
+        distancia_linha = np.maximum(np.maximum(linhas["linha_inicio"] - linha, linha - (linhas["linha_fim"] - 1)), 0)
+        distancia_coluna = np.maximum(np.maximum(linhas["coluna_inicio"] - coluna,
+                                                 coluna - (linhas["coluna_fim"] - 1)), 0)
+        return np.hypot(distancia_linha, distancia_coluna)
+
+    def mais_proximas(self, linha, coluna, quantidade=1):
+        """
+        Encontra as regiões mais próximas de um ponto, pela distância ao retângulo envolvente. A busca cresce
+        em anéis de células ao redor do ponto (cada passo examina apenas as células do novo anel) e para quando
+        nenhuma região fora dos anéis pode estar mais perto.
+        :param linha: Linha do ponto, em pixels
+        :param coluna: Coluna do ponto, em pixels
+        :param quantidade: Número de regiões
+        :return: Tupla (índices das linhas da tabela, distâncias), da mais próxima para a mais distante
+        """
+        quantidade = min(quantidade, len(self.tabela))
+        if quantidade == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        linha_celula = self._celula(linha, self.linhas_grade)
+        coluna_celula = self._celula(coluna, self.colunas_grade)
+        # Apenas as melhores regiões até o anel atual são mantidas e combinadas com as do novo anel
+        melhores, distancias_melhores = np.empty(0, dtype=np.int64), np.empty(0)
+        raio = 0
+        while True:
+            novas = self._regioes_no_anel(linha_celula, coluna_celula, raio)
+            if novas.size:
+                candidatas = np.unique(np.concatenate((melhores, novas)))
+                distancias = self._distancias(candidatas, linha, coluna)
+                ordem = np.argsort(distancias, kind='stable')[:quantidade]
+                melhores, distancias_melhores = candidatas[ordem], distancias[ordem]
+            limite = self._distancia_fora_dos_aneis(linha, coluna, linha_celula, coluna_celula, raio)
+            if limite is None or (melhores.size == quantidade and distancias_melhores[-1] < limite):
+                return melhores, distancias_melhores
+            raio += 1
@@ -0,0 +1,168 @@
+# rotulagem.py - Rotulagem de componentes conexos em faixas paralelas, com junção das faixas por union-find
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.ndimage as ndimage
+
+
+def _estrutura_conectividade(estrutura):
+    """
+    Normaliza o elemento estruturante (padrão do ndimage.label: conectividade 4) e indica
+    se ele conecta pixels na diagonal.
+    """
+    if estrutura is None:
+        estrutura = ndimage.generate_binary_structure(2, 1)
+    estrutura = np.asarray(estrutura, dtype=bool)
+    diagonal = bool(estrutura[0, 0] or estrutura[0, 2] or estrutura[2, 0] or estrutura[2, 2])
+    return estrutura, diagonal
+
+
+def _pares_na_fronteira(linha_superior, linha_inferior, diagonal):
+    """
+    Encontra os pares de rótulos que se tocam entre a última linha de uma faixa e a primeira da seguinte.
+    :return: Tupla de arrays (rótulos de cima, rótulos de baixo)
+    """
+    pares_a = [linha_superior]
+    pares_b = [linha_inferior]
+    if diagonal:
+        pares_a += [linha_superior[:-1], linha_superior[1:]]
+        pares_b += [linha_inferior[1:], linha_inferior[:-1]]
+    a = np.concatenate(pares_a)
+    b = np.concatenate(pares_b)
+    conectados = (a > 0) & (b > 0)
+    return a[conectados], b[conectados]
+
+
+def _encontrar_raizes(pais, elementos):
+    """
+    Segue os ponteiros do union-find, de forma vetorizada, até a raiz de cada elemento.
+    """
+    while True:
+        proximos = pais[elementos]
+        if np.array_equal(proximos, elementos):
+            return elementos
+        elementos = proximos
+
+
+def _unir_rotulos(num_rotulos, a, b):
+    """
+    Union-find vetorizado: une os pares de rótulos (a, b), sempre pendurando a raiz maior na menor,
+    e devolve o mapa de cada rótulo para um rótulo final consecutivo.
+    :return: Tupla (mapa de rótulos, número de componentes)
+    """
+    pais = np.arange(num_rotulos + 1, dtype=np.int64)
+    while a.size:
+        raizes_a = _encontrar_raizes(pais, a)
+        raizes_b = _encontrar_raizes(pais, b)
+        diferentes = raizes_a != raizes_b
+        raizes_a, raizes_b = raizes_a[diferentes], raizes_b[diferentes]
+        np.minimum.at(pais, np.maximum(raizes_a, raizes_b), np.minimum(raizes_a, raizes_b))
+        a, b = a[diferentes], b[diferentes]
+
+    # Compressão completa dos caminhos e renumeração consecutiva das raízes
+    while True:
+        avos = pais[pais]
+        if np.array_equal(avos, pais):
+            break
+        pais = avos
+    raizes = pais == np.arange(pais.size)
+    raizes[0] = False
+    novos_rotulos = np.cumsum(raizes)
+    return novos_rotulos[pais], int(novos_rotulos[-1])
+
+
+def rotular_componentes(mascara, estrutura=None, num_threads=None, num_faixas=None):
+    """
+    Rotula os componentes conexos de uma máscara 2D dividindo-a em faixas de linhas rotuladas em paralelo
+    (o ndimage.label libera o GIL) e unindo, com union-find, os componentes que cruzam as fronteiras das faixas.
+    O número de componentes e a partição dos pixels são idênticos aos de ndimage.label; apenas a numeração
+    dos rótulos pode diferir.
+    :param mascara: Máscara binária 2D
+    :param estrutura: Elemento estruturante 3x3 (padrão: conectividade 4, como o ndimage.label)
+    :param num_threads: Número de threads (padrão: número de núcleos)
+    :param num_faixas: Número de faixas (padrão: igual ao número de threads)
+    :return: Tupla (array de rótulos int32, número de componentes)
+    """
+    estrutura, diagonal = _estrutura_conectividade(estrutura)
+    num_threads = num_threads or os.cpu_count() or 1
+    altura = mascara.shape[0]
+    num_faixas = max(1, min(num_faixas or num_threads, altura))
+    if num_faixas == 1:
+        return ndimage.label(mascara, structure=estrutura, output=np.int32)
+
+    limites = np.linspace(0, altura, num_faixas + 1).astype(int)
+    faixas = [slice(inicio, fim) for inicio, fim in zip(limites[:-1], limites[1:])]
+    rotulos = np.empty(mascara.shape, dtype=np.int32)
+
+    def rotular_faixa(faixa):
+        return ndimage.label(mascara[faixa], structure=estrutura, output=rotulos[faixa])
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        quantidades = list(executor.map(rotular_faixa, faixas))
+        deslocamentos = np.concatenate(([0], np.cumsum(quantidades)[:-1]))
+        total = int(np.sum(quantidades))
+
+        def deslocar_faixa(indice):
+            faixa = rotulos[faixas[indice]]
+            np.add(faixa, deslocamentos[indice], out=faixa, where=faixa > 0)
+
+        list(executor.map(deslocar_faixa, range(len(faixas))))
+
+        pares = [_pares_na_fronteira(rotulos[faixa.stop - 1], rotulos[faixa.stop], diagonal) for faixa in faixas[:-1]]
+        a = np.concatenate([par[0] for par in pares]).astype(np.int64)
+        b = np.concatenate([par[1] for par in pares]).astype(np.int64)
+        if a.size == 0:
+            return rotulos, total
+
+        mapa, num_componentes = _unir_rotulos(total, a, b)
+        mapa = mapa.astype(np.int32)
+
+        def renumerar_faixa(faixa):
+            np.take(mapa, rotulos[faixa], out=rotulos[faixa])
+
+        list(executor.map(renumerar_faixa, faixas))
+    return rotulos, num_componentes
+
+
+def tamanhos_componentes(rotulos, num_componentes):
+    """
+    Calcula a área (em pixels) de cada componente em uma única passada com bincount.
+    O rótulo 0 (fundo) recebe tamanho zero, como em ndimage.sum(mascara, rotulos, ...).
+    :param rotulos: Array de rótulos
+    :param num_componentes: Número de componentes rotulados
+    :return: Array com num_componentes + 1 tamanhos
+    """
+    tamanhos = np.bincount(rotulos.ravel(), minlength=num_componentes + 1)
+    tamanhos[0] = 0
+    return tamanhos
+
+
+def detectar_componentes_em_blocos(ndvi, limiar, tamanho_minimo, blocos, tamanho_bloco, saida):
+    """
+    Aplica a análise avançada de problemas (limiar + tamanho mínimo) apenas nos blocos marcados, gravando
+    o resultado em saida somente nesses blocos. O resultado é idêntico ao da imagem inteira desde que nenhuma
+    área problemática atravesse a fronteira entre um bloco marcado e um não marcado.
+    Cada grupo conexo de blocos marcados é rotulado separadamente, dentro do seu retângulo envolvente.
+    :param ndvi: Array contendo os valores de NDVI
+    :param limiar: Limiar para detecção de áreas problemáticas
+    :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
+    :param blocos: Máscara 2D (uma posição por bloco) dos blocos a processar
+    :param tamanho_bloco: Lado, em pixels, de cada bloco
+    :param saida: Máscara binária de saída, com o mesmo formato do NDVI
+    """
+    altura, largura = ndvi.shape
+    grupos, _ = ndimage.label(blocos)
+    for indice, fatias in enumerate(ndimage.find_objects(grupos), 1):
+        if fatias is None:
+            continue
+        linhas = slice(fatias[0].start * tamanho_bloco, min(fatias[0].stop * tamanho_bloco, altura))
+        colunas = slice(fatias[1].start * tamanho_bloco, min(fatias[1].stop * tamanho_bloco, largura))
+        pertence = grupos[fatias] == indice
+        pertence = np.repeat(np.repeat(pertence, tamanho_bloco, axis=0), tamanho_bloco, axis=1)
+        pertence = pertence[:linhas.stop - linhas.start, :colunas.stop - colunas.start]
+
+        problemas = (ndvi[linhas, colunas] < limiar) & pertence
+        rotulos, num_componentes = ndimage.label(problemas)
+        resultado = (tamanhos_componentes(rotulos, num_componentes) >= tamanho_minimo)[rotulos]
+        np.copyto(saida[linhas, colunas], resultado, where=pertence)
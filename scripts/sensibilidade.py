@@ -0,0 +1,192 @@
+# sensibilidade.py - Curvas de sensibilidade dos limiares de detecção calculadas em uma única passada sobre os dados
+import numpy as np
+from metricas import medir_etapa
+from rotulagem import _encontrar_raizes
+
+
+def _ordenar_limiares(limiares):
+    """
+    Ordena os limiares, guardando a ordem original para devolver os resultados na ordem pedida.
+    :return: Tupla (limiares em ordem crescente, índices que restauram a ordem original)
+    """
+    limiares = np.atleast_1d(np.asarray(limiares, dtype=float))
+    ordem = np.argsort(limiares, kind='stable')
+    return limiares[ordem], np.argsort(ordem, kind='stable')
+
+
+def _tipo_estagio(num_limiares):
+    """
+    Menor tipo inteiro capaz de guardar os estágios (0 a num_limiares); inteiros de 8 e 16 bits são
+    ordenados com radix sort pela ordenação estável do NumPy.
+    """
+    return np.uint8 if num_limiares < 255 else np.uint16 if num_limiares < 65535 else np.int64
+
+
+def _estagios_abaixo(valores, limiares_ordenados):
+    """
+    Para cada valor, o número de limiares (ordenados) menores ou iguais a ele: o valor fica abaixo do
+    limiar k (valor < limiar) exatamente para k >= estágio. NaN recebe o número de limiares (nunca abaixo).
+    """
+    return np.searchsorted(limiares_ordenados, valores, side='right')
+
+
+@medir_etapa("sensibilidade_problemas")
+def sensibilidade_problemas(ndvi, limiares):
+    """
+    Conta os pixels marcados por detectar_problemas para vários limiares de uma vez: o NDVI é ordenado
+    uma única vez e cada limiar vira uma busca binária no array ordenado, em vez de uma máscara por limiar.
+    :param ndvi: Array contendo os valores de NDVI
+    :param limiares: Sequência de limiares (ex: np.linspace(0, 0.6, 100))
+    :return: Array com o número de pixels com NDVI abaixo de cada limiar, na ordem dos limiares
+    """
+    # O NaN fica no fim da ordenação e nunca é contado, como na comparação ndvi < limiar
+    ordenado = np.sort(np.ravel(ndvi))
+    return np.searchsorted(ordenado, np.asarray(limiares, dtype=float), side='left')
+
+
+@medir_etapa("sensibilidade_pragas")
+def sensibilidade_pragas(ndvi, banda_verde, banda_azul, limiares_ndvi, limiares_cor):
+    """
+    Conta os pixels marcados por identificar_pragas para todas as combinações de limiares de NDVI e de cor.
+    Os pixels são agrupados uma única vez pela faixa de cor e o NDVI de cada grupo é ordenado uma única vez;
+    as contagens acumuladas dos grupos dão a contagem de cada combinação, sem uma máscara por combinação.
+    :param ndvi: Array contendo os valores de NDVI
+    :param banda_verde: Array contendo os valores da banda verde
+    :param banda_azul: Array contendo os valores da banda azul
+    :param limiares_ndvi: Limiares de NDVI (sequência ou valor único)
+    :param limiares_cor: Limiares de cor (sequência ou valor único)
+    :return: Array (limiares de NDVI, limiares de cor) com o número de pixels com possíveis pragas
+    """
+    limiares_ndvi, restaurar_ndvi = _ordenar_limiares(limiares_ndvi)
+    limiares_cor, restaurar_cor = _ordenar_limiares(limiares_cor)
+    num_ndvi, num_cor = limiares_ndvi.size, limiares_cor.size
+
+    # Verde e azul acima do limiar equivale ao menor dos dois acima do limiar
+    cor = np.minimum(np.ravel(banda_verde), np.ravel(banda_azul))
+    if np.issubdtype(cor.dtype, np.integer) and cor.dtype.itemsize <= 2:
+        # Bandas inteiras: tabela com o número de limiares de cor abaixo de cada valor possível
+        minimo = np.iinfo(cor.dtype).min
+        tabela = np.searchsorted(limiares_cor, np.arange(minimo, np.iinfo(cor.dtype).max + 1), side='left')
+        estagio_cor = tabela.astype(_tipo_estagio(num_cor))[cor.astype(np.int64) - minimo if minimo else cor]
+    else:
+        estagio_cor = np.searchsorted(limiares_cor, cor, side='left').astype(_tipo_estagio(num_cor))
+        # NaN nunca fica acima do limiar de cor
+        estagio_cor[np.isnan(cor)] = 0
+
+    # Os pixels são agrupados pela faixa de cor (radix sort de inteiros pequenos) e o NDVI de cada grupo é
+    # ordenado uma vez: a contagem abaixo de cada limiar de NDVI é uma busca binária no grupo ordenado
+    ordem = np.argsort(estagio_cor, kind='stable')
+    limites = np.searchsorted(estagio_cor[ordem], np.arange(num_cor + 2))
+    ndvi_agrupado = np.ravel(ndvi)[ordem]
+    del ordem
+    abaixo_ndvi = np.empty((num_ndvi, num_cor + 1), dtype=np.int64)
+    for grupo in range(num_cor + 1):
+        valores = ndvi_agrupado[limites[grupo]:limites[grupo + 1]]
+        valores.sort()
+        # O NaN fica no fim da ordenação e nunca é contado, como na comparação ndvi < limiar
+        abaixo_ndvi[:, grupo] = np.searchsorted(valores, limiares_ndvi, side='left')
+    # Cor acima do limiar j: grupos de cor com índice maior que j
+    acima_cor = np.cumsum(abaixo_ndvi[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return acima_cor[restaurar_ndvi][:, restaurar_cor]
+
+
+@medir_etapa("sensibilidade_problemas_avancado")
+def sensibilidade_problemas_avancado(ndvi, limiares, tamanho_minimo=5):
+    """
+    Calcula, para vários limiares, o número de áreas problemáticas que sobrevivem ao tamanho mínimo e o
+    número de pixels marcados por detectar_problemas_avancado, sem rotular a imagem a cada limiar.
+    As máscaras são encaixadas (um limiar maior só acrescenta pixels), então os limiares são percorridos
+    em ordem crescente com um union-find incremental: em cada limiar entram apenas os pixels e as ligações
+    entre vizinhos (conectividade 4, como o ndimage.label) que passaram a ficar abaixo dele, e os
+    componentes afetados são unidos com connected_components sobre o grafo das suas raízes.
+    Cada pixel e cada ligação são processados uma única vez, qualquer que seja o número de limiares.
+    :param ndvi: Array 2D contendo os valores de NDVI
+    :param limiares: Sequência de limiares
+    :param tamanho_minimo: Tamanho mínimo da área problemática para ser considerada
+    :return: Tupla (número de áreas, número de pixels marcados), arrays na ordem dos limiares
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    limiares, restaurar = _ordenar_limiares(limiares)
+    num_limiares = limiares.size
+    altura, largura = ndvi.shape
+    num_pixels = altura * largura
+    estagios = _estagios_abaixo(ndvi, limiares).astype(_tipo_estagio(num_limiares))
+
+    # Uma ligação entra quando os dois pixels estão abaixo do limiar: no maior dos estágios dos dois.
+    # A ordenação estável de inteiros pequenos (radix sort) agrupa pixels e ligações por estágio.
+    estagios_ligacoes = np.concatenate([np.maximum(estagios[:, :-1], estagios[:, 1:]).ravel(),
+                                        np.maximum(estagios[:-1], estagios[1:]).ravel()])
+    ordem_ligacoes = np.argsort(estagios_ligacoes, kind='stable')
+    limites_ligacoes = np.searchsorted(estagios_ligacoes[ordem_ligacoes], np.arange(num_limiares + 1))
+    ordem_ligacoes = ordem_ligacoes[:limites_ligacoes[-1]]
+    del estagios_ligacoes
+    # Ligações horizontais (altura x largura-1) seguidas das verticais (altura-1 x largura)
+    num_horizontais = altura * (largura - 1)
+    horizontal = ordem_ligacoes < num_horizontais
+    colunas_ligacoes = max(largura - 1, 1)
+    origens = np.where(horizontal, ordem_ligacoes // colunas_ligacoes * largura + ordem_ligacoes % colunas_ligacoes,
+                       ordem_ligacoes - num_horizontais)
+    destinos = origens + np.where(horizontal, 1, largura)
+    del ordem_ligacoes, horizontal
+
+    ordem_pixels = np.argsort(estagios.ravel(), kind='stable')
+    limites_pixels = np.searchsorted(estagios.ravel()[ordem_pixels], np.arange(num_limiares + 1))
+
+    pais = np.arange(num_pixels, dtype=np.int64)
+    tamanhos = np.zeros(num_pixels, dtype=np.int64)
+    posicao = np.empty(num_pixels, dtype=np.int64)
+    num_areas = np.zeros(num_limiares, dtype=np.int64)
+    pixels_marcados = np.zeros(num_limiares, dtype=np.int64)
+    areas = pixels = 0
+    for estagio in range(num_limiares):
+        novos = ordem_pixels[limites_pixels[estagio]:limites_pixels[estagio + 1]]
+        tamanhos[novos] = 1
+        if tamanho_minimo <= 1:
+            areas += novos.size
+            pixels += novos.size
+
+        a = origens[limites_ligacoes[estagio]:limites_ligacoes[estagio + 1]]
+        b = destinos[limites_ligacoes[estagio]:limites_ligacoes[estagio + 1]]
+        raizes_a = _encontrar_raizes(pais, a)
+        raizes_b = _encontrar_raizes(pais, b)
+        diferentes = raizes_a != raizes_b
+        if diferentes.any():
+            raizes_a, raizes_b = raizes_a[diferentes], raizes_b[diferentes]
+            # Numeração compacta das raízes envolvidas, sem ordenação: cada raiz aponta para uma das suas posições
+            envolvidas = np.concatenate([raizes_a, raizes_b])
+            posicao[envolvidas] = np.arange(envolvidas.size)
+            representante = posicao[envolvidas]
+            unicas = representante == np.arange(envolvidas.size)
+            indices = (np.cumsum(unicas) - 1)[representante]
+            raizes = envolvidas[unicas]
+            grafo = coo_matrix((np.ones(raizes_a.size, dtype=np.int8),
+                                (indices[:raizes_a.size], indices[raizes_a.size:])), shape=(raizes.size, raizes.size))
+            num_grupos, grupos = connected_components(grafo, directed=False)
+
+            tamanhos_antes = tamanhos[raizes]
+            grandes = tamanhos_antes >= tamanho_minimo
+            areas -= int(np.count_nonzero(grandes))
+            pixels -= int(tamanhos_antes[grandes].sum())
+            tamanhos_depois = np.bincount(grupos, weights=tamanhos_antes, minlength=num_grupos).astype(np.int64)
+            grandes = tamanhos_depois >= tamanho_minimo
+            areas += int(np.count_nonzero(grandes))
+            pixels += int(tamanhos_depois[grandes].sum())
+
+            # União por tamanho: a raiz do maior componente de cada grupo passa a ser a raiz do grupo
+            chaves = np.full(num_grupos, -1, dtype=np.int64)
+            np.maximum.at(chaves, grupos, tamanhos_antes * num_pixels + raizes)
+            novas_raizes = chaves % num_pixels
+            pais[raizes] = novas_raizes[grupos]
+            tamanhos[novas_raizes] = tamanhos_depois
+            # Compressão de caminho das pontas das ligações, para acelerar os limiares seguintes
+            pais[a[diferentes]] = pais[raizes_a]
+            pais[b[diferentes]] = pais[raizes_b]
+        num_areas[estagio] = areas
+        pixels_marcados[estagio] = pixels
+
+    if tamanho_minimo <= 0:
+        # Como em detectar_problemas_avancado, o fundo (tamanho 0) também é marcado
+        pixels_marcados[:] = num_pixels
+    return num_areas[restaurar], pixels_marcados[restaurar]
@@ -0,0 +1,414 @@
+# servico.py - Serviço residente de análise: recebe trabalhos por um diretório de spool ou por um socket Unix
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from lote import processar_imagem
+from metricas import ativar_metricas
+from monitoramento import carregar_imagem_multiespectral, criar_buffers_analise
+
+# Limiares e opções que cada trabalho pode informar, repassados para processar_imagem
+PARAMETROS_TRABALHO = ("limiar", "tamanho_minimo", "limiar_ndvi", "limiar_cor", "tamanho_celula", "num_regioes",
+                       "hierarquico", "indices")
+
+# Subdiretórios do spool: novos trabalhos, trabalhos em análise e resultados
+SPOOL_ENTRADA = "entrada"
+SPOOL_PROCESSANDO = "processando"
+SPOOL_SAIDA = "saida"
+
+
+class ServicoAnalise:
+    """
+    Mantém aquecido, entre os trabalhos, tudo o que uma execução isolada refaz a cada imagem: os módulos
+    importados, os buffers de análise (um conjunto por thread, que cresce até a maior imagem recebida) e,
+    opcionalmente, a sessão com o banco de dados Oracle.
+    Cada trabalho é um dicionário com o caminho da imagem ('imagem'), um identificador opcional ('id') e os
+    limiares de PARAMETROS_TRABALHO; o resultado é o dicionário de processar_imagem, serializável em JSON.
+    No máximo 'concorrencia' trabalhos são analisados ao mesmo tempo e no máximo outros tantos aguardam na fila;
+    enviar bloqueia quando a fila está cheia.
+
+    Uso:
+        with ServicoAnalise(concorrencia=2) as servico:
+            resultado = servico.enviar({"imagem": "voo.tif", "limiar": 0.25}).result()
+    """
+
+    def __init__(self, concorrencia=1, num_threads=1, gravador=None, formato_buffers=None):
+        """
+        :param concorrencia: Número máximo de trabalhos analisados ao mesmo tempo
+        :param num_threads: Threads por imagem, em faixas de linhas (None usa todos os núcleos)
+        :param gravador: GravadorMonitoramento que acumula os resultados para o banco de dados (opcional)
+        :param formato_buffers: Formato (altura, largura) dos buffers pré-alocados por thread (opcional)
+        """
+        self.concorrencia = max(1, concorrencia)
+        self.num_threads = num_threads
+        self.gravador = gravador
+        self.formato_buffers = formato_buffers
+        self.estatisticas = {"trabalhos": 0, "erros": 0, "latencia_total_ms": 0.0}
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(2 * self.concorrencia)
+        self._executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix="analise")
+
+    def _buffers(self, formato):
+        """
+        Buffers de análise da thread atual, realocados apenas quando a imagem é maior que os atuais.
+        """
+        buffers = getattr(self._local, "buffers", None)
+        altura, largura = formato
+        if buffers is None or buffers["ndvi"].shape[0] < altura or buffers["ndvi"].shape[1] < largura:
+            if buffers is not None:
+                altura, largura = max(altura, buffers["ndvi"].shape[0]), max(largura, buffers["ndvi"].shape[1])
+            elif self.formato_buffers:
+                altura, largura = max(altura, self.formato_buffers[0]), max(largura, self.formato_buffers[1])
+            buffers = self._local.buffers = criar_buffers_analise((altura, largura))
+        return buffers
+
+    def aquecer(self):
+        """
+        Executa uma análise completa de uma imagem simulada em cada thread do pool, para que importações
+        tardias (OpenCV, SciPy) e a alocação dos buffers não recaiam sobre o primeiro trabalho.
+        """
+        import cv2  # noqa: F401 - decodificador das imagens, importado uma única vez
+
+        imagem = carregar_imagem_multiespectral()
+        barreira = threading.Barrier(self.concorrencia)
+
+        def aquecer_thread():
+            # A barreira garante que cada thread do pool execute exatamente um aquecimento
+            barreira.wait()
+            buffers = self._buffers(self.formato_buffers or imagem.shape[:2])
+            processar_imagem("aquecimento", imagem=imagem, buffers=buffers, num_regioes=1)
+
+        for futuro in [self._executor.submit(aquecer_thread) for _ in range(self.concorrencia)]:
+            futuro.result()
+
+    def processar(self, trabalho, recebido=None):
+        """
+        Analisa um trabalho na thread atual.
+        Erros (trabalho inválido, imagem inexistente, falha na análise) são devolvidos no resultado, na chave 'Erro'.
+        :param trabalho: Dicionário com 'imagem', 'id' (opcional) e limiares de PARAMETROS_TRABALHO
+        :param recebido: Instante (time.perf_counter) em que o trabalho foi recebido, para a latência
+        :return: Dicionário de resultados, com o identificador do trabalho em 'Id' e a latência em 'Latencia_ms'
+        """
+        recebido = time.perf_counter() if recebido is None else recebido
+        try:
+            resultado = self._processar(trabalho)
+        except Exception as e:
+            resultado = {"Erro": f"{type(e).__name__}: {e}"}
+        if isinstance(trabalho, dict) and "id" in trabalho:
+            resultado["Id"] = trabalho["id"]
+        resultado["Latencia_ms"] = (time.perf_counter() - recebido) * 1000
+        with self._trava:
+            self.estatisticas["trabalhos"] += 1
+            self.estatisticas["erros"] += "Erro" in resultado
+            self.estatisticas["latencia_total_ms"] += resultado["Latencia_ms"]
+        return resultado
+
+    def _processar(self, trabalho):
+        if not isinstance(trabalho, dict) or not isinstance(trabalho.get("imagem"), str):
+            raise ValueError("o trabalho deve ser um objeto JSON com o caminho da imagem em 'imagem'")
+        desconhecidos = set(trabalho) - set(PARAMETROS_TRABALHO) - {"imagem", "id"}
+        if desconhecidos:
+            raise ValueError(f"parâmetros desconhecidos: {', '.join(sorted(desconhecidos))}")
+        parametros = {nome: trabalho[nome] for nome in PARAMETROS_TRABALHO if nome in trabalho}
+
+        # A carga fica em processar_imagem, para que falhas ao ler a imagem também identifiquem a 'Imagem';
+        # os buffers da thread são obtidos depois da carga, quando o formato da imagem é conhecido
+        resultado = processar_imagem(trabalho["imagem"], buffers=self._buffers, num_threads=self.num_threads,
+                                     **parametros)
+        resultado.pop("Histograma_NDVI", None)
+        if self.gravador is not None and "Erro" not in resultado:
+            self.gravador.adicionar(resultado["NDVI_Medio"], resultado["Problemas_Totais"], resultado["Pragas_Totais"])
+            if "Zonas" in resultado:
+                resultado.setdefault("Data", datetime.now().isoformat(timespec='seconds'))
+                self.gravador.adicionar_zonas(resultado["Imagem"], resultado["Data"], resultado["Zonas"])
+        return resultado
+
+    def enviar(self, trabalho):
+        """
+        Enfileira um trabalho, bloqueando enquanto a fila estiver cheia.
+        :param trabalho: Dicionário do trabalho (ver processar)
+        :return: Future com o dicionário de resultados
+        """
+        recebido = time.perf_counter()
+        self._vagas.acquire()
+        try:
+            futuro = self._executor.submit(self.processar, trabalho, recebido)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro
+
+    def fechar(self):
+        """
+        Aguarda os trabalhos pendentes e grava no banco de dados as linhas que ainda estiverem no gravador.
+        """
+        self._executor.shutdown(wait=True)
+        if self.gravador is not None:
+            self.gravador.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        self.fechar()
+        return False
+
+
+def _gravar_json(caminho, dados):
+    """
+    Grava um arquivo JSON de forma atômica (arquivo temporário de nome único + rename), para que leitores
+    nunca vejam um arquivo pela metade.
+    """
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(caminho) or ".",
+                                     prefix=os.path.basename(caminho) + ".", suffix=".tmp", delete=False) as arquivo:
+        temporario = arquivo.name
+        try:
+            json.dump(dados, arquivo, ensure_ascii=False)
+        except Exception:
+            arquivo.close()
+            os.remove(temporario)
+            raise
+    os.replace(temporario, caminho)
+
+
+def atender_spool(servico, diretorio, parar, intervalo=0.05):
+    """
+    Consome trabalhos de um diretório de spool até que o evento parar seja sinalizado.
+    Cada trabalho é um arquivo .json em diretorio/entrada (grave-o com outro nome e renomeie para .json,
+    para que o serviço não leia um arquivo incompleto). O serviço o move para diretorio/processando
+    com um rename atômico e grava o resultado com o mesmo nome em diretorio/saida.
+    Trabalhos que ficaram em 'processando' após uma interrupção voltam para a entrada ao iniciar; por isso
+    cada diretório de spool deve ser atendido por um único serviço.
+    :param servico: ServicoAnalise que executa os trabalhos
+    :param diretorio: Diretório do spool
+    :param parar: threading.Event que encerra o atendimento
+    :param intervalo: Intervalo, em segundos, entre verificações de um diretório de entrada vazio
+    """
+    entrada, processando, saida = (os.path.join(diretorio, nome)
+                                   for nome in (SPOOL_ENTRADA, SPOOL_PROCESSANDO, SPOOL_SAIDA))
+    for caminho in (entrada, processando, saida):
+        os.makedirs(caminho, exist_ok=True)
+    for nome in os.listdir(processando):
+        os.replace(os.path.join(processando, nome), os.path.join(entrada, nome))
+
+    def concluir(nome, futuro):
+        # Executada como callback do Future: exceções aqui seriam apenas registradas no log e descartadas
+        resultado = futuro.result()
+        try:
+            _gravar_json(os.path.join(saida, nome), resultado)
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            print(f"Erro ao gravar o resultado do trabalho {nome}: {erro}")
+            try:
+                _gravar_json(os.path.join(saida, nome),
+                             {chave: resultado[chave] for chave in ("Id", "Imagem") if chave in resultado}
+                             | {"Erro": f"falha ao gravar o resultado: {erro}"})
+            except Exception as e:
+                # Sem como gravar na saída: o trabalho fica em 'processando' e volta à entrada ao reiniciar
+                print(f"Erro ao gravar o erro do trabalho {nome}; ele continua em '{SPOOL_PROCESSANDO}': "
+                      f"{type(e).__name__}: {e}")
+                return
+        os.remove(os.path.join(processando, nome))
+
+    while not parar.is_set():
+        nomes = sorted(nome for nome in os.listdir(entrada) if nome.endswith(".json"))
+        if not nomes:
+            parar.wait(intervalo)
+            continue
+        for nome in nomes:
+            if parar.is_set():
+                break
+            recebido = os.path.join(processando, nome)
+            try:
+                os.replace(os.path.join(entrada, nome), recebido)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(recebido, encoding="utf-8") as arquivo:
+                    trabalho = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                _gravar_json(os.path.join(saida, nome), {"Erro": f"JSON inválido: {type(e).__name__}: {e}"})
+                os.remove(recebido)
+                continue
+            servico.enviar(trabalho).add_done_callback(lambda futuro, nome=nome: concluir(nome, futuro))
+
+
+def _atender_conexao(servico, conexao, max_pendentes):
+    """
+    Atende uma conexão do socket: uma linha JSON por trabalho, respondida com uma linha JSON por resultado,
+    na mesma ordem. Cada linha é enviada ao serviço assim que lida e uma thread escritora devolve os resultados
+    à medida que ficam prontos, para que os trabalhos de uma mesma conexão sejam analisados em paralelo.
+    No máximo max_pendentes trabalhos da conexão ficam entre a leitura e a escrita do resultado: um cliente
+    que lê as respostas devagar bloqueia apenas a própria conexão, sem ocupar as vagas do serviço das demais.
+    """
+    # Futures (ou resultados prontos, para linhas inválidas) na ordem de chegada; None encerra a escritora
+    pendentes = queue.Queue()
+    vagas = threading.Semaphore(max_pendentes)
+
+    def escrever(escritor):
+        desconectado = False
+        for item in iter(pendentes.get, None):
+            resultado = item.result() if isinstance(item, Future) else item
+            if not desconectado:
+                try:
+                    escritor.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                    escritor.flush()
+                except OSError:
+                    # Cliente desconectado: os resultados restantes são descartados
+                    desconectado = True
+            vagas.release()
+
+    with conexao, conexao.makefile("r", encoding="utf-8") as leitor, \
+            conexao.makefile("w", encoding="utf-8") as escritor:
+        escritora = threading.Thread(target=escrever, args=(escritor,), daemon=True)
+        escritora.start()
+        try:
+            for linha in leitor:
+                if not linha.strip():
+                    continue
+                vagas.acquire()
+                try:
+                    trabalho = json.loads(linha)
+                except ValueError as e:
+                    pendentes.put({"Erro": f"JSON inválido: {e}"})
+                    continue
+                pendentes.put(servico.enviar(trabalho))
+        finally:
+            pendentes.put(None)
+            escritora.join()
+
+
+def atender_socket(servico, caminho_socket, parar, max_pendentes_conexao=None):
+    """
+    Atende trabalhos recebidos por um socket Unix até que o evento parar seja sinalizado.
+    Cada conexão é atendida por uma thread; a concorrência da análise continua limitada pelo serviço.
+    :param servico: ServicoAnalise que executa os trabalhos
+    :param caminho_socket: Caminho do socket Unix (removido e recriado ao iniciar)
+    :param parar: threading.Event que encerra o atendimento
+    :param max_pendentes_conexao: Trabalhos de uma conexão aguardando análise ou envio do resultado
+                                  (padrão: a concorrência do serviço, metade das vagas da fila)
+    """
+    max_pendentes_conexao = max_pendentes_conexao or servico.concorrencia
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("sockets Unix não são suportados neste sistema; use o diretório de spool")
+    if os.path.exists(caminho_socket):
+        os.remove(caminho_socket)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as servidor:
+        servidor.bind(caminho_socket)
+        servidor.listen()
+        servidor.settimeout(0.5)
+        try:
+            while not parar.is_set():
+                try:
+                    conexao, _ = servidor.accept()
+                except socket.timeout:
+                    continue
+                conexao.settimeout(None)
+                threading.Thread(target=_atender_conexao, args=(servico, conexao, max_pendentes_conexao),
+                                 daemon=True).start()
+        finally:
+            os.remove(caminho_socket)
+
+
+def enviar_trabalhos(caminho_socket, trabalhos):
+    """
+    Cliente do socket: envia trabalhos a um serviço em execução e aguarda os resultados.
+    Os trabalhos são enviados por uma thread enquanto os resultados são lidos, para que o serviço possa
+    analisá-los em paralelo.
+    :param caminho_socket: Caminho do socket Unix do serviço
+    :param trabalhos: Lista de dicionários de trabalho (ex: [{"imagem": "voo.tif", "limiar": 0.25}])
+    :return: Lista de dicionários de resultados, na ordem dos trabalhos
+    """
+    trabalhos = list(trabalhos)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as cliente:
+        cliente.connect(caminho_socket)
+        with cliente.makefile("r", encoding="utf-8") as leitor, cliente.makefile("w", encoding="utf-8") as escritor:
+            def enviar():
+                for trabalho in trabalhos:
+                    escritor.write(json.dumps(trabalho, ensure_ascii=False) + "\n")
+                    escritor.flush()
+
+            remetente = threading.Thread(target=enviar, daemon=True)
+            remetente.start()
+            resultados = [json.loads(leitor.readline()) for _ in trabalhos]
+            remetente.join()
+            return resultados
+
+
+def main(argumentos=None):
+    """
+    Ponto de entrada da linha de comando do serviço residente.
+    """
+    parser = argparse.ArgumentParser(description="Serviço residente de análise de imagens multiespectrais.")
+    parser.add_argument("--spool", default=None,
+                        help="Diretório de spool (subdiretórios entrada, processando e saida)")
+    parser.add_argument("--socket", default=None, help="Caminho do socket Unix que recebe trabalhos em JSON Lines")
+    parser.add_argument("--concorrencia", type=int, default=1, help="Trabalhos analisados ao mesmo tempo (padrão: 1)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Threads por imagem, em faixas de linhas (0 usa todos os núcleos; padrão: 1)")
+    parser.add_argument("--buffers", type=lambda texto: tuple(int(v) for v in texto.lower().split("x")), default=None,
+                        help="Pré-aloca buffers para imagens de até ALTURAxLARGURA pixels (ex: 4000x4000)")
+    parser.add_argument("--metricas", default=None,
+                        help="Grava métricas por etapa neste arquivo (.jsonl ou .prom, formato Prometheus)")
+    parser.add_argument("--banco", action="store_true", help="Também salva os resultados no banco de dados Oracle")
+    parser.add_argument("--tamanho-lote-banco", type=int, default=500, help="Linhas gravadas por commit no banco")
+    args = parser.parse_args(argumentos)
+
+    if not args.spool and not args.socket:
+        parser.error("informe --spool e/ou --socket")
+    if args.metricas:
+        ativar_metricas(args.metricas)
+
+    gravador = None
+    if args.banco:
+        from banco import GravadorMonitoramento, criar_pool_sessoes
+        # A sessão é aberta ao iniciar e reaproveitada por todos os trabalhos
+        criar_pool_sessoes()
+        gravador = GravadorMonitoramento(tamanho_lote=args.tamanho_lote_banco)
+
+    parar = threading.Event()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: parar.set())
+
+    servico = ServicoAnalise(concorrencia=args.concorrencia, num_threads=args.threads or None, gravador=gravador,
+                             formato_buffers=args.buffers)
+    try:
+        servico.aquecer()
+        atendentes = []
+        if args.spool:
+            atendentes.append(threading.Thread(target=atender_spool, args=(servico, args.spool, parar)))
+        if args.socket:
+            atendentes.append(threading.Thread(target=atender_socket, args=(servico, args.socket, parar)))
+        for atendente in atendentes:
+            atendente.start()
+        print(f"Serviço de análise pronto (concorrência {servico.concorrencia}). Ctrl+C encerra.")
+        while any(atendente.is_alive() for atendente in atendentes):
+            for atendente in atendentes:
+                atendente.join(0.5)
+        parar.set()
+    finally:
+        servico.fechar()
+        if gravador is not None:
+            from banco import fechar_pool_sessoes
+            fechar_pool_sessoes()
+
+    estatisticas = servico.estatisticas
+    if estatisticas["trabalhos"]:
+        print(f"Trabalhos: {estatisticas['trabalhos']}, com erro: {estatisticas['erros']}, latência média: "
+              f"{estatisticas['latencia_total_ms'] / estatisticas['trabalhos']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,20 @@
 # util.py - Módulo responsável por utilidades gerais, como manipulação de arquivos JSON e TXT
 import json
+import os
+import threading
+from datetime import datetime
+from metricas import medir_etapa
 
+try:
+    import fcntl  # trava entre processos (indisponível no Windows, onde apenas a trava entre threads é usada)
+except ImportError:
+    fcntl = None
 
+# Trava entre threads do mesmo processo para os arquivos de resultados JSON Lines
+_trava_resultados = threading.Lock()
+
+
+@medir_etapa("salvar_json")
 def salvar_dados_json(dados, nome_arquivo):
     """
     Salva os dados em um arquivo JSON.
@@ -39,6 +52,238 @@ def atualizar_dados_json(dados_atualizados, nome_arquivo):
     salvar_dados_json(dados_existentes, nome_arquivo)
 
 
+class _TravaResultados:
+    """
+    Trava exclusiva do arquivo de resultados JSON Lines, entre threads e entre processos.
+    Usa um arquivo '.lock' separado, que não é substituído pela compactação.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho + '.lock'
+        self.descritor = None
+
+    def __enter__(self):
+        _trava_resultados.acquire()
+        if fcntl is not None:
+            self.descritor = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.descritor, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *excecao):
+        if self.descritor is not None:
+            fcntl.flock(self.descritor, fcntl.LOCK_UN)
+            os.close(self.descritor)
+            self.descritor = None
+        _trava_resultados.release()
+        return False
+
+
+def _caminho_resultados(nome_arquivo):
+    return nome_arquivo if nome_arquivo.endswith('.jsonl') else nome_arquivo + '.jsonl'
+
+
+def _escrever_tudo(descritor, dados):
+    while dados:
+        dados = dados[os.write(descritor, dados):]
+
+
+def _campos_indice(registro):
+    """
+    Campos de um registro guardados no índice: imagem, voo e data (que formam a chave do registro).
+    """
+    return registro.get("Imagem"), registro.get("Voo"), registro.get("Data")
+
+
+def _chave_entrada(entrada):
+    """
+    Chave de uma entrada do índice: a imagem e o voo, se informado, ou a imagem e a data da análise. Cada
+    análise datada de uma imagem é mantida no histórico; apenas a regravação da mesma chave (ex: o mesmo voo
+    reprocessado) substitui o registro anterior.
+    """
+    imagem, voo, data = entrada[2:5]
+    return (imagem, voo, None) if voo is not None else (imagem, None, data)
+
+
+def _ler_indice(caminho):
+    """
+    Lê o índice de deslocamentos (arquivo '.idx') e o completa com os registros gravados depois dele
+    (ex: após uma interrupção entre a gravação do registro e a do índice). Se o índice não corresponder
+    ao arquivo de dados (ausente ou de um arquivo anterior à compactação), ele é reconstruído; um registro
+    incompleto no fim do arquivo de dados (gravação interrompida) é descartado.
+    Deve ser chamado com a trava do arquivo de resultados.
+    :return: Lista de entradas [deslocamento, comprimento, imagem, voo, data]
+    """
+    tamanho_dados = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+    entradas = []
+    if os.path.exists(caminho + '.idx'):
+        with open(caminho + '.idx', 'r', encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                if linha.endswith('\n'):
+                    entradas.append(json.loads(linha))
+    coberto = entradas[-1][0] + entradas[-1][1] if entradas else 0
+    if coberto > tamanho_dados or any(len(entrada) != 5 for entrada in entradas):
+        # Índice de outro arquivo ou em formato anterior: é reconstruído a partir dos dados
+        entradas, coberto = [], 0
+    if coberto == tamanho_dados and _indice_completo(caminho, tamanho_dados):
+        return entradas
+
+    if tamanho_dados:
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(coberto)
+            deslocamento = coberto
+            for linha in arquivo:
+                if not linha.endswith(b'\n'):
+                    break
+                entradas.append([deslocamento, len(linha), *_campos_indice(json.loads(linha))])
+                deslocamento += len(linha)
+        if deslocamento < tamanho_dados:
+            os.truncate(caminho, deslocamento)
+    with open(caminho + '.idx', 'w', encoding='utf-8') as arquivo:
+        arquivo.writelines(json.dumps(entrada, ensure_ascii=False) + '\n' for entrada in entradas)
+    return entradas
+
+
+def _indice_completo(caminho, tamanho_dados):
+    """
+    Verifica, lendo apenas o fim do índice, se ele existe, termina em uma linha completa e cobre todo o
+    arquivo de dados.
+    """
+    if not os.path.exists(caminho + '.idx'):
+        return tamanho_dados == 0
+    with open(caminho + '.idx', 'rb') as arquivo:
+        arquivo.seek(0, os.SEEK_END)
+        tamanho_indice = arquivo.tell()
+        if tamanho_indice == 0:
+            return tamanho_dados == 0
+        arquivo.seek(max(0, tamanho_indice - 4096))
+        final = arquivo.read()
+    if not final.endswith(b'\n'):
+        return False
+    linhas = final.splitlines()
+    if len(linhas) < 2 and tamanho_indice > len(final):
+        return False
+    deslocamento, comprimento = json.loads(linhas[-1])[:2]
+    return deslocamento + comprimento == tamanho_dados
+
+
+@medir_etapa("anexar_resultado")
+def anexar_resultado(registro, nome_arquivo):
+    """
+    Acrescenta um registro ao arquivo de resultados JSON Lines (uma linha JSON por registro), sem reescrever
+    o arquivo. A gravação é atômica em relação a outros escritores (threads ou processos) e o índice de
+    deslocamentos ('.idx') é atualizado na mesma operação, permitindo buscas por imagem e data sem ler o arquivo.
+    Um registro gravado com a mesma chave de um anterior (imagem e voo, se informado na chave 'Voo', ou imagem e
+    data) o substitui por inteiro na leitura e na compactação, o que substitui a atualização com reescrita de
+    atualizar_dados_json; análises com datas diferentes permanecem no histórico.
+    :param registro: Dicionário com os dados (a chave 'Data' é preenchida com o momento atual se ausente)
+    :param nome_arquivo: Nome do arquivo de resultados (a extensão .jsonl é acrescentada se necessário)
+    """
+    caminho = _caminho_resultados(nome_arquivo)
+    if "Data" not in registro:
+        registro = {**registro, "Data": datetime.now().isoformat(timespec='seconds')}
+    linha = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+    with _TravaResultados(caminho):
+        if not _indice_completo(caminho, os.path.getsize(caminho) if os.path.exists(caminho) else 0):
+            _ler_indice(caminho)
+        descritor = os.open(caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            deslocamento = os.lseek(descritor, 0, os.SEEK_END)
+            _escrever_tudo(descritor, linha)
+        finally:
+            os.close(descritor)
+        entrada = [deslocamento, len(linha), *_campos_indice(registro)]
+        with open(caminho + '.idx', 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+
+
+def ler_resultados(nome_arquivo):
+    """
+    Percorre o arquivo de resultados JSON Lines registro a registro, com memória limitada a um registro.
+    :param nome_arquivo: Nome do arquivo de resultados
+    :return: Gerador de dicionários, na ordem de gravação
+    """
+    with open(_caminho_resultados(nome_arquivo), 'rb') as arquivo:
+        for linha in arquivo:
+            if linha.endswith(b'\n'):
+                yield json.loads(linha)
+
+
+def _registros_vigentes(arquivo, vigentes):
+    """
+    Lê, a partir dos deslocamentos do índice, o registro vigente (o último gravado) de cada chave.
+    """
+    for deslocamento, comprimento, *_ in vigentes.values():
+        arquivo.seek(deslocamento)
+        yield json.loads(arquivo.read(comprimento))
+
+
+def buscar_resultados(nome_arquivo, imagem=None, data_inicial=None, data_final=None):
+    """
+    Busca registros pelo índice de deslocamentos, lendo do arquivo de dados apenas os registros encontrados.
+    :param nome_arquivo: Nome do arquivo de resultados
+    :param imagem: Caminho da imagem (opcional)
+    :param data_inicial: Data ISO mínima, inclusive (ex: '2024-10-01'), opcional
+    :param data_final: Data ISO máxima, inclusive (ex: '2024-10-31T23:59:59'), opcional
+    :return: Lista dos registros vigentes (o último gravado de cada chave), na ordem da primeira gravação
+             de cada chave
+    """
+    caminho = _caminho_resultados(nome_arquivo)
+    # O arquivo de dados é lido com a trava: uma compactação concorrente mudaria os deslocamentos do índice
+    with _TravaResultados(caminho):
+        vigentes = {}
+        for entrada in _ler_indice(caminho):
+            if imagem is None or entrada[2] == imagem:
+                vigentes[_chave_entrada(entrada)] = entrada
+        for chave, entrada in list(vigentes.items()):
+            data = entrada[4]
+            if ((data_inicial is not None and (data is None or data < data_inicial))
+                    or (data_final is not None and (data is None or data[:len(data_final)] > data_final))):
+                del vigentes[chave]
+        if not vigentes:
+            return []
+        with open(caminho, 'rb') as arquivo:
+            return list(_registros_vigentes(arquivo, vigentes))
+
+
+def compactar_resultados(nome_arquivo, redundancia_minima=0.0):
+    """
+    Compacta o arquivo de resultados: apenas o registro vigente de cada chave (ver anexar_resultado) é mantido.
+    O novo arquivo é gravado ao lado e substitui o anterior atomicamente; apenas o índice fica em memória.
+    :param nome_arquivo: Nome do arquivo de resultados
+    :param redundancia_minima: Fração mínima de registros redundantes para compactar (ex: 0.5), permitindo
+                               chamar a função periodicamente sem reescrever arquivos já compactos
+    :return: True se o arquivo foi compactado
+    """
+    caminho = _caminho_resultados(nome_arquivo)
+    if not os.path.exists(caminho):
+        return False
+    with _TravaResultados(caminho):
+        entradas = _ler_indice(caminho)
+        vigentes = {}
+        for entrada in entradas:
+            vigentes[_chave_entrada(entrada)] = entrada
+        if (not entradas or len(vigentes) == len(entradas)
+                or 1 - len(vigentes) / len(entradas) < redundancia_minima):
+            return False
+
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        novo_indice = []
+        with open(caminho, 'rb') as origem, open(temporario, 'wb') as destino:
+            for registro in _registros_vigentes(origem, vigentes):
+                linha = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+                novo_indice.append([destino.tell(), len(linha), *_campos_indice(registro)])
+                destino.write(linha)
+            destino.flush()
+            os.fsync(destino.fileno())
+        # Sem o índice antigo, uma interrupção entre as substituições apenas força a reconstrução do índice
+        os.remove(caminho + '.idx')
+        os.replace(temporario, caminho)
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.writelines(json.dumps(entrada, ensure_ascii=False) + '\n' for entrada in novo_indice)
+        os.replace(temporario, caminho + '.idx')
+    return True
+
+
 def salvar_relatorio_texto(relatorio, nome_arquivo):
     """
     Salva o relatório em um arquivo de texto.
@@ -1,60 +1,214 @@
 # visualizacao.py - Módulo responsável pela visualização dos dados, como a geração de mapas NDVI
+import os
+import weakref
+import zlib
+
 import matplotlib.pyplot as plt
 import numpy as np
+from histograma import HistogramaNDVI
+from metricas import medir_etapa
+
+# Maior lado, em pixels, dos arrays enviados ao matplotlib (resolução de tela)
+RESOLUCAO_TELA_PADRAO = 1024
+
+# Pontos amostrados, em cada dimensão, na assinatura do conteúdo de um array
+AMOSTRAS_ASSINATURA = 256
+
+# Pirâmides de visão geral já construídas, por array de origem, com a assinatura do conteúdo de quando
+# foram construídas (removidas quando o array é descartado)
+_piramides = {}
+
+# Diretório dos PNGs gerados no modo sem janela (None: exibe as figuras com plt.show())
+_diretorio_headless = None
+
+
+def ativar_modo_headless(diretorio_saida):
+    """
+    Ativa o modo sem janela: as figuras passam a ser gravadas como PNG, com um backend não interativo,
+    em vez de exibidas com plt.show().
+    :param diretorio_saida: Diretório onde os PNGs serão gravados
+    """
+    global _diretorio_headless
+    plt.switch_backend('Agg')
+    os.makedirs(diretorio_saida, exist_ok=True)
+    _diretorio_headless = diretorio_saida
+
+
+def _reduzir(array):
+    """
+    Reduz um array pela metade em cada dimensão espacial: média de blocos 2x2 para valores
+    e máximo para máscaras, para que áreas pequenas continuem visíveis.
+    """
+    altura, largura = (array.shape[0] // 2) * 2, (array.shape[1] // 2) * 2
+    blocos = array[:altura, :largura].reshape(altura // 2, 2, largura // 2, 2, *array.shape[2:])
+    if array.dtype == bool:
+        return blocos.any(axis=(1, 3))
+    return blocos.mean(axis=(1, 3), dtype=np.float32)
+
+
+def construir_piramide(array, tamanho_minimo=256):
+    """
+    Constrói a pirâmide de visão geral de um array (imagem, NDVI ou máscara): o próprio array seguido
+    de versões reduzidas pela metade até o maior lado ficar abaixo de tamanho_minimo.
+    :param array: Array NumPy 2D ou 3D (altura, largura, bandas)
+    :param tamanho_minimo: Maior lado, em pixels, do nível mais reduzido
+    :return: Lista de níveis, do mais detalhado ao mais reduzido
+    """
+    niveis = [array]
+    while max(niveis[-1].shape[:2]) > tamanho_minimo and min(niveis[-1].shape[:2]) >= 2:
+        niveis.append(_reduzir(niveis[-1]))
+    return niveis
 
 
-def gerar_mapa_ndvi(ndvi):
+def _assinatura(array):
+    """
+    Assinatura barata do conteúdo do array: formato, tipo, endereço dos dados e CRC32 de uma amostra esparsa em
+    grade (até AMOSTRAS_ASSINATURA pontos por dimensão), sem ler nem copiar o array inteiro. Alterações no
+    lugar que não toquem a amostra não são detectadas: quem as faz pode chamar invalidar_piramide.
+    """
+    passos = [max(1, -(-tamanho // AMOSTRAS_ASSINATURA)) for tamanho in array.shape[:2]]
+    amostra = np.ascontiguousarray(array[::passos[0], ::passos[1]])
+    return (array.shape, array.dtype.str, array.__array_interface__['data'][0], array.strides,
+            zlib.crc32(memoryview(amostra).cast('B')))
+
+
+def invalidar_piramide(array):
+    """
+    Descarta a pirâmide guardada para o array, para que seja reconstruída na próxima visualização
+    (ex: depois de alterar o array no lugar).
+    """
+    if id(array) in _piramides:
+        _piramides[id(array)] = (None, [])
+
+
+def obter_piramide(array):
+    """
+    Devolve a pirâmide de visão geral do array, reconstruindo-a apenas na primeira chamada para esse array
+    ou quando o seu conteúdo mudou desde a construção.
+    """
+    chave = id(array)
+    assinatura = _assinatura(array)
+    if chave not in _piramides:
+        weakref.finalize(array, _piramides.pop, chave, None)
+    elif _piramides[chave][0] == assinatura:
+        return [array] + _piramides[chave][1]
+    # Apenas os níveis reduzidos ficam guardados, para não impedir que o array original seja liberado
+    _piramides[chave] = (assinatura, construir_piramide(array)[1:])
+    return [array] + _piramides[chave][1]
+
+
+def visao_para_tela(array, resolucao=RESOLUCAO_TELA_PADRAO):
+    """
+    Escolhe o nível da pirâmide mais reduzido que ainda tem pelo menos a resolução pedida.
+    :param array: Array NumPy a exibir
+    :param resolucao: Maior lado, em pixels, desejado para exibição
+    :return: Array reduzido (ou o próprio array, se já for pequeno)
+    """
+    if max(array.shape[:2]) <= resolucao:
+        return array
+    escolhido = array
+    for nivel in obter_piramide(array):
+        if max(nivel.shape[:2]) < resolucao:
+            break
+        escolhido = nivel
+    return escolhido
+
+
+def _exibir_ou_salvar(nome_arquivo):
+    """
+    Exibe a figura atual ou, no modo sem janela, grava-a como PNG e libera a figura.
+    """
+    if _diretorio_headless is None:
+        plt.show()
+    else:
+        plt.savefig(os.path.join(_diretorio_headless, nome_arquivo), dpi=100, bbox_inches='tight')
+        plt.close('all')
+
+
+@medir_etapa("gerar_mapa_ndvi")
+def gerar_mapa_ndvi(ndvi, nome_arquivo="mapa_ndvi.png"):
     """
     Gera um mapa visual do NDVI para a área monitorada.
     :param ndvi: Array NumPy com os valores de NDVI
+    :param nome_arquivo: Nome do PNG gravado no modo sem janela
     """
-    plt.imshow(ndvi, cmap='RdYlGn')
+    altura, largura = ndvi.shape[:2]
+    plt.imshow(visao_para_tela(ndvi), cmap='RdYlGn', extent=(0, largura, altura, 0))
     plt.colorbar()
     plt.title("Mapa NDVI - Saúde da Vegetação")
     plt.xlabel("Coordenada X")
     plt.ylabel("Coordenada Y")
-    plt.show()
+    _exibir_ou_salvar(nome_arquivo)
 
 
-def gerar_histograma_ndvi(ndvi):
+@medir_etapa("gerar_histograma_ndvi")
+def gerar_histograma_ndvi(ndvi, nome_arquivo="histograma_ndvi.png"):
     """
     Gera um histograma dos valores de NDVI para analisar a distribuição dos valores de saúde da vegetação.
-    :param ndvi: Array NumPy com os valores de NDVI
+    :param ndvi: Array NumPy com os valores de NDVI, ou HistogramaNDVI já acumulado (ex: de uma fazenda inteira)
+    :param nome_arquivo: Nome do PNG gravado no modo sem janela
     """
-    plt.hist(ndvi.flatten(), bins=50, color='green', alpha=0.7)
+    histograma = ndvi if isinstance(ndvi, HistogramaNDVI) else HistogramaNDVI().atualizar(ndvi)
+    contagens, bordas = histograma.reagrupar(50)
+    plt.stairs(contagens, bordas, fill=True, color='green', alpha=0.7)
     plt.title("Histograma dos Valores de NDVI")
     plt.xlabel("Valor de NDVI")
     plt.ylabel("Frequência")
     plt.grid(axis='y', linestyle='--')
-    plt.show()
+    _exibir_ou_salvar(nome_arquivo)
 
 
-def plotar_imagem_multiespectral(imagem):
+@medir_etapa("plotar_imagem_multiespectral")
+def plotar_imagem_multiespectral(imagem, nome_arquivo="imagem_multiespectral.png"):
     """
     Plota uma imagem multiespectral, mostrando cada banda separadamente.
     :param imagem: Array NumPy contendo as diferentes bandas espectrais
+    :param nome_arquivo: Nome do PNG gravado no modo sem janela
     """
     num_bandas = imagem.shape[2]
+    visao = visao_para_tela(imagem, RESOLUCAO_TELA_PADRAO // 2)
     fig, axes = plt.subplots(1, num_bandas, figsize=(15, 5))
     fig.suptitle("Bandas Espectrais da Imagem Multiespectral")
     for i in range(num_bandas):
-        axes[i].imshow(imagem[:, :, i], cmap='gray')
+        axes[i].imshow(visao[:, :, i], cmap='gray')
         axes[i].set_title(f"Banda {i + 1}")
         axes[i].axis('off')
-    plt.show()
+    _exibir_ou_salvar(nome_arquivo)
 
 
-def plotar_areas_problemas(ndvi, problemas):
+@medir_etapa("plotar_areas_problemas")
+def plotar_areas_problemas(ndvi, problemas, nome_arquivo="areas_problemas.png"):
     """
     Plota o mapa do NDVI juntamente com as áreas problemáticas detectadas.
     :param ndvi: Array NumPy com os valores de NDVI
     :param problemas: Máscara binária indicando áreas problemáticas
+    :param nome_arquivo: Nome do PNG gravado no modo sem janela
     """
+    altura, largura = ndvi.shape[:2]
     plt.figure(figsize=(10, 6))
-    plt.imshow(ndvi, cmap='RdYlGn', alpha=0.7)
-    plt.imshow(problemas, cmap='Reds', alpha=0.4)
+    plt.imshow(visao_para_tela(ndvi), cmap='RdYlGn', alpha=0.7, extent=(0, largura, altura, 0))
+    plt.imshow(visao_para_tela(problemas), cmap='Reds', alpha=0.4, extent=(0, largura, altura, 0))
     plt.title("Mapa NDVI com Áreas Problemáticas")
     plt.xlabel("Coordenada X")
     plt.ylabel("Coordenada Y")
     plt.colorbar(label="NDVI")
-    plt.show()
+    _exibir_ou_salvar(nome_arquivo)
+
+
+@medir_etapa("plotar_curva_sensibilidade")
+def plotar_curva_sensibilidade(limiares, curvas, nome_arquivo="curva_sensibilidade.png"):
+    """
+    Plota quantos pixels cada detecção marca em função do limiar de NDVI, para ajudar na escolha do limiar.
+    :param limiares: Limiares de NDVI avaliados
+    :param curvas: Dicionário nome da curva -> contagem de pixels para cada limiar (ex: de sensibilidade_problemas)
+    :param nome_arquivo: Nome do PNG gravado no modo sem janela
+    """
+    plt.figure(figsize=(10, 6))
+    for nome, contagens in curvas.items():
+        plt.plot(limiares, contagens, label=nome)
+    plt.title("Sensibilidade das Detecções ao Limiar de NDVI")
+    plt.xlabel("Limiar de NDVI")
+    plt.ylabel("Pixels marcados")
+    plt.legend()
+    plt.grid(linestyle='--')
+    _exibir_ou_salvar(nome_arquivo)
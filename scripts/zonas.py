@@ -0,0 +1,92 @@
+# zonas.py - Estatísticas zonais do NDVI, de áreas problemáticas e de pragas por talhão ou célula de grade
+import numpy as np
+
+# Colunas da tabela de estatísticas zonais (mesma ordem da tabela 'monitoramento_zonas' do banco de dados)
+TIPO_ESTATISTICAS_ZONAIS = np.dtype([
+    ("zona", np.int64),
+    ("pixels", np.int64),
+    ("ndvi_medio", np.float64),
+    ("ndvi_minimo", np.float64),
+    ("ndvi_maximo", np.float64),
+    ("ndvi_desvio", np.float64),
+    ("problemas", np.int64),
+    ("pragas", np.int64),
+    ("fracao_problemas", np.float64),
+    ("fracao_pragas", np.float64),
+])
+
+
+def criar_zonas_grade(formato, altura_celula, largura_celula=None):
+    """
+    Cria um raster de zonas dividindo a imagem em uma grade regular de células.
+    As células são numeradas linha a linha, a partir de 0.
+    :param formato: Formato (altura, largura) da imagem
+    :param altura_celula: Altura, em pixels, de cada célula
+    :param largura_celula: Largura, em pixels, de cada célula (padrão: igual à altura)
+    :return: Tupla (raster de zonas int32, número de zonas)
+    """
+    largura_celula = largura_celula or altura_celula
+    altura, largura = formato[:2]
+    colunas_grade = -(-largura // largura_celula)
+    linhas_grade = -(-altura // altura_celula)
+    linhas = (np.arange(altura, dtype=np.int32) // altura_celula) * colunas_grade
+    colunas = np.arange(largura, dtype=np.int32) // largura_celula
+    return linhas[:, None] + colunas[None, :], linhas_grade * colunas_grade
+
+
+def estatisticas_zonais(ndvi, zonas, problemas=None, pragas=None, num_zonas=None, zona_fundo=None):
+    """
+    Calcula, para cada zona, NDVI médio/mínimo/máximo/desvio padrão, pixels problemáticos e com pragas
+    e as respectivas frações de área, com passadas vetorizadas (bincount), sem laço por zona.
+    :param ndvi: Array contendo os valores de NDVI
+    :param zonas: Raster de zonas (inteiros não negativos), como talhões rotulados ou criar_zonas_grade
+    :param problemas: Máscara binária de áreas problemáticas (opcional)
+    :param pragas: Máscara binária de possíveis pragas (opcional)
+    :param num_zonas: Número de zonas (padrão: maior rótulo + 1)
+    :param zona_fundo: Rótulo que não pertence a nenhuma zona (ex: 0 fora dos talhões), opcional
+    :return: Array estruturado (TIPO_ESTATISTICAS_ZONAIS) com uma linha por zona não vazia
+    """
+    rotulos = zonas.ravel()
+    valores = ndvi.ravel()
+    num_zonas = num_zonas or int(rotulos.max()) + 1
+
+    pixels = np.bincount(rotulos, minlength=num_zonas)
+    ocupadas = pixels > 0
+    if zona_fundo is not None and 0 <= zona_fundo < num_zonas:
+        # Um rótulo de fundo fora do intervalo das zonas não tem pixels e não precisa ser excluído
+        ocupadas[zona_fundo] = False
+    contagem = np.maximum(pixels, 1)
+
+    media = np.bincount(rotulos, weights=valores, minlength=num_zonas) / contagem
+    desvios = valores - media[rotulos]
+    np.square(desvios, out=desvios)
+    desvio = np.sqrt(np.bincount(rotulos, weights=desvios, minlength=num_zonas) / contagem)
+    del desvios
+
+    minimo = np.full(num_zonas, np.inf)
+    maximo = np.full(num_zonas, -np.inf)
+    np.minimum.at(minimo, rotulos, valores)
+    np.maximum.at(maximo, rotulos, valores)
+
+    tabela = np.zeros(int(np.count_nonzero(ocupadas)), dtype=TIPO_ESTATISTICAS_ZONAIS)
+    tabela["zona"] = np.flatnonzero(ocupadas)
+    tabela["pixels"] = pixels[ocupadas]
+    tabela["ndvi_medio"] = media[ocupadas]
+    tabela["ndvi_minimo"] = minimo[ocupadas]
+    tabela["ndvi_maximo"] = maximo[ocupadas]
+    tabela["ndvi_desvio"] = desvio[ocupadas]
+    if problemas is not None:
+        tabela["problemas"] = np.bincount(rotulos, weights=problemas.ravel(), minlength=num_zonas)[ocupadas]
+        tabela["fracao_problemas"] = tabela["problemas"] / tabela["pixels"]
+    if pragas is not None:
+        tabela["pragas"] = np.bincount(rotulos, weights=pragas.ravel(), minlength=num_zonas)[ocupadas]
+        tabela["fracao_pragas"] = tabela["pragas"] / tabela["pixels"]
+    return tabela
+
+
+def tabela_para_registros(tabela):
+    """
+    Converte a tabela de estatísticas zonais em uma lista de dicionários (ex: para salvar em JSON).
+    """
+    nomes = tabela.dtype.names
+    return [dict(zip(nomes, linha)) for linha in tabela.tolist()]
@@ -0,0 +1,5 @@
+# conftest.py - Torna os módulos de scripts/ importáveis pelos testes, como ao executá-los a partir desse diretório
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
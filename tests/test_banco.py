@@ -0,0 +1,107 @@
+# test_banco.py - Gravação no banco de dados usando o SQLite local no lugar do Oracle
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+import banco
+from zonas import criar_zonas_grade, estatisticas_zonais
+
+
+def _contar(conexao, tabela):
+    return conexao.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+
+def test_tabela_criada_em_cada_banco_local():
+    # A verificação da tabela vale por conexão: um segundo banco local também recebe a tabela
+    for _ in range(2):
+        conexao = banco.conectar_banco_local()
+        banco.salvar_dados_banco(conexao, np.full((4, 4), 0.5), np.ones((4, 4), bool), np.zeros((4, 4), bool))
+        assert conexao.execute("SELECT ndvi_medio, problemas_totais, pragas_totais FROM monitoramento").fetchall() \
+            == [(0.5, 16, 0)]
+
+
+def test_salvar_dados_totais_banco(tmp_path):
+    caminho = str(tmp_path / "monitoramento.db")
+    conexao = banco.conectar_banco_local(caminho)
+    banco.salvar_dados_totais_banco(conexao, 0.42, 10, 3)
+    banco.salvar_dados_totais_banco(conexao, 0.40, 12, 1)
+    conexao.close()
+    # Nova conexão ao mesmo arquivo: a tabela já existe e não é recriada
+    conexao = banco.conectar_banco_local(caminho)
+    banco.salvar_dados_totais_banco(conexao, 0.38, 14, 0)
+    assert _contar(conexao, "monitoramento") == 3
+
+
+def test_salvar_estatisticas_zonais():
+    ndvi = np.random.default_rng(0).random((40, 60))
+    zonas, num_zonas = criar_zonas_grade(ndvi.shape, 20)
+    tabela = estatisticas_zonais(ndvi, zonas, ndvi < 0.3, ndvi < 0.1, num_zonas)
+    conexao = banco.conectar_banco_local()
+    assert banco.salvar_estatisticas_zonais(conexao, tabela, "voo.tif", "2024-10-01T10:00:00") == num_zonas
+    linhas = conexao.execute("SELECT imagem, data_analise, zona, pixels FROM monitoramento_zonas ORDER BY zona").fetchall()
+    assert [linha[:2] for linha in linhas] == [("voo.tif", "2024-10-01T10:00:00")] * num_zonas
+    assert sum(linha[3] for linha in linhas) == ndvi.size
+
+
+def test_gravador_por_tamanho_e_ao_fechar():
+    conexao = banco.conectar_banco_local()
+    with banco.GravadorMonitoramento(conexao, tamanho_lote=3, intervalo_maximo=None) as gravador:
+        for i in range(7):
+            gravador.adicionar(0.5, i, 0)
+        assert gravador.linhas_gravadas == 6
+        assert gravador.linhas_pendentes == 1
+    assert _contar(conexao, "monitoramento") == 7
+
+
+def test_gravador_por_tempo():
+    conexao = banco.conectar_banco_local()
+    gravador = banco.GravadorMonitoramento(conexao, tamanho_lote=1000, intervalo_maximo=0.1)
+    gravador.adicionar(0.5, 1, 0)
+    ndvi = np.full((10, 10), 0.5)
+    zonas, num_zonas = criar_zonas_grade(ndvi.shape, 10)
+    gravador.adicionar_zonas("voo.tif", "2024-10-01", estatisticas_zonais(ndvi, zonas, num_zonas=num_zonas))
+    prazo = time.monotonic() + 5
+    while gravador.linhas_pendentes and time.monotonic() < prazo:
+        time.sleep(0.02)
+    assert _contar(conexao, "monitoramento") == 1
+    assert _contar(conexao, "monitoramento_zonas") == 1
+    gravador.fechar()
+
+
+class _ConexaoInstavel:
+    """
+    Conexão que falha enquanto 'disponivel' for False, para simular o banco fora do ar.
+    """
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.disponivel = False
+
+    def cursor(self):
+        if not self.disponivel:
+            raise sqlite3.OperationalError("banco indisponível")
+        return self.conexao.cursor()
+
+    def commit(self):
+        self.conexao.commit()
+
+    def rollback(self):
+        self.conexao.rollback()
+
+
+def test_gravador_mantem_linhas_pendentes_apos_falha():
+    conexao = banco.conectar_banco_local()
+    instavel = _ConexaoInstavel(conexao)
+    gravador = banco.GravadorMonitoramento(instavel, tamanho_lote=2, intervalo_maximo=None)
+    gravador.adicionar(0.5, 1, 0)
+    gravador.adicionar(0.5, 2, 0)  # a falha ao gravar não é repassada
+    assert gravador.linhas_pendentes == 2
+    with pytest.raises(sqlite3.OperationalError):
+        gravador.fechar()
+    assert gravador.linhas_pendentes == 2
+    instavel.disponivel = True
+    gravador.fechar()
+    assert gravador.linhas_pendentes == 0
+    assert _contar(conexao, "monitoramento") == 2
@@ -0,0 +1,67 @@
+# test_incremental.py - Análise incremental comparada com a recomputação completa de cada voo
+import numpy as np
+
+from incremental import analisar_incremental
+
+
+def _alterar(voo, rng, quantidade=3, lado=40):
+    voo = voo.copy()
+    altura, largura = voo.shape[:2]
+    for _ in range(quantidade):
+        linha, coluna = rng.integers(0, altura - lado), rng.integers(0, largura - lado)
+        voo[linha:linha + lado, coluna:coluna + lado] = rng.integers(0, 255, (lado, lado, voo.shape[2]))
+    return voo
+
+
+def _comparar_com_completa(resultado, voo, tmp_path, **parametros):
+    completo = analisar_incremental(voo, str(tmp_path / "completo"), **parametros)
+    np.testing.assert_array_equal(np.asarray(resultado["ndvi"]), np.asarray(completo["ndvi"]))
+    np.testing.assert_array_equal(np.asarray(resultado["problemas"]), np.asarray(completo["problemas"]))
+    assert resultado["Problemas_Totais"] == completo["Problemas_Totais"]
+    assert np.isclose(resultado["NDVI_Medio"], completo["NDVI_Medio"])
+    return completo
+
+
+def test_voos_sucessivos_iguais_a_analise_completa(tmp_path):
+    rng = np.random.default_rng(0)
+    voo = (rng.random((300, 260, 4)) * 200).astype(np.uint8)
+    estado = str(tmp_path / "estado")
+    parametros = dict(tamanho_bloco=32, limiar=0.3, tamanho_minimo=5)
+    for indice in range(4):
+        if indice:
+            voo = _alterar(voo, rng)
+        resultado = analisar_incremental(voo, estado, **parametros)
+        _comparar_com_completa(resultado, voo, tmp_path / str(indice), **parametros)
+        if indice:
+            assert 0 < resultado["Blocos_Recalculados"] < resultado["Blocos_Totais"]
+
+
+def test_area_que_atravessa_blocos_nao_alterados(tmp_path):
+    # Uma faixa de NDVI baixo atravessa vários blocos; alterar só um deles muda o tamanho da área inteira
+    voo = np.full((128, 128, 4), 200, dtype=np.uint8)
+    voo[:, :, 2] = 20  # vegetação sadia: vermelho baixo e NIR alto
+    voo[60:62, :, 2] = 250  # faixa com vermelho alto e NIR baixo: NDVI negativo
+    voo[60:62, :, 3] = 10
+    estado = str(tmp_path / "estado")
+    parametros = dict(tamanho_bloco=32, limiar=0.3, tamanho_minimo=150)
+    primeiro = analisar_incremental(voo, estado, **parametros)
+    assert primeiro["Problemas_Totais"] == 256
+
+    voo = voo.copy()
+    voo[60:62, 40:60] = voo[0, 0]  # interrompe a faixa: os dois pedaços ficam menores que o tamanho mínimo
+    resultado = analisar_incremental(voo, estado, **parametros)
+    _comparar_com_completa(resultado, voo, tmp_path, **parametros)
+    assert resultado["Blocos_Recalculados"] == 1
+    assert resultado["Problemas_Totais"] == 0
+
+
+def test_voo_sem_alteracoes_nao_recalcula_blocos(tmp_path):
+    voo = (np.random.default_rng(1).random((100, 100, 4)) * 200).astype(np.uint8)
+    estado = str(tmp_path / "estado")
+    primeiro = analisar_incremental(voo, estado, tamanho_bloco=32)
+    problemas = np.array(primeiro["problemas"])
+    del primeiro
+    resultado = analisar_incremental(voo, estado, tamanho_bloco=32)
+    assert resultado["Blocos_Recalculados"] == 0
+    assert resultado["areas_degradadas"] == []
+    np.testing.assert_array_equal(np.asarray(resultado["problemas"]), problemas)
@@ -0,0 +1,93 @@
+# test_regioes.py - Tabela de regiões e índice espacial comparados com o cálculo por força bruta
+import numpy as np
+import pytest
+import scipy.ndimage as ndimage
+
+from regioes import IndiceRegioes, maiores_regioes, regioes_da_mascara, tabela_regioes
+
+
+@pytest.fixture
+def imagem():
+    rng = np.random.default_rng(0)
+    ndvi = rng.random((120, 150))
+    mascara = ndimage.binary_opening(ndvi < 0.35)
+    mascara |= ndvi < 0.02  # componentes de um único pixel
+    pragas = rng.random(ndvi.shape) < 0.3
+    return ndvi, mascara, pragas
+
+
+def test_tabela_regioes_igual_a_forca_bruta(imagem):
+    ndvi, mascara, pragas = imagem
+    rotulos, num_rotulos = ndimage.label(mascara)
+    tabela = tabela_regioes(rotulos, num_rotulos, ndvi, pragas)
+    assert len(tabela) == num_rotulos
+    for linha, fatia in zip(tabela, ndimage.find_objects(rotulos)):
+        pixels = rotulos == linha["regiao"]
+        linhas, colunas = np.nonzero(pixels)
+        assert linha["area"] == pixels.sum()
+        assert (linha["linha_inicio"], linha["linha_fim"]) == (fatia[0].start, fatia[0].stop)
+        assert (linha["coluna_inicio"], linha["coluna_fim"]) == (fatia[1].start, fatia[1].stop)
+        assert np.isclose(linha["centroide_linha"], linhas.mean())
+        assert np.isclose(linha["centroide_coluna"], colunas.mean())
+        assert np.isclose(linha["ndvi_medio"], ndvi[pixels].mean())
+        assert linha["pragas"] == pragas[pixels].sum()
+        assert np.isclose(linha["fracao_pragas"], pragas[pixels].mean())
+
+    tamanhos = np.bincount(rotulos.ravel())
+    selecionados = tamanhos >= 5
+    selecionados[0] = False
+    filtrada = tabela_regioes(rotulos, num_rotulos, ndvi, pragas, selecionados)
+    np.testing.assert_array_equal(filtrada, tabela[tabela["area"] >= 5])
+    np.testing.assert_array_equal(regioes_da_mascara(mascara, ndvi, pragas), tabela)
+
+
+def test_maiores_regioes(imagem):
+    ndvi, mascara, pragas = imagem
+    tabela = regioes_da_mascara(mascara, ndvi, pragas)
+    maiores = maiores_regioes(tabela, 10)
+    np.testing.assert_array_equal(maiores["area"], np.sort(tabela["area"])[::-1][:10])
+    assert len(maiores_regioes(tabela, len(tabela) + 5)) == len(tabela)
+    assert len(maiores_regioes(tabela[:0], 5)) == 0
+
+
+def _intersecta(tabela, linha_inicio, coluna_inicio, linha_fim, coluna_fim):
+    return np.flatnonzero((tabela["linha_inicio"] < linha_fim) & (tabela["linha_fim"] > linha_inicio)
+                          & (tabela["coluna_inicio"] < coluna_fim) & (tabela["coluna_fim"] > coluna_inicio))
+
+
+@pytest.mark.parametrize("tamanho_celula", [None, 1, 7, 500])
+def test_consultar_retangulo_igual_a_forca_bruta(imagem, tamanho_celula):
+    ndvi, mascara, pragas = imagem
+    tabela = regioes_da_mascara(mascara, ndvi, pragas)
+    indice = IndiceRegioes(tabela, tamanho_celula)
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        linha_inicio, coluna_inicio = rng.integers(-20, 160, 2)
+        linha_fim, coluna_fim = linha_inicio + rng.integers(1, 60), coluna_inicio + rng.integers(1, 60)
+        np.testing.assert_array_equal(indice.consultar_retangulo(linha_inicio, coluna_inicio, linha_fim, coluna_fim),
+                                      _intersecta(tabela, linha_inicio, coluna_inicio, linha_fim, coluna_fim))
+
+
+@pytest.mark.parametrize("tamanho_celula", [None, 1, 7, 500])
+def test_mais_proximas_igual_a_forca_bruta(imagem, tamanho_celula):
+    ndvi, mascara, pragas = imagem
+    tabela = regioes_da_mascara(mascara, ndvi, pragas)
+    indice = IndiceRegioes(tabela, tamanho_celula)
+    todas = np.arange(len(tabela))
+    rng = np.random.default_rng(2)
+    for _ in range(100):
+        # Pontos dentro e fora da grade
+        linha, coluna = rng.integers(-50, 200, 2)
+        quantidade = int(rng.integers(1, 8))
+        indices, distancias = indice.mais_proximas(linha, coluna, quantidade)
+        esperadas = np.sort(indice._distancias(todas, linha, coluna))[:quantidade]
+        np.testing.assert_allclose(distancias, esperadas)
+        np.testing.assert_allclose(indice._distancias(indices, linha, coluna), distancias)
+        assert len(np.unique(indices)) == quantidade
+
+
+def test_indice_vazio():
+    indice = IndiceRegioes(regioes_da_mascara(np.zeros((10, 10), dtype=bool)))
+    assert indice.consultar_retangulo(0, 0, 10, 10).size == 0
+    indices, distancias = indice.mais_proximas(5, 5, 3)
+    assert indices.size == 0 and distancias.size == 0
@@ -0,0 +1,64 @@
+# test_rotulagem.py - Rotulagem em faixas paralelas comparada com o ndimage.label
+import numpy as np
+import pytest
+import scipy.ndimage as ndimage
+
+from rotulagem import detectar_componentes_em_blocos, rotular_componentes, tamanhos_componentes
+
+
+def _mesma_particao(rotulos_a, rotulos_b):
+    """
+    Verifica se dois mapas de rótulos separam os pixels nos mesmos componentes, qualquer que seja a numeração.
+    """
+    if not np.array_equal(rotulos_a > 0, rotulos_b > 0):
+        return False
+    pares = np.unique(np.stack([rotulos_a[rotulos_a > 0], rotulos_b[rotulos_b > 0]]), axis=1)
+    return (len(np.unique(pares[0])) == pares.shape[1]) and (len(np.unique(pares[1])) == pares.shape[1])
+
+
+@pytest.mark.parametrize("num_faixas", [1, 2, 3, 7, 50])
+@pytest.mark.parametrize("estrutura", [None, np.ones((3, 3), dtype=bool)])
+def test_rotular_componentes_igual_ao_ndimage(num_faixas, estrutura):
+    mascara = np.random.default_rng(num_faixas).random((101, 87)) < 0.45
+    esperado, num_esperado = ndimage.label(mascara, structure=estrutura)
+    rotulos, num_componentes = rotular_componentes(mascara, estrutura, num_threads=2, num_faixas=num_faixas)
+    assert num_componentes == num_esperado
+    assert _mesma_particao(rotulos, esperado)
+    assert set(np.unique(rotulos)) == set(range(num_componentes + 1))
+
+
+def test_rotular_componentes_que_atravessam_todas_as_faixas():
+    mascara = np.zeros((60, 20), dtype=bool)
+    mascara[:, 3] = True
+    mascara[59, 3:15] = True
+    mascara[:, 14] = True
+    rotulos, num_componentes = rotular_componentes(mascara, num_threads=2, num_faixas=6)
+    assert num_componentes == 1
+    assert _mesma_particao(rotulos, ndimage.label(mascara)[0])
+
+
+def test_tamanhos_componentes():
+    mascara = np.random.default_rng(1).random((50, 50)) < 0.4
+    rotulos, num_componentes = ndimage.label(mascara)
+    tamanhos = tamanhos_componentes(rotulos, num_componentes)
+    esperado = ndimage.sum(mascara, rotulos, range(num_componentes + 1))
+    np.testing.assert_array_equal(tamanhos, esperado)
+
+
+def test_detectar_componentes_em_todos_os_blocos_igual_a_imagem_inteira():
+    ndvi = np.random.default_rng(2).random((130, 100)) - 0.2
+    mascara = ndvi < 0.3
+    rotulos, num_componentes = ndimage.label(mascara)
+    esperado = (tamanhos_componentes(rotulos, num_componentes) >= 5)[rotulos]
+    saida = np.zeros(ndvi.shape, dtype=bool)
+    detectar_componentes_em_blocos(ndvi, 0.3, 5, np.ones((5, 4), dtype=bool), 32, saida)
+    np.testing.assert_array_equal(saida, esperado)
+
+
+def test_detectar_componentes_grava_apenas_os_blocos_marcados():
+    ndvi = np.zeros((64, 64))
+    saida = np.zeros(ndvi.shape, dtype=bool)
+    blocos = np.array([[True, False], [False, False]])
+    detectar_componentes_em_blocos(ndvi, 0.3, 1, blocos, 32, saida)
+    assert saida[:32, :32].all()
+    assert not saida[32:].any() and not saida[:, 32:].any()
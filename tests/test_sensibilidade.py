@@ -0,0 +1,47 @@
+# test_sensibilidade.py - Curvas de sensibilidade comparadas com uma detecção completa por limiar
+import numpy as np
+import pytest
+import scipy.ndimage as ndimage
+
+from sensibilidade import sensibilidade_pragas, sensibilidade_problemas, sensibilidade_problemas_avancado
+
+
+@pytest.fixture
+def ndvi():
+    valores = np.random.default_rng(0).random((80, 90)) * 1.2 - 0.3
+    valores[5, 5:20] = np.nan
+    return valores
+
+
+def test_sensibilidade_problemas(ndvi):
+    limiares = [0.4, -1.0, 0.0, 0.25, 0.25, 2.0]
+    esperado = [np.count_nonzero(ndvi < limiar) for limiar in limiares]
+    np.testing.assert_array_equal(sensibilidade_problemas(ndvi, limiares), esperado)
+
+
+@pytest.mark.parametrize("tipo", [np.uint8, np.uint16, np.float64])
+def test_sensibilidade_pragas(ndvi, tipo):
+    rng = np.random.default_rng(1)
+    verde = (rng.random(ndvi.shape) * 255).astype(tipo)
+    azul = (rng.random(ndvi.shape) * 255).astype(tipo)
+    if tipo is np.float64:
+        verde[10, :30] = np.nan
+    limiares_ndvi = [0.3, 0.1, 0.5]
+    limiares_cor = [150, 0, 100.5, 254]
+    esperado = [[np.count_nonzero((ndvi < limiar_ndvi) & (verde > limiar_cor) & (azul > limiar_cor))
+                 for limiar_cor in limiares_cor] for limiar_ndvi in limiares_ndvi]
+    np.testing.assert_array_equal(sensibilidade_pragas(ndvi, verde, azul, limiares_ndvi, limiares_cor), esperado)
+
+
+@pytest.mark.parametrize("tamanho_minimo", [0, 1, 5, 40])
+def test_sensibilidade_problemas_avancado(ndvi, tamanho_minimo):
+    limiares = np.concatenate([np.linspace(-0.2, 0.8, 25), [0.3, 0.1]])
+    areas, pixels = sensibilidade_problemas_avancado(ndvi, limiares, tamanho_minimo)
+    for limiar, num_areas, num_pixels in zip(limiares, areas, pixels):
+        rotulos, num_rotulos = ndimage.label(ndvi < limiar)
+        tamanhos = np.bincount(rotulos.ravel(), minlength=num_rotulos + 1)
+        tamanhos[0] = 0  # o fundo tem tamanho 0, como em tamanhos_componentes
+        grandes = tamanhos >= tamanho_minimo
+        assert num_areas == np.count_nonzero(grandes[1:])
+        # Como em detectar_problemas_avancado, o fundo entra na máscara quando o tamanho mínimo é 0
+        assert num_pixels == np.count_nonzero(grandes[rotulos])
@@ -0,0 +1,72 @@
+# test_util.py - Arquivo de resultados JSON Lines: gravação, índice de deslocamentos e compactação
+import os
+
+from util import anexar_resultado, buscar_resultados, compactar_resultados, ler_resultados
+
+
+def _registro(imagem, data, **campos):
+    return {"Imagem": imagem, "Data": data, **campos}
+
+
+def test_anexar_e_buscar_por_imagem_e_data(tmp_path):
+    nome = str(tmp_path / "resultados")
+    anexar_resultado(_registro("a.tif", "2024-10-01T10:00:00", NDVI_Medio=0.5), nome)
+    anexar_resultado(_registro("b.tif", "2024-10-02T10:00:00", NDVI_Medio=0.4), nome)
+    anexar_resultado(_registro("a.tif", "2024-10-15T10:00:00", NDVI_Medio=0.3), nome)
+    assert os.path.exists(nome + ".jsonl") and os.path.exists(nome + ".jsonl.idx")
+
+    # Análises com datas diferentes permanecem no histórico
+    assert [r["NDVI_Medio"] for r in buscar_resultados(nome, imagem="a.tif")] == [0.5, 0.3]
+    assert [r["Imagem"] for r in buscar_resultados(nome, data_inicial="2024-10-02")] == ["b.tif", "a.tif"]
+    assert [r["Imagem"] for r in buscar_resultados(nome, data_final="2024-10-02")] == ["a.tif", "b.tif"]
+    assert buscar_resultados(nome, imagem="c.tif") == []
+
+
+def test_mesma_chave_substitui_registro_inteiro(tmp_path):
+    nome = str(tmp_path / "resultados")
+    anexar_resultado(_registro("a.tif", "2024-10-01T10:00:00", Voo=1, NDVI_Medio=0.5, Pragas=3), nome)
+    anexar_resultado(_registro("a.tif", "2024-10-01T12:00:00", Voo=1, NDVI_Medio=0.4), nome)
+    anexar_resultado(_registro("a.tif", "2024-10-01T12:00:00", Voo=2, NDVI_Medio=0.2), nome)
+    encontrados = buscar_resultados(nome, imagem="a.tif")
+    # O voo reprocessado substitui o anterior por inteiro, sem herdar campos (ex: 'Pragas')
+    assert encontrados == [_registro("a.tif", "2024-10-01T12:00:00", Voo=1, NDVI_Medio=0.4),
+                           _registro("a.tif", "2024-10-01T12:00:00", Voo=2, NDVI_Medio=0.2)]
+
+
+def test_compactar_mantem_registros_vigentes(tmp_path):
+    nome = str(tmp_path / "resultados")
+    for i in range(5):
+        anexar_resultado(_registro("a.tif", "2024-10-01T10:00:00", Execucao=i), nome)
+    anexar_resultado(_registro("b.tif", "2024-10-01T10:00:00", Execucao=0), nome)
+    antes = buscar_resultados(nome)
+
+    assert not compactar_resultados(nome, redundancia_minima=0.9)
+    assert compactar_resultados(nome)
+    assert list(ler_resultados(nome)) == antes
+    assert buscar_resultados(nome) == antes
+    # Já compacto: nada a fazer
+    assert not compactar_resultados(nome)
+
+    anexar_resultado(_registro("b.tif", "2024-10-01T10:00:00", Execucao=1), nome)
+    assert buscar_resultados(nome, imagem="b.tif") == [_registro("b.tif", "2024-10-01T10:00:00", Execucao=1)]
+
+
+def test_indice_reconstruido_quando_ausente(tmp_path):
+    nome = str(tmp_path / "resultados")
+    anexar_resultado(_registro("a.tif", "2024-10-01T10:00:00"), nome)
+    anexar_resultado(_registro("b.tif", "2024-10-02T10:00:00"), nome)
+    os.remove(nome + ".jsonl.idx")
+    assert [r["Imagem"] for r in buscar_resultados(nome)] == ["a.tif", "b.tif"]
+    anexar_resultado(_registro("c.tif", "2024-10-03T10:00:00"), nome)
+    assert [r["Imagem"] for r in buscar_resultados(nome, data_inicial="2024-10-02")] == ["b.tif", "c.tif"]
+
+
+def test_ultima_linha_incompleta_ignorada(tmp_path):
+    nome = str(tmp_path / "resultados")
+    anexar_resultado(_registro("a.tif", "2024-10-01T10:00:00"), nome)
+    os.remove(nome + ".jsonl.idx")
+    # Gravação interrompida no meio de uma linha
+    with open(nome + ".jsonl", "ab") as arquivo:
+        arquivo.write(b'{"Imagem": "b.t')
+    assert [r["Imagem"] for r in buscar_resultados(nome)] == ["a.tif"]
+    assert [r["Imagem"] for r in ler_resultados(nome)] == ["a.tif"]